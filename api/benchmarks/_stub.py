@@ -0,0 +1,126 @@
+import datetime
+import os
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+# ----------------------------
+# ベンチマーク・テスト用のローカル HTTP スタブ（PostgREST / S3 互換 / CloudFAX の代わり）
+#  - HTTP/1.1 keep-alive 対応（Content-Length 付きで返す）
+#  - handler(method, path, headers, body) -> (status, headers, body)。latency 秒だけ待ってから返す
+#  - tls=True で自己署名証明書の HTTPS（TLS ハンドシェイクのコストも測る場合）。クライアント側は検証を無効にする
+# ----------------------------
+Handler = Callable[[str, str, dict, bytes], tuple[int, dict, bytes]]
+
+
+def _default_handler(method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+    return 200, {"Content-Type": "application/json"}, b"[]"
+
+
+def _self_signed_context() -> ssl.SSLContext:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    with tempfile.TemporaryDirectory() as d:
+        cert_path, key_path = os.path.join(d, "cert.pem"), os.path.join(d, "key.pem")
+        with open(cert_path, "wb") as f:
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as f:
+            f.write(key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+            ))
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert_path, key_path)
+    return ctx
+
+
+class StubServer:
+    def __init__(self, handler: Optional[Handler] = None, latency: float = 0.0, tls: bool = False):
+        self.handler = handler or _default_handler
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class _Req(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True   # ヘッダーと本文の2回書き込みで遅延 ACK（40ms）待ちにならないように
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def _read_chunked(self) -> bytes:
+                """Transfer-Encoding: chunked の本文（boto3 の HTTPS PUT は aws-chunked + トレーラーで送る）"""
+                body = bytearray()
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                    if size == 0:
+                        break
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):   # トレーラー
+                    pass
+                return bytes(body)
+
+            def _handle(self):
+                if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+                    body = self._read_chunked()
+                else:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    body = self.rfile.read(length) if length else b""
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, headers, out = stub.handler(self.command, self.path, dict(self.headers), body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(out)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_HEAD = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        class _Server(ThreadingHTTPServer):
+            request_queue_size = 128     # 既定の 5 では同時接続時に SYN が落ち、1 秒の再送待ちが混ざる
+            daemon_threads = True
+
+        self._server = _Server(("127.0.0.1", 0), _Req)
+        if tls:
+            self._server.socket = _self_signed_context().wrap_socket(
+                self._server.socket, server_side=True, do_handshake_on_connect=False,
+            )
+        scheme = "https" if tls else "http"
+        self.url = f"{scheme}://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "StubServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
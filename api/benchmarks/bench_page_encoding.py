@@ -0,0 +1,161 @@
+"""
+Vision OCR に送るページ画像: 従来の scale=2.0 + PNG と、適応 DPI + グレースケール JPEG 等（PageEncoding）の比較。
+PDF を描画・エンコードして、ページあたりの所要時間・base64 のサイズ・推定アップロード時間・OCR の一致度を測る。
+
+    cd api && python benchmarks/bench_page_encoding.py [--corpus DIR] [--pages 6] [--mbps 10] [--vision]
+
+--corpus: PDF を置いたディレクトリ（未指定時は FAX 風の合成ページ: 紹介状の本文・検査結果の表・送付状）
+一致度:
+  --vision かつ OPENAI_API_KEY あり → 各エンコードの Vision OCR 結果と PNG の結果の difflib 類似度
+  それ以外 → 代理指標: 2値化して同じ大きさに揃えた画像のインク IoU（PNG 比。Vision の結果そのものではない）
+"""
+import argparse
+import base64
+import difflib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from page_encoder import PageEncoding  # noqa: E402
+from pdf_render_pool import TextLayerPolicy, _page_count, _render_page  # noqa: E402
+
+_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_W, _H = 1654, 2339      # A4 200dpi
+_CMP_SIZE = (800, 1131)  # インク IoU を比べる共通サイズ
+_INK_LEVEL = 160
+
+_ENCODINGS = (
+    ("png (legacy)", PageEncoding(format="png", grayscale=False, long_edge=0)),
+    ("jpeg q80", PageEncoding()),
+    ("webp q80", PageEncoding(format="webp")),
+    ("png bilevel", PageEncoding(format="png", bilevel=True)),
+)
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype(_FONT, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _fax_page(kind: str, seed: int) -> Image.Image:
+    """FAX 風の合成ページ（ヘッダー行・点ノイズ・黒縁付き）"""
+    rnd = random.Random(seed)
+    img = Image.new("L", (_W, _H), 255)
+    d = ImageDraw.Draw(img)
+    f = _font(28)
+    d.text((60, 30), f"FROM: 03-1234-5678  2026/10/01 10:22  P.{seed}", fill=0, font=_font(22))
+    if kind == "letter":
+        for y in range(180, 2200, 45):
+            d.text((120, y), f"Referral {seed}-{y}: patient history " + "abcdefgh " * rnd.randint(1, 8), fill=0, font=f)
+    elif kind == "form":
+        for y in range(180, 2200, 90):
+            d.rectangle((100, y, 1550, y + 80), outline=0, width=3)
+            d.text((120, y + 20), f"Test item {y}", fill=0, font=f)
+            d.text((1100, y + 20), f"{rnd.uniform(0, 200):.1f} mg/dL", fill=0, font=f)
+    else:   # cover
+        d.text((200, 400), "FAX COVER SHEET", fill=0, font=_font(64))
+        d.text((200, 600), f"To: Clinic {seed}   Pages: 3", fill=0, font=f)
+    for _ in range(300):
+        d.point((rnd.randrange(_W), rnd.randrange(_H)), fill=0)
+    d.rectangle((0, 0, 8, _H), fill=0)
+    return img
+
+
+def _synthetic_pdf(pages: int) -> bytes:
+    kinds = ("letter", "form", "cover")
+    imgs = [_fax_page(kinds[i % len(kinds)], i) for i in range(pages)]
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=200)
+    return buf.getvalue()
+
+
+def _corpus(args) -> list[tuple[str, bytes]]:
+    if not args.corpus:
+        return [("synthetic", _synthetic_pdf(args.pages))]
+    out = []
+    for name in sorted(os.listdir(args.corpus)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(args.corpus, name), "rb") as f:
+                out.append((name, f.read()))
+    return out
+
+
+def _ink(data: bytes) -> np.ndarray:
+    img = Image.open(io.BytesIO(data)).convert("L").resize(_CMP_SIZE, Image.Resampling.BOX)
+    return np.asarray(img) < _INK_LEVEL
+
+
+def _ink_iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = int(np.count_nonzero(a | b))
+    return int(np.count_nonzero(a & b)) / union if union else 1.0
+
+
+def _vision_text(page) -> str:
+    import main
+    return main._call_openai_ocr(
+        [page.image.data], timeout=120, mime_types=[page.image.mime], details=[page.image.detail],
+    )
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="PDF を置いたディレクトリ")
+    ap.add_argument("--pages", type=int, default=6, help="合成コーパスのページ数")
+    ap.add_argument("--max-pages", type=int, default=20, help="1 PDF あたりの上限ページ数")
+    ap.add_argument("--mbps", type=float, default=10.0, help="推定アップロード時間の回線速度（Mbit/s）")
+    ap.add_argument("--vision", action="store_true", help="OpenAI Vision で実際に OCR して PNG との一致度を測る")
+    args = ap.parse_args()
+
+    use_vision = args.vision and bool(os.getenv("OPENAI_API_KEY"))
+    if args.vision and not use_vision:
+        print("OPENAI_API_KEY が無いため、一致度は代理指標（インク IoU）で測ります")
+    metric = "text sim" if use_vision else "ink IoU"
+    policy = TextLayerPolicy()   # 全ページを描画する
+
+    rows: dict[str, dict[str, list]] = {name: {"ms": [], "b64": [], "sim": [], "px": []} for name, _ in _ENCODINGS}
+    for _, pdf in _corpus(args):
+        for i in range(min(_page_count(pdf), args.max_pages)):
+            ref = None
+            for name, enc in _ENCODINGS:
+                _render_page(pdf, i, enc, policy)   # ウォームアップ
+                t = time.perf_counter()
+                page, _ = _render_page(pdf, i, enc, policy)
+                ms = (time.perf_counter() - t) * 1000
+                if ref is None:
+                    ref = _vision_text(page) if use_vision else _ink(page.image.data)
+                    sim = 1.0
+                elif use_vision:
+                    sim = difflib.SequenceMatcher(None, ref, _vision_text(page)).ratio()
+                else:
+                    sim = _ink_iou(ref, _ink(page.image.data))
+                r = rows[name]
+                r["ms"].append(ms)
+                r["b64"].append(len(base64.b64encode(page.image.data)))
+                r["sim"].append(sim)
+                r["px"].append(f"{page.image.width}x{page.image.height}")
+
+    base = statistics.mean(rows[_ENCODINGS[0][0]]["b64"])
+    print(f"{'encoding':>13} {'size':>10} {'ms/page':>8} {'KB/page':>8} {'vs png':>7} {'upload ms':>10} {metric:>9}")
+    for name, _ in _ENCODINGS:
+        r = rows[name]
+        kb = statistics.mean(r["b64"]) / 1024
+        upload_ms = statistics.mean(r["b64"]) * 8 / (args.mbps * 1e6) * 1000
+        print(
+            f"{name:>13} {r['px'][0]:>10} {statistics.median(r['ms']):>8.1f} {kb:>8.0f} "
+            f"{statistics.mean(r['b64']) / base:>7.1%} {upload_ms:>10.0f} {min(r['sim']):>9.3f}"
+        )
+    print(f"pages={len(rows[_ENCODINGS[0][0]]['ms'])}  {metric} は PNG（従来）に対するページごとの最小値")
+
+
+if __name__ == "__main__":
+    main_()
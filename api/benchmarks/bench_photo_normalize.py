@@ -0,0 +1,99 @@
+"""
+撮影画像（PNG / JPEG アップロード）の OCR 前処理: 従来（アップロードをそのまま base64 で送る）と
+page_encoder.encode_photo（EXIF の向き反映 → 縮小 → グレースケール → 照明むら補正）の比較。
+前処理の所要時間・送信サイズ・推定アップロード時間を測る。
+
+    cd api && python benchmarks/bench_photo_normalize.py [--corpus DIR] [--mbps 10] [--runs 3]
+
+--corpus: JPEG / PNG を置いたディレクトリ（未指定時はスマートフォン撮影を模した合成画像:
+          12MP・照明むら・影・センサーノイズ付きで、EXIF Orientation=6 で横倒しに保存した JPEG と同じ画像の PNG）
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from page_encoder import PageEncoding, encode_photo  # noqa: E402
+
+_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_W, _H = 3024, 4032      # 12MP（縦向きの書類）
+
+_VARIANTS = (
+    ("raw upload", None),
+    ("no normalize", PageEncoding(normalize=False)),
+    ("encode_photo", PageEncoding()),
+)
+
+
+def _synthetic_photos() -> list[tuple[str, bytes]]:
+    doc = Image.new("RGB", (_W, _H), (236, 230, 215))
+    d = ImageDraw.Draw(doc)
+    try:
+        f = ImageFont.truetype(_FONT, 64)
+    except OSError:
+        f = ImageFont.load_default()
+    d.text((200, 200), "Referral  2026/10/01", fill=(20, 20, 30), font=f)
+    for y in range(400, 3800, 110):
+        d.text((200, y), f"Line {y}: blood pressure 142/88 mmHg, HbA1c 7.2%", fill=(40, 40, 50), font=f)
+    # 左から右への照明むら + 左下の手の影 + センサーノイズ
+    yy, xx = np.mgrid[0:_H, 0:_W]
+    shade = (0.45 + 0.55 * (xx / _W)) * (1 - 0.25 * np.exp(-((xx - 800) ** 2 + (yy - 3000) ** 2) / 6e5))
+    arr = np.asarray(doc, dtype=np.float32) * shade[..., None]
+    arr += np.random.default_rng(0).normal(0, 6, arr.shape)
+    photo = Image.fromarray(arr.clip(0, 255).astype(np.uint8)).transpose(Image.Transpose.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6     # Orientation: 90° 回転して表示
+    jpg, png = io.BytesIO(), io.BytesIO()
+    photo.save(jpg, "JPEG", quality=92, exif=exif.tobytes())
+    photo.save(png, "PNG")
+    return [("12MP.jpg", jpg.getvalue()), ("12MP.png", png.getvalue())]
+
+
+def _corpus(args) -> list[tuple[str, bytes]]:
+    if not args.corpus:
+        return _synthetic_photos()
+    out = []
+    for name in sorted(os.listdir(args.corpus)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(args.corpus, name), "rb") as f:
+                out.append((name, f.read()))
+    return out
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="JPEG / PNG を置いたディレクトリ")
+    ap.add_argument("--mbps", type=float, default=10.0, help="推定アップロード時間の回線速度（Mbit/s）")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'file':>12} {'variant':>13} {'size':>10} {'b64 KB':>8} {'prep ms':>8} {'upload ms':>10} {'total ms':>9}")
+    for name, data in _corpus(args):
+        for variant, enc in _VARIANTS:
+            if enc is None:
+                out, size, prep = data, "%dx%d" % Image.open(io.BytesIO(data)).size, 0.0
+            else:
+                encode_photo(data, enc)   # ウォームアップ
+                times = []
+                for _ in range(args.runs):
+                    t = time.perf_counter()
+                    page = encode_photo(data, enc)
+                    times.append(time.perf_counter() - t)
+                out, size, prep = page.data, f"{page.width}x{page.height}", min(times) * 1000
+            b64 = len(base64.b64encode(out))
+            upload = b64 * 8 / (args.mbps * 1e6) * 1000
+            print(
+                f"{name:>12} {variant:>13} {size:>10} {b64 / 1024:>8.0f} {prep:>8.0f} {upload:>10.0f} "
+                f"{prep + upload:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,92 @@
+"""
+R2（boto3）クライアントのプール数ごとの比較。
+ローカルの S3 互換スタブ（HTTPS・自己署名）に対して、--threads 件ずつのバースト（一覧表示のサムネイル・
+一括ダウンロードなど）で head_object / put_object を送り、R2_MAX_POOL_CONNECTIONS ごとの
+スループット・レイテンシ・新規接続数を測る。
+バーストの終わりにプールへ戻りきらなかった接続は破棄され、次のバーストで TCP + TLS から接続し直す。
+（スレッドが休みなく投げ続ける負荷では、返却直後に同じ接続を取り直すためプール数の差はほぼ出ない）
+
+    cd api && python benchmarks/bench_r2_pool.py [--requests 800] [--threads 40] [--latency 0.05]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+
+import r2_client  # noqa: E402
+from benchmarks._stub import StubServer  # noqa: E402
+
+
+def _s3_handler(method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+    return 200, {"ETag": '"0123456789abcdef0123456789abcdef"', "Content-Type": "application/pdf"}, b""
+
+
+def _client(endpoint: str, pool: int):
+    r2_client.R2_MAX_POOL_CONNECTIONS = pool
+    return boto3.session.Session().client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id="AKIDEXAMPLE",
+        aws_secret_access_key="secret",
+        region_name="auto",
+        config=r2_client._client_config(),
+        verify=False,
+    )
+
+
+def _run(s3, n: int, threads: int, payload: bytes) -> tuple[float, list[float]]:
+    lat: list[float] = []
+
+    def one(i: int) -> None:
+        t = time.perf_counter()
+        if i % 2:
+            s3.head_object(Bucket="docs", Key=f"documents/{i}.pdf")
+        else:
+            s3.put_object(Bucket="docs", Key=f"previews/{i}.webp", Body=payload, ContentType="image/webp")
+        lat.append(time.perf_counter() - t)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        for start in range(0, n, threads):
+            list(ex.map(one, range(start, min(start + threads, n))))
+    return time.perf_counter() - t0, lat
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=800)
+    ap.add_argument("--threads", type=int, default=40, help="バーストの同時実行数（anyio スレッドプールの既定は 40）")
+    ap.add_argument("--latency", type=float, default=0.05, help="スタブの応答遅延（秒）")
+    ap.add_argument("--pools", default="10,20,40,50")
+    args = ap.parse_args()
+
+    warnings.filterwarnings("ignore")                            # 自己署名証明書の InsecureRequestWarning
+    logging.getLogger("urllib3").setLevel(logging.ERROR)         # "Connection pool is full, discarding connection"
+    payload = os.urandom(8 * 1024)                               # サムネイル程度
+
+    with StubServer(_s3_handler, latency=args.latency, tls=True) as stub:
+        print(f"threads={args.threads} requests={args.requests} latency={args.latency * 1000:.0f}ms")
+        print(f"{'pool':>5} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'conns':>6}")
+        for pool in (int(p) for p in args.pools.split(",")):
+            s3 = _client(stub.url, pool)
+            s3.head_object(Bucket="docs", Key="warmup")
+            before = stub.connections
+            elapsed, lat = _run(s3, args.requests, args.threads, payload)
+            lat.sort()
+            print(
+                f"{pool:>5} {args.requests / elapsed:>8.0f} {statistics.median(lat) * 1000:>7.1f} "
+                f"{lat[int(len(lat) * 0.99) - 1] * 1000:>7.1f} {stub.connections - before:>6}"
+            )
+            s3.close()
+
+
+if __name__ == "__main__":
+    main_()
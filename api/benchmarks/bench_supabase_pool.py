@@ -0,0 +1,86 @@
+"""
+Supabase REST 呼び出し: 従来の urllib（呼び出しごとに新規接続）と共有 httpx プール（_supabase_request）の比較。
+ローカルの PostgREST スタブ（HTTPS・自己署名）に対して、スレッド数ごとのスループットとレイテンシを測る。
+
+    cd api && python benchmarks/bench_supabase_pool.py [--requests 400] [--latency 0.005]
+"""
+import argparse
+import json
+import os
+import ssl
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import http_client  # noqa: E402
+import main  # noqa: E402
+from benchmarks._stub import StubServer  # noqa: E402
+
+_INSECURE = ssl._create_unverified_context()   # スタブは自己署名証明書
+
+
+def _legacy_get(path: str) -> list:
+    """v2.12 以前の _supabase_get 相当（urlopen ごとに TCP + TLS ハンドシェイク）"""
+    req = urllib.request.Request(
+        f"{main.SUPABASE_URL}/rest/v1/{path}",
+        headers=main._supabase_headers("anon", "jwt", False, None),
+    )
+    with urllib.request.urlopen(req, timeout=10, context=_INSECURE) as resp:
+        return json.loads(resp.read() or b"[]")
+
+
+def _pooled_get(path: str) -> list:
+    return main._supabase_request("GET", path, "anon", "jwt", timeout=10)
+
+
+def _run(fn, n: int, threads: int) -> tuple[float, list[float]]:
+    lat: list[float] = []
+
+    def one(i: int) -> None:
+        t = time.perf_counter()
+        fn(f"profiles?id=eq.{i}&select=hospital_id")
+        lat.append(time.perf_counter() - t)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(one, range(n)))
+    return time.perf_counter() - t0, lat
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.005, help="スタブの応答遅延（秒）")
+    args = ap.parse_args()
+
+    with StubServer(latency=args.latency, tls=True) as stub:
+        main.SUPABASE_URL = stub.url
+        pooled = httpx.Client(
+            limits=http_client._limits(), timeout=httpx.Timeout(10.0, pool=http_client.HTTP_POOL_TIMEOUT),
+            verify=False,
+        )
+        main.get_http_client = lambda: pooled
+
+        print(f"{'threads':>7} {'impl':>7} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'conns':>6}")
+        for threads in (1, 4, 16):
+            for name, fn in (("urllib", _legacy_get), ("pooled", _pooled_get)):
+                fn("warmup")
+                before = stub.connections
+                elapsed, lat = _run(fn, args.requests, threads)
+                lat.sort()
+                print(
+                    f"{threads:>7} {name:>7} {args.requests / elapsed:>8.0f} "
+                    f"{statistics.median(lat) * 1000:>7.1f} {lat[int(len(lat) * 0.99) - 1] * 1000:>7.1f} "
+                    f"{stub.connections - before:>6}"
+                )
+        pooled.close()
+
+
+if __name__ == "__main__":
+    main_()
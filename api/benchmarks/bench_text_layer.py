@@ -0,0 +1,131 @@
+"""
+PDF の OCR: 全ページ Vision OCR（OCR_TEXT_LAYER_MIN_CHARS=0）と、テキストレイヤーのあるページを描画せずに
+本文を使う方式（_TEXT_LAYER_POLICY）の比較。電子カルテ出力（テキスト）とスキャン画像が混ざったコーパスで、
+描画 + OCR の所要時間・Vision の呼び出し回数・送信した画像のサイズを測る。
+Vision API はスタブ（--vision-latency 秒待ってから固定の文字列を返す）に置き換える。
+
+    cd api && python benchmarks/bench_text_layer.py [--vision-latency 0.8] [--pages 6]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pypdfium2 as pdfium  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+import main  # noqa: E402
+
+_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_WORDS = "Referral letter patient diagnosis hypertension medication follow-up clinic date history allergy".split()
+
+
+def _text_pdf(pages: int, seed: int, lines: int = 50) -> bytes:
+    """Helvetica のテキストだけの PDF（電子カルテの出力と同じ構造）"""
+    rnd = random.Random(seed)
+    objs: list = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        ops = ["BT /F1 10 Tf 14 TL 50 800 Td"]
+        ops += ["(" + " ".join(rnd.choice(_WORDS) for _ in range(10)) + ") Tj T*" for _ in range(lines)]
+        stream = "\n".join(ops + ["ET"]).encode()
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        objs.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>"
+        )
+        kids.append(len(objs))
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>"
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, o in enumerate(objs, 1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n".encode() + (o if isinstance(o, bytes) else o.encode()) + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{o:010d} 00000 n \n" for o in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _scan_pdf(pages: int, seed: int) -> bytes:
+    """スキャン画像だけの PDF（A4 200dpi のグレースケール画像）"""
+    font = ImageFont.truetype(_FONT, 28)
+    imgs = []
+    for s in range(pages):
+        img = Image.new("L", (1654, 2339), 255)
+        d = ImageDraw.Draw(img)
+        for y in range(150, 2200, 45):
+            d.text((120, y), f"scanned referral line {seed}-{s} {y}", fill=0, font=font)
+        imgs.append(img)
+    buf = io.BytesIO()
+    imgs[0].save(buf, "PDF", save_all=True, append_images=imgs[1:], resolution=200)
+    return buf.getvalue()
+
+
+def _merge(*docs: bytes) -> bytes:
+    out = pdfium.PdfDocument.new()
+    for d in docs:
+        out.import_pages(pdfium.PdfDocument(d))
+    buf = io.BytesIO()
+    out.save(buf)
+    return buf.getvalue()
+
+
+def main_() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vision-latency", type=float, default=0.8, help="Vision API スタブの応答時間（秒）")
+    ap.add_argument("--pages", type=int, default=6, help="コーパスごとのページ数（偶数）")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    calls: list[int] = []
+    lock = threading.Lock()
+
+    def fake_vision(images, timeout, mime_types=None, details=None):
+        with lock:
+            calls.append(len(images))
+        time.sleep(args.vision_latency)
+        return "VISION"
+
+    main._call_openai_ocr = fake_vision
+
+    n, q = args.pages, max(args.pages // 4, 1)
+    corpora = {
+        "text": _text_pdf(n, 1),
+        "mixed": _merge(_text_pdf(q, 1), _scan_pdf(n // 2 - q, 2), _text_pdf(n - n // 2 - q, 3), _scan_pdf(q, 4)),
+        "scan": _scan_pdf(n, 5),
+    }
+    policies = {"all-vision": main.TextLayerPolicy(min_chars=0), "text-layer": main._TEXT_LAYER_POLICY}
+    enc = main.get_page_encoding()
+    main.warm_up_render_pool()
+
+    print(f"{'corpus':>7} {'policy':>11} {'total s':>8} {'render s':>9} {'vision':>7} {'text pg':>8} {'img KB':>7}")
+    for cname, pdf in corpora.items():
+        for pname, policy in policies.items():
+            best = None
+            for _ in range(args.runs):
+                calls.clear()
+                t0 = time.perf_counter()
+                pages, _ = main.render_pdf_pages(pdf, main._MAX_OCR_PAGES, enc, timeout=60, text_layer=policy)
+                t1 = time.perf_counter()
+                main._ocr_pdf_pages(pages, timeout=60)
+                t2 = time.perf_counter()
+                if best is None or t2 - t0 < best[0]:
+                    best = (t2 - t0, t1 - t0, len(calls), sum(p.text is not None for p in pages),
+                            sum(len(p.image.data) for p in pages if p.image is not None))
+            total, render, vision, text_pages, img = best
+            print(
+                f"{cname:>7} {pname:>11} {total:>8.2f} {render:>9.2f} {vision:>7} {text_pages:>8} {img / 1024:>7.0f}"
+            )
+    main.shutdown_render_pool()
+
+
+if __name__ == "__main__":
+    main_()
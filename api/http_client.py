@@ -0,0 +1,121 @@
+import logging
+import os
+from functools import lru_cache
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# 共有 HTTP トランスポート（Supabase REST 用。R2 のオブジェクト転送は別プール）
+#  - コネクションプール + keep-alive で TCP/TLS ハンドシェイクを使い回す
+#  - HTTP/2 は HTTP_HTTP2=true かつ h2 がインストール済みの場合のみ有効
+#  - httpx.Client はスレッドセーフ（FastAPI のスレッドプールから共有して使う）
+#  - async def のエンドポイント / Webhook は httpx.AsyncClient を使う（イベントループを止めない）
+#  - 呼び出しごとのタイムアウトは request_timeout() で渡す
+#    （httpx は timeout=<秒数> を Timeout(秒数) に変換してクライアント既定値を丸ごと置き換えるため、
+#      秒数だけを渡すとプール空き待ちの上限 HTTP_POOL_TIMEOUT が効かなくなる）
+#  - R2 の署名 URL での取得・PUT は get_r2_http_client()（R2_HTTP_POOL_*）を使う
+#    （数十 MB の PDF の転送が接続を長く占有し、認証・一覧などの Supabase 呼び出しがプール待ちにならないように）
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    v = os.getenv(name, "").strip()
+    try:
+        return float(v) if v else default
+    except ValueError:
+        return default
+
+
+HTTP_POOL_MAX_CONNECTIONS = _env_int("HTTP_POOL_MAX_CONNECTIONS", 20)     # 同時接続の上限
+HTTP_POOL_MAX_KEEPALIVE   = _env_int("HTTP_POOL_MAX_KEEPALIVE", HTTP_POOL_MAX_CONNECTIONS)  # 待機させておく keep-alive 接続数
+# ※ max_connections より小さいと、同時実行がそれを超えた分の接続は返却のたびに閉じられ、毎回ハンドシェイクし直す
+HTTP_POOL_KEEPALIVE_EXPIRY = _env_float("HTTP_POOL_KEEPALIVE_EXPIRY", 30.0)  # 未使用接続を閉じるまでの秒数
+HTTP_POOL_TIMEOUT = _env_float("HTTP_POOL_TIMEOUT", 5.0)                  # プール空き待ちの上限秒数
+
+R2_HTTP_POOL_MAX_CONNECTIONS = _env_int("R2_HTTP_POOL_MAX_CONNECTIONS", 10)  # R2 転送用の同時接続の上限
+
+
+def request_timeout(seconds: float) -> httpx.Timeout:
+    """呼び出しごとのタイムアウト（接続・読み書きは seconds、プール空き待ちは HTTP_POOL_TIMEOUT）"""
+    return httpx.Timeout(seconds, pool=min(HTTP_POOL_TIMEOUT, seconds))
+
+
+@lru_cache(maxsize=1)
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP_HTTP2", "").strip().lower() not in {"1", "true", "yes"}:
+        return False
+    try:
+        import h2  # noqa: F401, PLC0415
+    except ImportError:
+        logger.warning("HTTP_HTTP2 が有効ですが h2 が未インストールのため HTTP/1.1 で接続します")
+        return False
+    return True
+
+
+def _limits(
+    max_connections: int = HTTP_POOL_MAX_CONNECTIONS, max_keepalive: int = HTTP_POOL_MAX_KEEPALIVE,
+) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    プロセス共有の同期 HTTP クライアントを遅延生成。
+    タイムアウトは呼び出しごとに request_timeout() で指定する（既定は 10 秒 + プール待ち HTTP_POOL_TIMEOUT）。
+    """
+    return httpx.Client(
+        limits=_limits(),
+        http2=_http2_enabled(),
+        timeout=httpx.Timeout(10.0, pool=HTTP_POOL_TIMEOUT),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_r2_http_client() -> httpx.Client:
+    """
+    R2 の署名 URL 専用の同期 HTTP クライアント（OCR・サムネイルの取得 / PUT）。
+    get_http_client と設定は同じで、プールだけを分ける（R2_HTTP_POOL_MAX_CONNECTIONS）。
+    """
+    return httpx.Client(
+        limits=_limits(R2_HTTP_POOL_MAX_CONNECTIONS, R2_HTTP_POOL_MAX_CONNECTIONS),
+        http2=_http2_enabled(),
+        timeout=httpx.Timeout(10.0, pool=HTTP_POOL_TIMEOUT),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    プロセス共有の非同期 HTTP クライアントを遅延生成（async エンドポイント / Webhook 用）。
+    uvicorn ワーカーのイベントループ上でのみ使用すること。
+    """
+    return httpx.AsyncClient(
+        limits=_limits(),
+        http2=_http2_enabled(),
+        timeout=httpx.Timeout(10.0, pool=HTTP_POOL_TIMEOUT),
+    )
+
+
+def get_pool_config() -> dict:
+    """現在のプール設定（/api/metrics 用）"""
+    return {
+        "max_connections":           HTTP_POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_POOL_MAX_KEEPALIVE,
+        "keepalive_expiry":          HTTP_POOL_KEEPALIVE_EXPIRY,
+        "http2":                     _http2_enabled(),
+        "r2_max_connections":        R2_HTTP_POOL_MAX_CONNECTIONS,
+    }
@@ -54,13 +54,209 @@
 #           (C) 時点では "A:主訴" のまま → ":" を含む → 見出し判定が常にスキップされていた。
 # 修正: ルールC内で _CELL_PREFIX_RE を先に適用した heading_text / next_body で判定・出力する。
 #       処理順（B→C→D）・他ルール・認証・RLS は変更なし。
+#
+# 変更点（v2.9 JWKS キャッシュを single-flight + バックグラウンド更新に変更）:
+# 1. _refresh_jwks: fetch を _jwks_fetch_lock で直列化し、待機スレッドは先行 fetch の結果を共有する
+# 2. TTL の _JWKS_REFRESH_AHEAD 秒前からバックグラウンドスレッドで更新（リクエストは待たせない）
+# 3. 更新失敗時は旧鍵で継続（_JWKS_MAX_STALE まで）。状態の読み書きは _jwks_lock で保護
+# 4. 未知 kid による強制再取得は _JWKS_FORCED_MIN_INTERVAL 秒に1回まで（偽造トークン対策）
+# 5. fetch の失敗は待機スレッドにも伝える（起動直後の JWKS 障害が 401「kid 不一致」ではなく 5xx になる）
+#
+# 変更点（v2.10 検証済みトークンキャッシュを追加）:
+# 1. _TtlLruCache: 有効期限付き LRU（スレッドセーフ、hits/misses/evictions を計測）
+# 2. verify_jwt: sha256(token) をキーに検証済みクレームを exp までキャッシュし、署名検証を省略
+# 3. GET /api/metrics: キャッシュ統計（ヒット率）を返す（JWT 必須）
+#
+# 変更点（v2.11 hospital_id 解決の profiles 照会を削減）:
+# 1. _get_hospital_id: JWT クレーム（hospital_id / app_metadata.hospital_id）を優先して使用
+# 2. クレームが無い場合は user_id 単位の TTL キャッシュ（_HOSPITAL_ID_CACHE_TTL）→ profiles の順
+# 3. _invalidate_hospital_id でキャッシュ破棄、/api/metrics に回避件数（lookups_avoided）を追加
+# 4. POST /api/me/hospital-id/refresh: 呼び出し元ユーザーのキャッシュを破棄して profiles から再取得する
+#    （フロントはログイン・再読込時に呼ぶ。所属変更が TTL を待たずに反映される）
+#
+# 変更点（v2.12 Supabase REST ヘルパーを共有コネクションプールに統一）:
+# 1. http_client.get_http_client: httpx の共有クライアント（keep-alive / プールサイズは環境変数で設定、HTTP/2 は任意）
+# 2. _supabase_request: 6つの Supabase ヘルパーの通信・エラー・タイムアウト処理を1か所に集約
+# 3. 各ヘルパーのシグネチャ・戻り値・タイムアウト秒数・エラーメッセージは従来どおり
+# 4. 呼び出しごとのタイムアウトは request_timeout() で渡す（秒数だけ渡すと HTTP_POOL_TIMEOUT が無効になっていた）
+#    HTTP_POOL_MAX_KEEPALIVE の既定を max_connections と同じにする（同時 10 本超で接続を作り直していた）
+#    比較ベンチマーク: benchmarks/bench_supabase_pool.py
+#
+# 変更点（v2.13 async 処理のブロッキング I/O を排除）:
+# 1. Webhook / FAX送信（async def）の Supabase 呼び出しを _supabase_*_async（httpx.AsyncClient）に変更
+# 2. CloudFAX（ステータス取得 / PDF取得 / 送信 POST）を非同期クライアントに変更
+# 3. R2 の PUT / HEAD は署名済み URL + 非同期クライアントで実行（boto3 の同期 I/O を使わない）
+# 4. PDF 妥当性確認・user JWT 照会など同期処理は run_in_threadpool で実行
+#
+# 変更点（v2.14 アサインを DB 関数 assign_document() の1回呼び出しに変更）:
+# 1. db/migrations/004_assign_document_rpc.sql: 状態確認・担当切替・status 更新・ログを1トランザクションで実行
+# 2. _assign_impl: REST 5回 → RPC 1回。documents 行ロックで is_current 切替と INSERT の競合を解消
+# 3. _SupabaseError: PostgREST のエラーコードを保持（_supabase_rpc で HTTP ステータスへ変換）
+#
+# 変更点（v2.15 一括アサイン API を追加）:
+# 1. POST /api/documents/assign-bulk: doc_ids（共通指定）/ items（個別指定）で最大100件を一括アサイン
+# 2. db/migrations/005_assign_documents_bulk_rpc.sql: 1クエリで全件検証し、まとめて書き込む DB 関数
+# 3. 文書ごとの結果（ok / error / status）をリクエスト順で返す
+# 4. owner_user_id も文書ごとに UUID 検証（invalid_owner_user_id）。RLS で status 更新が 0 行になった文書は
+#    DB 関数側で update_denied とし、担当切替・ログも書かない
+#
+# 変更点（v2.16 presigned URL の生成をローカル SigV4 署名に変更）:
+# 1. r2_presign.py: boto3 の generate_presigned_url と同一の URL を生成する軽量プリサイナー
+# 2. 派生署名鍵は日付単位でキャッシュ（URL ごとの HMAC は1回のみ）
+# 3. upload / download / OCR / FAX送信 / R2 PUT・HEAD の7か所を置き換え（呼び出し形式は同じ）
+#
+# 変更点（v2.17 一括 presign-download API を追加）:
+# 1. POST /api/presign-download-batch: 最大100件の file_key に対する署名 URL を1リクエストで発行
+# 2. _assert_download_access_many: アクセス確認を documents?file_key=in.(...) の1クエリで実行
+# 3. _validate_download_key / _download_meta を単体版と共通化（単体版の挙動は変更なし）
+#
+# 変更点（v2.18 署名済みダウンロード URL をキャッシュ）:
+# 1. _presign_download: (file_key, mode, filename) 単位で発行済み URL を再利用（_TtlLruCache）
+# 2. 残り有効期限が PRESIGN_URL_MIN_TTL 秒（既定120）を切ったエントリは作り直す
+# 3. /api/metrics に presigned_url_cache（ヒット率・退避数）を追加
+#
+# 変更点（v2.19 マルチパートアップロード / 形式ごとのサイズ上限）:
+# 1. POST /api/multipart-upload/{initiate,presign-parts,complete,abort}: R2 マルチパートで並列・再送可能なアップロード
+# 2. _MAX_PDF_SIZE_BYTES（全形式 10MB）を廃止し、_MAX_FILE_SIZE_BYTES（形式ごと、環境変数で上書き可）に置き換え
+# 3. presign-upload は size を受け取った場合に上限を事前チェック。complete は確定後の実サイズで再確認
+# 4. POST /api/multipart-upload/list-parts: R2 に届いたパート（番号・ETag・サイズ）を返す。
+#    ブラウザは upload_id を localStorage に保存し、再読み込み・回線断の後は未送信パートだけ送って再開する
+#
+# 変更点（v2.20 内容ハッシュによる重複排除）:
+# 1. db/migrations/006_content_blobs.sql: (hospital_id, sha256) → 正規 R2 キー + OCR 成果物 の索引
+# 2. FAX受信 Webhook: 自院で保存済みの内容なら R2 PUT を省略して既存キーを参照（HEAD で存在確認）
+# 3. /api/ocr・FAX受信OCR: 保存済みの OCR テキスト / 構造化JSON を再利用（OpenAI 呼び出しを省略）
+# 4. sha256 はサーバー側で計算した値のみ使用。索引が使えない場合は従来どおり処理（best-effort）
+# 5. _assert_download_access: 同じ file_key を共有する documents のいずれかが自院なら許可
+# 6. /api/metrics に dedup（省略した PUT 回数・バイト数、OCR / 構造化の省略回数）を追加
+#
+# 変更点（v2.21 OCR 用 R2 取得を上限付きストリーミングに変更）:
+# 1. _r2_fetch_bounded: Content-Length が上限超過なら本文を読まずに中止、読み込み中も上限で打ち切り
+# 2. /api/ocr・FAX受信OCR の urlopen + read()（全量読み込み後にサイズ判定）を置き換え
+# 3. 取得は共有 HTTP クライアント（keep-alive）経由。1件あたりのメモリ上限 = 形式ごとのサイズ上限
+# 4. R2 の取得・サムネイル PUT は Supabase 用とは別のプール（get_r2_http_client、R2_HTTP_POOL_MAX_CONNECTIONS）を使う
+#
+# 変更点（v2.22 R2 オブジェクトのローカルディスクキャッシュ）:
+# 1. object_cache.py: 容量上限付きのディスク LRU キャッシュ（原子的書き込み・mtime による LRU 退避）
+# 2. _r2_read_object: キャッシュ → 無ければ R2 から上限付き取得してキャッシュへ保存
+#    /api/ocr（送信前・debug / text_only の再実行）と FAX受信OCR が同じ file_key を再取得しない
+# 3. FAX受信 Webhook: R2 へ保存した PDF をそのままキャッシュへ入れる（直後の受信OCRは R2 を読まない）
+# 4. file_key は UUID で内容不変のため無効化なし。R2_CACHE_DIR / R2_CACHE_MAX_MB（0 で無効）
+# 5. /api/metrics に object_cache（ヒット / ミス / 配信バイト数 / 退避回数）を追加
+#
+# 変更点（v2.23 R2 用 boto3 クライアントの並列度を調整可能に）:
+# 1. r2_client.py: プール接続数（既定 50）・リトライ方式 / 回数・接続 / 読み込みタイムアウト・TCP keepalive を環境変数化
+#    （R2_MAX_POOL_CONNECTIONS / R2_RETRY_MODE / R2_MAX_ATTEMPTS / R2_CONNECT_TIMEOUT / R2_READ_TIMEOUT / R2_TCP_KEEPALIVE）
+# 2. クライアント生成を専用 Session + ロックで1回に限定（boto3 のデフォルトセッションはスレッドセーフでない）
+# 3. /api/metrics に r2_client（有効な設定値）を追加
+#
+# 変更点（v2.24 一覧カード用サムネイルを documents.preview_file_key に保存）:
+# 1. thumbnail.py: PDF は1ページ目を pypdfium2 で描画、画像は縮小 → WebP（長辺 320px）
+# 2. POST /api/documents/{id}/thumbnail: アップロード後にフロントが呼ぶ（生成済みなら何もしない）
+# 3. FAX受信 Webhook: バックグラウンドでサムネイル生成（ディスクキャッシュ済みの PDF を使う）
+# 4. キーは previews/<元ファイルの UUID>.webp。presign-download（単体・一括）は
+#    preview_file_key で documents を照合して発行する
+# 5. preview_file_key はサムネイル専用になったため、フロントの全体プレビューは常に file_key を使う
+#
+# 変更点（v2.25 OCR 結果の永続キャッシュ）:
+# 1. ocr_cache.py: (hospital_id, sha256, mode, prompt_version) → OCR テキスト / 正規化テキスト / 構造化JSON / アラート
+#    をローカル SQLite に保存（TTL: OCR_CACHE_TTL_DAYS、容量: OCR_CACHE_MAX_MB。超過時は最終利用が古い順に削除）
+# 2. prompt_version = OCR / 構造化プロンプト・モデル・ページ上限のハッシュ（変更すると旧結果は使われない）
+# 3. /api/ocr・FAX受信OCR: content_blobs（Supabase）より先に参照し、ヒット時は描画・OpenAI 呼び出しをすべて省略
+#    text_only は full の結果でも満たせる（構造化JSON は返さない）
+# 4. meta.ocr_cached を追加。/api/metrics に ocr_cache を追加
+# 5. content_blobs にも ocr_version（= prompt_version）を保存。一致しない行の OCR テキスト / 構造化JSON は
+#    再利用せず、新しい結果で上書きする（migration 006 に ocr_version 列を追加）
+#
+# 変更点（v2.26 PDF 描画を専用プロセスプールで実行）:
+# 1. pdf_render_pool.py: spawn のワーカープロセスで pypdfium2 描画 + PNG エンコード（1ページ = 1タスクで並列）
+#    PDF_RENDER_WORKERS（既定: CPU 数、最大4）/ PDF_RENDER_MAX_TASKS_PER_CHILD（ワーカー再作成）/ PDF_RENDER_TIMEOUT
+# 2. PDF のページ画像化・サムネイル・Webhook の PDF 妥当性確認で pdfium をリクエストスレッドから排除
+#    （pdfium はスレッドセーフでないため、スレッドプールからの同時呼び出しをやめる）
+# 3. タイムアウト時はワーカーを強制終了して作り直す（/api/ocr は 504）。起動時にワーカーを事前起動
+# 4. /api/metrics に pdf_render（タスク数・タイムアウト・異常終了・再起動回数）を追加
+# 5. PDF は一時ファイル（0600）に1回書いてパスをワーカーに渡す。総ページ数を先に調べ、存在するページだけ投入する
+# 6. Webhook の PDF 妥当性確認で描画プールのタイムアウト・異常終了（混雑・他リクエストのタイムアウトによる再起動）を
+#    「不正な PDF」（PDF_VALIDATE）と区別し、error_stage=PDF_RENDER_POOL（一時的。再送で再処理）として記録する
+#
+# 変更点（v2.27 Vision OCR 用ページ画像のエンコード設定）:
+# 1. page_encoder.py: 描画倍率を長辺 OCR_IMAGE_LONG_EDGE px から決める（適応 DPI。従来は scale=2.0 固定）
+#    グレースケール / 1bit 白黒、PNG / JPEG / WebP と品質を環境変数で選択（既定: 長辺1600px・グレー・JPEG q80）
+# 2. エンコードは PDF 描画ワーカー内で実行。ページごとに MIME と detail（auto / low / high）を Vision API に渡す
+#    長辺 512px 以下のページは detail=low（high にしても拡大されるだけ）
+# 3. エンコード設定を OCR 結果キャッシュの prompt_version に含める
+# 4. meta.image_bytes（Vision API に送った画像の合計バイト数）を追加。/api/metrics に ocr_image を追加
+#
+# 変更点（v2.28 ページ単位の並列 Vision OCR）:
+# 1. PDF は OCR_PAGE_GROUP_SIZE ページ（既定: 1）ずつ別リクエストで並列に OCR し、ページ順に結合する
+#    同時呼び出し数はプロセス全体で OCR_PAGE_CONCURRENCY（既定: 4）まで。残り時間を超えたら 504
+# 2. 複数ページの結果は「--- ページ N ---」の区切り行を挟んで結合（1ページの文書は従来どおり区切りなし）
+# 3. ページ上限 _MAX_OCR_PAGES を 3 → OCR_MAX_PAGES（既定: 20）に引き上げ。超過分は warnings で通知
+# 4. meta.page_timings（ページ（グループ）ごとの所要時間・文字数）を追加
+# 5. 時間切れ・一部ページ（グループ）の OCR 失敗では文書全体を 504 / 502 にせず、読み取れたページを区切り行付きで返す
+#    読み取れなかったページは warnings と meta.unread_pages で通知し、OCR 結果キャッシュ・content_blobs には保存しない
+#    （1ページも読み取れなかった場合のみ従来どおり 504 / 502）
+# 6. 1リクエストの Vision 同時呼び出しを OCR_PAGE_CONCURRENCY_PER_REQUEST（既定: 2）までに制限
+#    （プロセス全体の OCR_PAGE_CONCURRENCY とは別。ページの多い文書1件で全体の枠を占有しない）
+#
+# 変更点（v2.29 OCR のストリーミング応答）:
+# 1. POST /api/ocr/stream（compat: /ocr/stream）: /api/ocr と同じ処理を段階ごとに NDJSON で返す
+#    Accept: text/event-stream の場合は Server-Sent Events 形式
+# 2. イベント: fetched → rendered → page（ページ順とは限らない）→ text → normalized → alerts → structured
+#    → result（/api/ocr と同じ JSON）。失敗時は error（status / detail）で終了
+# 3. アラート生成を構造化JSON生成の前に移動（どちらも normalized のみを入力とするため結果は同じ）
+#
+# 変更点（v2.30 非同期 OCR ジョブ API）:
+# 1. POST /api/ocr/jobs（compat: /ocr/jobs）: 受付だけ行い job_id を即時返す（202）
+#    GET /api/ocr/jobs/{job_id}: 状態（queued / running / succeeded / failed）と結果（投入したユーザーのみ）
+# 2. ocr_jobs.py: ジョブ状態をローカル SQLite に保存（再起動で中断されたジョブは起動時に再実行）
+# 3. OCR は専用ワーカースレッド（OCR_JOB_WORKERS）で実行し、全体上限は OCR_JOB_TIMEOUT_SECS（既定 300 秒）
+#    未完了ジョブが OCR_JOB_MAX_PENDING を超えたら 429
+# 4. webhook_url（任意）: 完了時に {job_id, status} を POST。https かつ OCR_JOB_WEBHOOK_HOSTS のホストのみ（SSRF 対策）
+# 5. _ocr_impl を認可（_ocr_impl）と本体（_ocr_run）に分割。/api/metrics に ocr_jobs を追加
+#
+# 変更点（v2.31 PDF テキストレイヤーの利用）:
+# 1. 電子カルテ等が出力した PDF はページごとにテキストレイヤーを判定し、使えるページは Vision OCR しない
+#    条件: 文字数 ≥ OCR_TEXT_LAYER_MIN_CHARS（既定 50、0 で無効）かつ 画像の面積比 < OCR_TEXT_LAYER_MAX_IMAGE_COVERAGE
+#    （既定 0.5。スキャン画像 + 透明テキストの PDF は Vision に回す）かつ 文字化けが少ない
+# 2. 判定は PDF 描画ワーカー内で行い、テキストを使うページは描画もしない。残りのページだけ並列 Vision OCR
+# 3. meta.source_type: "pdf"（全ページ Vision）/ "pdf_text"（全ページテキスト）/ "pdf_mixed"
+#    meta.page_timings の各要素に source（"text_layer" / "vision"）を追加
+# 4. 全ページがテキストレイヤーなら OPENAI_API_KEY 未設定でも抽出できる
+# 5. FAX 解析が OCR 結果キャッシュに保存する source_type もページごとの経路から決める
+#    （固定の "pdf" だと、/api/ocr がそのキャッシュを使ったとき meta.source_type が実際の経路と食い違う）
+#
+# 変更点（v2.32 空白・重複ページの除外）:
+# 1. PDF の描画後、空白ページ（インク密度 < OCR_SKIP_BLANK_INK_RATIO）と前のページと同じ内容のページ
+#    （知覚ハッシュ + 縮小2値画像の差分 ≤ OCR_SKIP_DUPLICATE_MAX_DIFF）を Vision OCR に送らない（page_analysis.py）
+# 2. 除外したページは meta.skipped_pages に記録し、warnings でも通知する
+# 3. 除外で空いた枠を使えるよう、先頭 OCR_MAX_PAGES + OCR_SKIP_LOOKAHEAD_PAGES ページまで描画する
+#    （OCR するのは最大 OCR_MAX_PAGES ページのまま）
+# 4. /api/metrics に ocr_page_skip（除外したページ数の累計）を追加
+# 5. 重複ページの除外は既定で無効（OCR_SKIP_DUPLICATE_MAX_DIFF=0）に変更
+#    同じ様式で数値1つだけ違う検査結果では縮小2値画像の差分が 0.001〜0.005 程度しかなく、
+#    しきい値 0.01 では別のページを重複として落としていたため。有効にするのは同じページの再送が多い場合のみ
+# 6. 重複ページの除外を削除（空白ページの除外のみ残す。OCR_SKIP_DUPLICATE_MAX_DIFF は廃止）
+#    余白を除いた高解像度の2値画像・局所的な差分でも、数値1桁だけ違うページと点ノイズの乗った再送ページの
+#    差が重なり、安全なしきい値を決められないため
+#
+# 変更点（v2.33 撮影画像の前処理）:
+# 1. PNG / JPEG の OCR（/api/ocr・FAX 解析）でアップロードされた画像をそのまま送らず、page_encoder.encode_photo で整える
+#    EXIF の向きを反映 → 長辺 OCR_IMAGE_LONG_EDGE px に縮小 → グレースケール → 照明むらの補正・コントラストの正規化
+#    → OCR_IMAGE_FORMAT でエンコード（OCR_IMAGE_NORMALIZE=false で補正のみ無効）
+# 2. Pillow で開けない画像は従来どおり元のバイト列を送る
 
+import asyncio
 import base64
+import dataclasses
+import hashlib
+import hmac
 import io
 import json
 import logging
 import os
 import re
+import threading
 import time
 import unicodedata
 import urllib.error
@@ -68,20 +264,57 @@ import urllib.parse
 import urllib.request
 import uuid
 
-import pypdfium2 as pdfium
+import httpx
+from botocore.exceptions import ClientError
 from jose import jwt as jose_jwt
 from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
 
 from fastapi import BackgroundTasks, Body, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-from r2_client import get_bucket_name, get_s3_client
+from http_client import (
+    get_async_http_client, get_http_client, get_pool_config, get_r2_http_client, request_timeout,
+)
+from object_cache import get_object_cache
+from ocr_cache import get_ocr_cache
+from ocr_jobs import get_ocr_job_store
+from page_analysis import PageSkipPolicy, get_page_skip_stats, select_pages
+from page_encoder import EncodedPage, encode_photo, get_page_encoding
+from pdf_render_pool import (
+    PdfPage, RenderCrashed, RenderTimeout, TextLayerPolicy, get_render_pool_stats, pdf_page_count, render_pdf_pages,
+    shutdown as shutdown_render_pool, warm_up as warm_up_render_pool,
+)
+from r2_client import get_bucket_name, get_s3_client, get_s3_client_config
+from r2_presign import get_r2_presigner
+from thumbnail import (
+    PREVIEW_KEY_RE, THUMBNAIL_CONTENT_TYPE, THUMBNAIL_EXTS, preview_key_for, render_thumbnail,
+)
 
-from typing import Optional, List, Dict, Tuple
+from collections import OrderedDict
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Callable, Optional, List, Dict, Tuple
 
-app = FastAPI()
+@asynccontextmanager
+async def _lifespan(_app):
+    # PDF 描画ワーカーを事前起動（spawn は1プロセスあたり数百 ms かかるため初回リクエストで待たせない）
+    threading.Thread(target=warm_up_render_pool, name="pdf-render-warmup", daemon=True).start()
+    # 前回プロセスで未完了だった OCR ジョブを再投入
+    _resume_ocr_jobs()
+    yield
+    # 実行待ちのジョブは queued のまま残り、次回起動時に再投入される
+    _ocr_job_executor().shutdown(wait=False, cancel_futures=True)
+    _ocr_job_executor.cache_clear()
+    shutdown_render_pool()
+
+
+app = FastAPI(lifespan=_lifespan)
 
 # ----------------------------
 # CORS（本番 + ローカル）
@@ -120,22 +353,104 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)   # 1リクエスト1行の INFO ログを抑制
+
+
+# ----------------------------
+# TTL 付き LRU キャッシュ（スレッドセーフ、プロセス内）
+# ----------------------------
+class _TtlLruCache:
+    """
+    エントリごとに有効期限（絶対時刻）を持つ LRU キャッシュ。
+    - maxsize を超えたら最も長く使われていないエントリを捨てる
+    - get 時に期限切れ（残り min_ttl 秒以下）のエントリは捨てて miss 扱い
+    - hits / misses / evictions を数える（stats() でヒット率を返す）
+    FastAPI のスレッドプールから同時に呼ばれるため、全操作を1本のロックで保護する。
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._data: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, min_ttl: float = 0.0):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at - now <= min_ttl:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at: float) -> None:
+        if self._maxsize <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size":      len(self._data),
+                "maxsize":   self._maxsize,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
 
 
 # ----------------------------
-# JWKS キャッシュ（TTL: 1時間）
+# JWKS キャッシュ（TTL: 1時間、期限前にバックグラウンド更新）
+# - fetch は single-flight（同時に1本のみ。待機スレッドは結果を共有する）
+# - 更新失敗時は最後に取得できた鍵で継続（_JWKS_MAX_STALE まで）
+# - 未知 kid による強制再取得は _JWKS_FORCED_MIN_INTERVAL 秒に1回まで（偽造トークンによる取得嵐を防ぐ）
 # ----------------------------
 _jwks_keys: dict = {}     # kid -> JWK dict
 _jwks_fetched_at: float = 0.0
 _JWKS_CACHE_TTL = 3600    # seconds
+_JWKS_REFRESH_AHEAD = 300          # 期限の何秒前からバックグラウンド更新するか
+_JWKS_MAX_STALE = 6 * 3600         # 更新失敗時に旧鍵を使い続けてよい最大経過秒数
+_JWKS_FORCED_MIN_INTERVAL = 30     # 未知 kid による強制再取得の最短間隔（秒）
+_JWKS_RETRY_INTERVAL = 30          # 更新失敗後、旧鍵で継続中に再試行するまでの間隔（秒）
 
+_jwks_lock = threading.Lock()        # _jwks_* 状態の読み書き用
+_jwks_fetch_lock = threading.Lock()  # single-flight 用（保持中のスレッドだけが fetch する）
+_jwks_attempts: int = 0              # fetch 試行回数（成功/失敗とも。待機スレッドの重複 fetch 判定に使用）
+_jwks_forced_at: float = 0.0         # 直近の強制再取得時刻
+_jwks_failed_at: float = 0.0         # 直近の fetch 失敗時刻
+_jwks_last_error: Optional[HTTPException] = None  # 直近の fetch の失敗（成功時は None。待機スレッドに伝える）
+_jwks_bg_running: bool = False       # バックグラウンド更新スレッドが動作中か
 
-def _refresh_jwks() -> None:
+
+def _fetch_jwks() -> dict:
     """
-    Supabase の JWKS エンドポイントから公開鍵を取得してモジュール変数に格納する。
-    urllib のみ使用（新規ライブラリ不要）。
+    Supabase の JWKS エンドポイントから公開鍵を取得して kid -> JWK dict を返す。
+    urllib のみ使用（新規ライブラリ不要）。状態は変更しない。
     """
-    global _jwks_keys, _jwks_fetched_at
     if not SUPABASE_URL:
         raise HTTPException(status_code=500, detail="SUPABASE_URL が未設定です")
     url = f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
@@ -150,32 +465,138 @@ def _refresh_jwks() -> None:
         logger.exception("JWKS 取得エラー")
         raise HTTPException(status_code=500, detail="認証サービスへの接続に失敗しました")
 
-    _jwks_keys = {k["kid"]: k for k in data.get("keys", []) if "kid" in k}
-    _jwks_fetched_at = time.time()
+    return {k["kid"]: k for k in data.get("keys", []) if "kid" in k}
+
+
+def _refresh_jwks() -> None:
+    """
+    JWKS を再取得してモジュール変数に格納する（single-flight）。
+    他スレッドが fetch 中なら完了を待ち、その結果を共有する（自分では fetch しない）。
+    失敗時は HTTPException を raise するが、既存の _jwks_keys は消さない。
+    待機中に他スレッドの fetch が失敗した場合も同じエラーを raise する（呼び出し側で 5xx / 旧鍵継続を判断）。
+    """
+    global _jwks_keys, _jwks_fetched_at, _jwks_attempts, _jwks_failed_at, _jwks_last_error
+    with _jwks_lock:
+        attempts_before = _jwks_attempts
+    with _jwks_fetch_lock:
+        with _jwks_lock:
+            shared = _jwks_attempts != attempts_before
+            error = _jwks_last_error
+        if shared:
+            # 待っている間に他スレッドが fetch 済み → その結果を使う
+            if error is not None:
+                raise HTTPException(status_code=error.status_code, detail=error.detail)
+            return
+        try:
+            keys = _fetch_jwks()
+        except HTTPException as e:
+            with _jwks_lock:
+                _jwks_failed_at = time.time()
+                _jwks_last_error = e
+                _jwks_attempts += 1
+            raise
+        except Exception:
+            with _jwks_lock:
+                _jwks_failed_at = time.time()
+                _jwks_last_error = HTTPException(status_code=500, detail="認証サービスへの接続に失敗しました")
+                _jwks_attempts += 1
+            raise
+        with _jwks_lock:
+            _jwks_keys = keys
+            _jwks_fetched_at = time.time()
+            _jwks_last_error = None
+            _jwks_attempts += 1
+    logger.info("[jwks] 更新完了 keys=%d", len(keys))
+
+
+def _background_refresh_jwks() -> None:
+    """バックグラウンド更新スレッド本体。失敗しても旧鍵のまま継続する。"""
+    global _jwks_bg_running
+    try:
+        _refresh_jwks()
+    except Exception:
+        logger.warning("[jwks] バックグラウンド更新失敗（旧鍵で継続）")
+    finally:
+        with _jwks_lock:
+            _jwks_bg_running = False
+
+
+def _schedule_jwks_refresh() -> None:
+    """期限が近づいていればバックグラウンド更新を1本だけ起動する。"""
+    global _jwks_bg_running
+    with _jwks_lock:
+        if _jwks_bg_running:
+            return
+        _jwks_bg_running = True
+    threading.Thread(
+        target=_background_refresh_jwks, name="jwks-refresh", daemon=True
+    ).start()
 
 
 def _get_signing_key(kid: str) -> dict:
     """
     kid に対応する JWK dict を返す（TTL キャッシュ付き）。
-    キャッシュにない場合は強制再取得（key rotation 対応）。
+    - 期限 _JWKS_REFRESH_AHEAD 秒前: リクエストは待たせずバックグラウンド更新
+    - 期限切れ: 同期で再取得（single-flight）。失敗しても _JWKS_MAX_STALE 以内なら旧鍵で継続
+      （失敗後 _JWKS_RETRY_INTERVAL 秒間は再試行せず旧鍵を返す）
+    - キャッシュにない kid: key rotation 対応として強制再取得（_JWKS_FORCED_MIN_INTERVAL で間引き）
     """
-    global _jwks_keys, _jwks_fetched_at
+    global _jwks_forced_at
 
-    # TTL 切れなら再取得
-    if time.time() - _jwks_fetched_at > _JWKS_CACHE_TTL:
-        _refresh_jwks()
-
-    if kid in _jwks_keys:
-        return _jwks_keys[kid]
+    now = time.time()
+    age = now - _jwks_fetched_at
+    if (
+        _JWKS_CACHE_TTL < age <= _JWKS_MAX_STALE
+        and _jwks_keys
+        and now - _jwks_failed_at < _JWKS_RETRY_INTERVAL
+    ):
+        pass  # 直前に更新失敗済み → 再試行間隔まで旧鍵で継続（失敗時の同期 fetch 連打を防ぐ）
+    elif age > _JWKS_CACHE_TTL:
+        try:
+            _refresh_jwks()
+        except HTTPException:
+            if not _jwks_keys or age > _JWKS_MAX_STALE:
+                raise
+            logger.warning("[jwks] 更新失敗のため旧鍵で継続 age=%ds", int(age))
+    elif age > _JWKS_CACHE_TTL - _JWKS_REFRESH_AHEAD:
+        _schedule_jwks_refresh()
+
+    keys = _jwks_keys
+    if kid in keys:
+        return keys[kid]
+
+    # キャッシュにない → key rotation の可能性があるので強制再取得（間引きあり）
+    with _jwks_lock:
+        now = time.time()
+        allowed = now - _jwks_forced_at >= _JWKS_FORCED_MIN_INTERVAL
+        if allowed:
+            _jwks_forced_at = now
+    if allowed:
+        try:
+            _refresh_jwks()
+        except HTTPException:
+            if not _jwks_keys:
+                raise
+            logger.warning("[jwks] 強制再取得失敗（旧鍵で継続）kid=%s", kid)
+    else:
+        logger.info("[jwks] 強制再取得を間引き kid=%s", kid)
 
-    # キャッシュにない → key rotation の可能性があるので強制再取得
-    _refresh_jwks()
-    if kid not in _jwks_keys:
+    keys = _jwks_keys
+    if kid not in keys:
         raise HTTPException(
             status_code=401,
             detail="対応する公開鍵が見つかりません（kid 不一致）",
         )
-    return _jwks_keys[kid]
+    return keys[kid]
+
+
+# ----------------------------
+# 検証済みトークンキャッシュ
+# 同一 Bearer トークンの再検証（ヘッダー解析 + ES256 署名検証）を省略する。
+# キー: sha256(token)（トークン本体はメモリに保持しない）、有効期限: トークンの exp
+# ----------------------------
+_VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "2048"))
+_verified_token_cache = _TtlLruCache(_VERIFIED_TOKEN_CACHE_SIZE)
 
 
 # ----------------------------
@@ -188,8 +609,13 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) ->
     - audience: authenticated
     - issuer: https://<SUPABASE_URL>/auth/v1
     FastAPI の依存注入で同一リクエスト内は _bearer の結果がキャッシュされる。
+    検証済みトークンは exp まで _verified_token_cache に保持し、再検証を省略する。
     """
     token = credentials.credentials
+    token_hash = hashlib.sha256(token.encode()).digest()
+    cached = _verified_token_cache.get(token_hash)
+    if cached is not None:
+        return dict(cached)
 
     # ヘッダーから kid / alg を取得（未検証）
     try:
@@ -215,7 +641,6 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) ->
             audience="authenticated",
             issuer=issuer,
         )
-        return payload
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="トークンの有効期限が切れています")
     except JWTClaimsError:
@@ -223,10 +648,133 @@ def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) ->
     except JWTError:
         raise HTTPException(status_code=401, detail="無効なトークンです")
 
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _verified_token_cache.set(token_hash, dict(payload), float(exp))
+    return payload
+
 
 # ----------------------------
 # Supabase REST API ヘルパー
+# 全ヘルパーは _supabase_request（共有コネクションプール経由）を通す。
+# エラー・タイムアウトの扱いはここ1か所に集約する。
 # ----------------------------
+def _supabase_headers(api_key: str, bearer: str, has_body: bool, prefer: Optional[str]) -> dict:
+    headers = {
+        "apikey":        api_key,
+        "Authorization": f"Bearer {bearer}",
+        "Accept":        "application/json",
+    }
+    if has_body:
+        headers["Content-Type"] = "application/json"
+    if prefer:
+        headers["Prefer"] = prefer
+    return headers
+
+
+class _SupabaseError(HTTPException):
+    """
+    Supabase REST が 4xx/5xx を返したときの例外（HTTPException として 502 で伝播する）。
+    呼び出し元で詳細に分岐したい場合（RPC の業務エラー等）は upstream_status / pg_code を参照する。
+    """
+
+    def __init__(self, detail: str, upstream_status: int, pg_code: Optional[str]):
+        super().__init__(status_code=502, detail=detail)
+        self.upstream_status = upstream_status
+        self.pg_code = pg_code
+
+
+def _supabase_parse_response(
+    resp: httpx.Response, method: str, safe_path: str, label: str, error_detail: str
+) -> list:
+    """Supabase REST のレスポンスを検査して JSON を返す（同期・非同期共通）。"""
+    if resp.status_code >= 400:
+        logger.error(
+            "[%s] HTTPError code=%d method=%s path=%s body=%s",
+            label, resp.status_code, method, safe_path, resp.text[:200],
+        )
+        try:
+            err = resp.json()
+            pg_code = err.get("code") if isinstance(err, dict) else None
+        except ValueError:
+            pg_code = None
+        raise _SupabaseError(error_detail, resp.status_code, pg_code)
+    try:
+        return resp.json() if resp.content else []
+    except ValueError:
+        logger.error("[%s] レスポンス JSON 解析失敗 method=%s path=%s", label, method, safe_path)
+        raise HTTPException(status_code=502, detail=error_detail)
+
+
+def _supabase_request(
+    method: str,
+    path: str,
+    api_key: str,
+    bearer: str,
+    *,
+    data: Optional[dict] = None,
+    prefer: Optional[str] = None,
+    timeout: float = 10,
+    label: str = "supabase",
+    error_detail: str = "データベース操作でエラーが発生しました",
+) -> list:
+    """
+    Supabase REST API を共有 HTTP クライアント（keep-alive / プール）で呼び出す。
+    - 2xx: JSON をパースして返す（空ボディは []）
+    - 4xx/5xx: ステータスとボディ先頭をログに出して 502（error_detail）
+    - タイムアウト / 接続失敗: 502（タイムアウトは専用メッセージ）
+    """
+    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
+    safe_path = path.split("?")[0]
+    try:
+        resp = get_http_client().request(
+            method,
+            url,
+            content=json.dumps(data).encode() if data is not None else None,
+            headers=_supabase_headers(api_key, bearer, data is not None, prefer),
+            timeout=request_timeout(timeout),
+        )
+    except httpx.TimeoutException:
+        logger.error("[%s] タイムアウト method=%s path=%s", label, method, safe_path)
+        raise HTTPException(status_code=502, detail="データベース接続タイムアウトが発生しました")
+    except httpx.HTTPError as e:
+        logger.error("[%s] 接続エラー method=%s path=%s err=%s", label, method, safe_path, e)
+        raise HTTPException(status_code=502, detail=error_detail)
+    return _supabase_parse_response(resp, method, safe_path, label, error_detail)
+
+
+async def _supabase_request_async(
+    method: str,
+    path: str,
+    api_key: str,
+    bearer: str,
+    *,
+    data: Optional[dict] = None,
+    prefer: Optional[str] = None,
+    timeout: float = 10,
+    label: str = "supabase",
+    error_detail: str = "データベース操作でエラーが発生しました",
+) -> list:
+    """_supabase_request の非同期版（async エンドポイント / Webhook 用。イベントループを止めない）"""
+    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
+    safe_path = path.split("?")[0]
+    try:
+        resp = await get_async_http_client().request(
+            method,
+            url,
+            content=json.dumps(data).encode() if data is not None else None,
+            headers=_supabase_headers(api_key, bearer, data is not None, prefer),
+            timeout=request_timeout(timeout),
+        )
+    except httpx.TimeoutException:
+        logger.error("[%s] タイムアウト method=%s path=%s", label, method, safe_path)
+        raise HTTPException(status_code=502, detail="データベース接続タイムアウトが発生しました")
+    except httpx.HTTPError as e:
+        logger.error("[%s] 接続エラー method=%s path=%s err=%s", label, method, safe_path, e)
+        raise HTTPException(status_code=502, detail=error_detail)
+    return _supabase_parse_response(resp, method, safe_path, label, error_detail)
+
+
 def _supabase_get(path: str, jwt_token: str) -> list:
     """
     user JWT を使って Supabase REST API を GET する（RLS が有効に機能する）。
@@ -238,35 +786,88 @@ def _supabase_get(path: str, jwt_token: str) -> list:
             status_code=500,
             detail="SUPABASE_URL / SUPABASE_ANON_KEY が未設定です",
         )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    logger.info("[_supabase_get] START url=%s", url.split("?")[0])
-    req = urllib.request.Request(
-        url,
-        headers={
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {jwt_token}",
-            "Accept": "application/json",
-        },
+    logger.info("[_supabase_get] START path=%s", path.split("?")[0])
+    data = _supabase_request(
+        "GET", path, SUPABASE_ANON_KEY, jwt_token,
+        timeout=8,
+        label="_supabase_get",
+        error_detail="データベース接続エラーが発生しました",
     )
-    try:
-        with urllib.request.urlopen(req, timeout=8) as resp:
-            data = json.loads(resp.read())
-            logger.info("[_supabase_get] OK rows=%d path=%s", len(data), path.split("?")[0])
-            return data
-    except urllib.error.HTTPError as e:
-        body_snippet = e.read()[:200].decode(errors="replace") if hasattr(e, "read") else ""
-        logger.error("[_supabase_get] HTTPError code=%d path=%s body=%s", e.code, path.split("?")[0], body_snippet)
-        raise HTTPException(status_code=502, detail="データベース接続エラーが発生しました")
-    except urllib.error.URLError as e:
-        logger.error("[_supabase_get] URLError (timeout or network) reason=%s path=%s", e.reason, path.split("?")[0])
-        raise HTTPException(status_code=502, detail="データベース接続タイムアウトが発生しました")
-    except Exception:
-        logger.exception("[_supabase_get] unexpected error path=%s", path.split("?")[0])
-        raise HTTPException(status_code=502, detail="データベース接続エラーが発生しました")
+    logger.info("[_supabase_get] OK rows=%d path=%s", len(data), path.split("?")[0])
+    return data
+
 
+# ----------------------------
+# hospital_id 解決（JWT クレーム → プロセス内キャッシュ → profiles の順）
+# - クレーム: Supabase Custom Access Token Hook で付与した hospital_id、または app_metadata.hospital_id
+#   ※ user_metadata はユーザー自身が書き換えられるため参照しない
+# - キャッシュ: user_id ごとに _HOSPITAL_ID_CACHE_TTL 秒
+#   所属変更は Supabase 側で行われるため、フロントがログイン・再読込時に /api/me/hospital-id/refresh を呼んで
+#   自分のキャッシュを破棄する（それ以外の経路では TTL 経過で反映）
+# ----------------------------
+_HOSPITAL_ID_CACHE_TTL = int(os.getenv("HOSPITAL_ID_CACHE_TTL", "300"))
+_HOSPITAL_ID_CACHE_SIZE = int(os.getenv("HOSPITAL_ID_CACHE_SIZE", "4096"))
+_hospital_id_cache = _TtlLruCache(_HOSPITAL_ID_CACHE_SIZE)
+
+# profiles 照会の回避状況（/api/metrics で返す）
+_hospital_id_stats = {"claim": 0, "cache": 0, "profiles_lookup": 0}
+_hospital_id_stats_lock = threading.Lock()
+
+
+def _count_hospital_id_source(source: str) -> None:
+    with _hospital_id_stats_lock:
+        _hospital_id_stats[source] += 1
+
+
+def _hospital_id_from_claims(claims: Optional[dict]) -> Optional[str]:
+    """検証済み JWT クレームから hospital_id を取り出す（無ければ None）。"""
+    if not claims:
+        return None
+    hid = claims.get("hospital_id")
+    if not hid:
+        app_meta = claims.get("app_metadata")
+        hid = app_meta.get("hospital_id") if isinstance(app_meta, dict) else None
+    return hid if isinstance(hid, str) and hid else None
+
+
+def _invalidate_hospital_id(user_id: Optional[str] = None) -> None:
+    """hospital_id キャッシュを破棄する（user_id 省略時は全件）。"""
+    if user_id is None:
+        _hospital_id_cache.clear()
+    else:
+        _hospital_id_cache.pop(user_id)
+
+
+def _hospital_id_metrics() -> dict:
+    with _hospital_id_stats_lock:
+        counts = dict(_hospital_id_stats)
+    total = sum(counts.values())
+    avoided = counts["claim"] + counts["cache"]
+    return {
+        **counts,
+        "lookups_avoided": avoided,
+        "avoided_ratio":   round(avoided / total, 4) if total else None,
+        "cache_stats":     _hospital_id_cache.stats(),
+    }
 
-def _get_hospital_id(user_id: str, jwt_token: str) -> str:
-    """profiles テーブルから呼び出し元ユーザーの hospital_id を取得する"""
+
+def _get_hospital_id(user_id: str, jwt_token: str, claims: Optional[dict] = None) -> str:
+    """
+    呼び出し元ユーザーの hospital_id を取得する。
+    claims（verify_jwt の戻り値）にクレームがあればそれを使い、
+    無ければ user_id 単位の TTL キャッシュ → profiles テーブルの順で解決する。
+    """
+    hid = _hospital_id_from_claims(claims)
+    if hid:
+        _count_hospital_id_source("claim")
+        return hid
+
+    hid = _hospital_id_cache.get(user_id)
+    if hid:
+        _count_hospital_id_source("cache")
+        return hid
+
+    _count_hospital_id_source("profiles_lookup")
     logger.info("[_get_hospital_id] START user_id=%s", user_id)
     uid_encoded = urllib.parse.quote(user_id, safe="")
     rows = _supabase_get(
@@ -279,41 +880,28 @@ def _get_hospital_id(user_id: str, jwt_token: str) -> str:
             status_code=403,
             detail="プロフィールが見つかりません（hospital_id 未設定）",
         )
-    logger.info("[_get_hospital_id] OK hospital_id=%s", rows[0]["hospital_id"])
-    return rows[0]["hospital_id"]
+    hid = rows[0]["hospital_id"]
+    logger.info("[_get_hospital_id] OK hospital_id=%s", hid)
+    _hospital_id_cache.set(user_id, hid, time.time() + _HOSPITAL_ID_CACHE_TTL)
+    return hid
 
 
-def _assert_download_access(file_key: str, hospital_id: str, jwt_token: str) -> dict:
+def _validate_download_key(file_key: str) -> str:
     """
-    documents テーブルを user JWT で照会し、
-    from_hospital_id OR to_hospital_id がユーザーの病院と一致するか確認する。
-    RLS でも弾かれるが、FastAPI 側でも明示チェック（二重防御）。
-    戻り値: {"original_filename": str|None, "structured_json": dict|None, "file_ext": str}
+    パストラバーサル防止（基本バリデーション）。戻り値: 拡張子
+    許可拡張子は ALLOWED_MIME_EXT の値セットと一致させる
+    サムネイル（previews/<uuid>.webp）は形式を完全一致で確認する
     """
-    # パストラバーサル防止（基本バリデーション）
-    # 許可拡張子は ALLOWED_MIME_EXT の値セットと一致させる
+    if PREVIEW_KEY_RE.match(file_key):
+        return "webp"
     ext = file_key.rsplit(".", 1)[-1].lower() if "." in file_key else ""
     if not file_key.startswith("documents/") or ext not in set(ALLOWED_MIME_EXT.values()):
         raise HTTPException(status_code=400, detail="無効な file_key です")
+    return ext
 
-    key_encoded = urllib.parse.quote(file_key, safe="")
-    rows = _supabase_get(
-        f"documents?file_key=eq.{key_encoded}"
-        f"&select=from_hospital_id,to_hospital_id,original_filename,structured_json",
-        jwt_token,
-    )
-
-    # RLS で弾かれた場合も rows が空になるため、存在有無を区別しない（情報漏洩防止）
-    doc = rows[0] if rows else {}
-    if not rows:
-        raise HTTPException(status_code=403, detail="ドキュメントへのアクセス権がありません")
-
-    if (
-        doc.get("from_hospital_id") != hospital_id
-        and doc.get("to_hospital_id") != hospital_id
-    ):
-        raise HTTPException(status_code=403, detail="ドキュメントへのアクセス権がありません")
 
+def _download_meta(doc: dict, ext: str) -> dict:
+    """documents 行 → ダウンロード用メタ情報"""
     # structured_json は JSONB → dict で返るが、文字列で返る場合も考慮
     sj = doc.get("structured_json")
     if isinstance(sj, str):
@@ -329,6 +917,77 @@ def _assert_download_access(file_key: str, hospital_id: str, jwt_token: str) ->
     }
 
 
+def _download_key_column(file_key: str) -> str:
+    """キーを照合する documents の列（サムネイルは preview_file_key）"""
+    return "preview_file_key" if file_key.startswith("previews/") else "file_key"
+
+
+def _assert_download_access(file_key: str, hospital_id: str, jwt_token: str) -> dict:
+    """
+    documents テーブルを user JWT で照会し、
+    from_hospital_id OR to_hospital_id がユーザーの病院と一致するか確認する。
+    RLS でも弾かれるが、FastAPI 側でも明示チェック（二重防御）。
+    戻り値: {"original_filename": str|None, "structured_json": dict|None, "file_ext": str}
+    """
+    ext = _validate_download_key(file_key)
+
+    key_encoded = urllib.parse.quote(file_key, safe="")
+    rows = _supabase_get(
+        f"documents?{_download_key_column(file_key)}=eq.{key_encoded}"
+        f"&select=from_hospital_id,to_hospital_id,original_filename,structured_json",
+        jwt_token,
+    )
+
+    # RLS で弾かれた場合も rows が空になるため、存在有無を区別しない（情報漏洩防止）
+    # 内容ハッシュによる重複排除（content_blobs）で複数の documents が同じ file_key を共有しうるため、
+    # 自院が関わる行が1件でもあれば許可する
+    doc = next(
+        (
+            r for r in rows or []
+            if r.get("from_hospital_id") == hospital_id or r.get("to_hospital_id") == hospital_id
+        ),
+        None,
+    )
+    if doc is None:
+        raise HTTPException(status_code=403, detail="ドキュメントへのアクセス権がありません")
+
+    return _download_meta(doc, ext)
+
+
+def _assert_download_access_many(
+    file_keys: List[str], hospital_id: str, jwt_token: str
+) -> Dict[str, dict]:
+    """
+    _assert_download_access の一括版。documents を file_key=in.(...) の1クエリで照会する
+    （サムネイルキーは preview_file_key=in.(...) で別途1クエリ）。
+    戻り値: {file_key: メタ情報}（アクセス可能なキーのみ。呼び出し側で個別にエラー扱いする）
+    キーのバリデーションは呼び出し側で済ませておくこと。
+    """
+    groups: Dict[str, List[str]] = {}
+    for k in file_keys:
+        groups.setdefault(_download_key_column(k), []).append(k)
+
+    allowed: Dict[str, dict] = {}
+    for column, keys in groups.items():
+        # PostgREST の in.() はダブルクォートで値を囲む（キー中の , . を区切りと誤認させない）
+        quoted = ",".join('"' + k.replace("\\", "\\\\").replace('"', '\\"') + '"' for k in keys)
+        rows = _supabase_get(
+            f"documents?{column}=in.({urllib.parse.quote(quoted, safe='')})"
+            f"&select={column},from_hospital_id,to_hospital_id,original_filename,structured_json",
+            jwt_token,
+        )
+
+        wanted = set(keys)
+        for doc in rows or []:
+            key = doc.get(column)
+            if key in allowed or key not in wanted:
+                continue
+            if doc.get("from_hospital_id") != hospital_id and doc.get("to_hospital_id") != hospital_id:
+                continue
+            allowed[key] = _download_meta(doc, _validate_download_key(key))
+    return allowed
+
+
 _UNSAFE_CHARS_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
 
 def _build_download_filename(doc_meta: dict) -> Optional[str]:
@@ -359,14 +1018,14 @@ def _build_download_filename(doc_meta: dict) -> Optional[str]:
     return fallback
 
 
-def _assert_fax_file_key(file_key: str) -> None:
+async def _assert_fax_file_key(file_key: str) -> None:
     """
     FAX送信専用のファイルアクセスチェック。
     _assert_download_access（documents レコード前提）の代替として使用する。
 
     チェック内容:
     1. file_key のフォーマット検証（パストラバーサル防止）
-    2. R2 に実際にファイルが存在するか確認（head_object）
+    2. R2 に実際にファイルが存在するか確認（署名済み HEAD を非同期クライアントで送信）
 
     設計メモ:
     - FAX送信時点では documents レコードがまだ存在しないため documents 照合はしない。
@@ -381,12 +1040,13 @@ def _assert_fax_file_key(file_key: str) -> None:
         raise HTTPException(status_code=400, detail="FAX送信は PDF ファイルのみ対応しています")
 
     try:
-        bucket = get_bucket_name()
-        s3     = get_s3_client()
-        s3.head_object(Bucket=bucket, Key=file_key)
+        exists = await _r2_object_exists(file_key)
     except Exception as e:
+        logger.warning("[_assert_fax_file_key] R2 HEAD 失敗: file_key=%s err=%s", file_key, e)
+        exists = False
+    if not exists:
         # NoSuchKey / 404 系は 403 で返す（存在確認は情報漏洩になるため区別しない）
-        logger.warning("[_assert_fax_file_key] R2 head_object 失敗: file_key=%s err=%s", file_key, e)
+        logger.warning("[_assert_fax_file_key] R2 にファイルがありません: file_key=%s", file_key)
         raise HTTPException(status_code=403, detail="ファイルが見つからないか、アクセスできません")
 
 
@@ -441,6 +1101,56 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+def metrics_api(user: dict = Depends(verify_jwt)):
+    """プロセス内キャッシュの統計（ヒット率など）を返す（JWT 必須。運用確認用）。"""
+    return {
+        "verified_token_cache": _verified_token_cache.stats(),
+        "hospital_id":          _hospital_id_metrics(),
+        "presigned_url_cache":  _presigned_url_cache.stats(),
+        "dedup":                _dedup_metrics(),
+        "object_cache":         get_object_cache().stats(),
+        "ocr_cache":            get_ocr_cache().stats(),
+        "ocr_jobs":             {"workers": _OCR_JOB_WORKERS, **get_ocr_job_store().stats()},
+        "pdf_render":           get_render_pool_stats(),
+        "ocr_image":            dataclasses.asdict(get_page_encoding()),
+        "ocr_page_skip":        {**_PAGE_SKIP_POLICY._asdict(), **get_page_skip_stats()},
+        "http_pool":            get_pool_config(),
+        "r2_client":            get_s3_client_config(),
+    }
+
+
+def _hospital_id_refresh_impl(credentials: HTTPAuthorizationCredentials, user: dict) -> dict:
+    """呼び出し元ユーザーの hospital_id キャッシュを破棄し、解決し直した値を返す。"""
+    user_id = user.get("sub", "")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="無効なトークンです（sub なし）")
+    _invalidate_hospital_id(user_id)
+    return {"hospital_id": _get_hospital_id(user_id, credentials.credentials, claims=user)}
+
+
+@app.post("/api/me/hospital-id/refresh")
+def hospital_id_refresh_api(
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/me/hospital-id/refresh
+    hospital_id のプロセス内キャッシュ（自分の分のみ）を破棄して再取得する。
+    返却: { hospital_id }（profiles 未設定は 403）
+    """
+    return _hospital_id_refresh_impl(credentials, user)
+
+
+@app.post("/me/hospital-id/refresh")
+def hospital_id_refresh_compat(
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _hospital_id_refresh_impl(credentials, user)
+
+
 # ----------------------------
 # アップロード許可 MIME マップ（許可リスト方式・単一の真実）
 # フロント → FastAPI に content_type を渡し、ここで検証してから presign を発行する。
@@ -454,17 +1164,51 @@ ALLOWED_MIME_EXT: dict[str, str] = {
     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":            "xlsx",
     "application/vnd.openxmlformats-officedocument.presentationml.presentation":    "pptx",
 }
+_EXT_MIME: dict[str, str] = {ext: mime for mime, ext in ALLOWED_MIME_EXT.items()}
+
+# ----------------------------
+# 形式ごとのファイルサイズ上限（アップロード受付・OCR 取得で共通）
+# MAX_FILE_SIZE_MB_<EXT>（例: MAX_FILE_SIZE_MB_PDF=80）で形式ごとに上書きできる
+# ----------------------------
+_DEFAULT_MAX_FILE_SIZE_MB: dict[str, int] = {
+    "pdf":  50,    # 複数ページのカメラスキャン（OCR で描画するのは先頭 OCR_MAX_PAGES ページまで）
+    "png":  20,    # OpenAI Vision API の画像サイズ上限
+    "jpg":  20,
+    "docx": 10,    # python-docx / openpyxl はファイル全体をメモリ上に展開するため従来値
+    "xlsx": 10,
+    "pptx": 100,   # テキスト抽出なし（保存・受け渡しのみ）
+}
+_MAX_FILE_SIZE_BYTES: dict[str, int] = {
+    ext: int(os.getenv(f"MAX_FILE_SIZE_MB_{ext.upper()}", str(mb))) * 1024 * 1024
+    for ext, mb in _DEFAULT_MAX_FILE_SIZE_MB.items()
+}
+
+
+def _max_file_size(ext: str) -> int:
+    return _MAX_FILE_SIZE_BYTES.get(ext, 10 * 1024 * 1024)
+
+
+def _check_file_size(ext: str, size: int) -> None:
+    """形式ごとの上限を超えていれば 400"""
+    limit = _max_file_size(ext)
+    if size > limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"ファイルサイズが上限（{limit // (1024 * 1024)}MB）を超えています"
+                   f"（{size / 1024 / 1024:.1f}MB）",
+        )
 
 
 class PresignUploadRequest(BaseModel):
     content_type: str = "application/pdf"   # MIME タイプ（未送信時は PDF）
     filename: str = ""                      # オリジナルファイル名（ログ用）
+    size: Optional[int] = None              # バイト数（送信時は形式ごとの上限を事前チェック）
 
 
 # ----------------------------
 # Presign 内部ヘルパー
 # ----------------------------
-def _presign_upload(content_type: str = "application/pdf") -> dict:
+def _presign_upload(content_type: str = "application/pdf", size: Optional[int] = None) -> dict:
     # MIME 許可リスト検証（拡張子は MIME から決定する）
     if content_type not in ALLOWED_MIME_EXT:
         raise HTTPException(
@@ -473,16 +1217,18 @@ def _presign_upload(content_type: str = "application/pdf") -> dict:
                    f"対応形式: {', '.join(ALLOWED_MIME_EXT.keys())}",
         )
     ext = ALLOWED_MIME_EXT[content_type]
+    if size is not None:
+        _check_file_size(ext, size)
 
     try:
         bucket = get_bucket_name()
-        s3 = get_s3_client()
+        presigner = get_r2_presigner()
     except Exception:
         logger.exception("R2クライアント初期化失敗 (upload)")
         raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
 
     key = f"documents/{uuid.uuid4()}.{ext}"
-    url = s3.generate_presigned_url(
+    url = presigner.generate_presigned_url(
         ClientMethod="put_object",
         Params={
             "Bucket": bucket,
@@ -494,14 +1240,32 @@ def _presign_upload(content_type: str = "application/pdf") -> dict:
     return {"upload_url": url, "file_key": key, "content_type": content_type, "file_ext": ext}
 
 
+# ----------------------------
+# 署名済みダウンロード URL キャッシュ
+# - (file_key, mode, filename) 単位で URL を再利用し、残り有効期限が _PRESIGN_URL_MIN_TTL 秒を
+#   切ったら作り直す（同じ URL を返すことでブラウザの HTTP キャッシュも効く）
+# - アクセス確認（_assert_download_access）は呼び出し側で毎回行うため、キャッシュはユーザー間で共有してよい
+# ----------------------------
+_PRESIGN_URL_EXPIRES = 60 * 5
+_PRESIGN_URL_MIN_TTL = int(os.getenv("PRESIGN_URL_MIN_TTL", "120"))
+_PRESIGN_URL_CACHE_SIZE = int(os.getenv("PRESIGN_URL_CACHE_SIZE", "1024"))
+_presigned_url_cache = _TtlLruCache(_PRESIGN_URL_CACHE_SIZE)
+
+
 def _presign_download(key: str, original_filename: Optional[str] = None, mode: str = "inline"):
     """
     mode="inline"  (デフォルト): ResponseContentDisposition なし → プレビュー用
     mode="download": attachment + filename* → 明示的なファイル保存用
+    残り有効期限が十分な発行済み URL があればそれを返す（_presigned_url_cache）。
     """
+    cache_key = (key, mode, original_filename if mode == "download" else None)
+    cached = _presigned_url_cache.get(cache_key, min_ttl=_PRESIGN_URL_MIN_TTL)
+    if cached is not None:
+        return {"download_url": cached}
+
     try:
         bucket = get_bucket_name()
-        s3 = get_s3_client()
+        presigner = get_r2_presigner()
     except Exception:
         logger.exception("R2クライアント初期化失敗 (download)")
         raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
@@ -514,11 +1278,13 @@ def _presign_download(key: str, original_filename: Optional[str] = None, mode: s
             f"attachment; filename*=UTF-8''{encoded}"
         )
 
-    url = s3.generate_presigned_url(
+    signed_at = time.time()
+    url = presigner.generate_presigned_url(
         ClientMethod="get_object",
         Params=params,
-        ExpiresIn=60 * 5,
+        ExpiresIn=_PRESIGN_URL_EXPIRES,
     )
+    _presigned_url_cache.set(cache_key, url, signed_at + _PRESIGN_URL_EXPIRES)
     return {"download_url": url}
 
 
@@ -534,7 +1300,7 @@ def presign_upload_api(
     """ログイン済みユーザーのみ署名 URL を発行（JWT 必須）。
     body 未送信（後方互換クライアント）の場合は application/pdf として扱う。"""
     req = body if body is not None else PresignUploadRequest()
-    return _presign_upload(req.content_type)
+    return _presign_upload(req.content_type, req.size)
 
 
 @app.get("/api/presign-download")
@@ -551,7 +1317,7 @@ def presign_download_api(
     """
     jwt_token = credentials.credentials
     user_id = user.get("sub", "")
-    hospital_id = _get_hospital_id(user_id, jwt_token)
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)
     doc_meta = _assert_download_access(key, hospital_id, jwt_token)
     filename = _build_download_filename(doc_meta) if mode == "download" else None
     return _presign_download(key, filename, mode)
@@ -565,7 +1331,7 @@ def presign_upload_compat(
 ):
     """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
     req = body if body is not None else PresignUploadRequest()
-    return _presign_upload(req.content_type)
+    return _presign_upload(req.content_type, req.size)
 
 
 @app.get("/presign-download")
@@ -578,18 +1344,636 @@ def presign_download_compat(
     """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
     jwt_token = credentials.credentials
     user_id = user.get("sub", "")
-    hospital_id = _get_hospital_id(user_id, jwt_token)
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)
     doc_meta = _assert_download_access(key, hospital_id, jwt_token)
     filename = _build_download_filename(doc_meta) if mode == "download" else None
     return _presign_download(key, filename, mode)
 
 
+# ----------------------------
+# マルチパートアップロード（大きいスキャン PDF / 不安定な回線向け）
+#  initiate → presign-parts（必要なだけ何度でも）→ complete（または abort）
+#  - ブラウザは各パートを並列に PUT し、失敗したパートだけ再送する
+#  - 状態は R2 側（upload_id）が持つため API はステートレス
+#  - 中断後の再開: ブラウザが保存した upload_id で list-parts を呼び、届いていないパートだけ送る
+#    （再開されないまま残った未完了アップロードは R2 のライフサイクル設定で削除する）
+#  ※ ブラウザが各パートの ETag を読むため、R2 バケットの CORS 設定で ExposeHeaders に ETag を含めること
+# ----------------------------
+_MULTIPART_PART_SIZE = max(int(os.getenv("MULTIPART_PART_SIZE_MB", "8")), 5) * 1024 * 1024  # 最終パート以外は 5MiB 以上（S3 仕様）
+_MULTIPART_MAX_PARTS = 10_000
+_MULTIPART_PRESIGN_MAX = 100          # presign-parts 1回あたりの最大パート数
+_MULTIPART_PART_URL_EXPIRES = 60 * 30  # 30分（遅い回線でも1パートを送り切れるように）
+
+_UPLOAD_KEY_RE = re.compile(
+    r"^documents/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.([a-z]+)$"
+)
+
+
+class MultipartInitiateRequest(BaseModel):
+    content_type: str = "application/pdf"
+    filename: str = ""    # オリジナルファイル名（ログ用）
+    size: int             # 総バイト数（形式ごとの上限チェックとパート数の算出に使う）
+
+
+class MultipartPresignPartsRequest(BaseModel):
+    file_key: str
+    upload_id: str
+    part_numbers: List[int]
+
+
+class MultipartPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class MultipartCompleteRequest(BaseModel):
+    file_key: str
+    upload_id: str
+    parts: List[MultipartPart]
+
+
+class MultipartListPartsRequest(BaseModel):
+    file_key: str
+    upload_id: str
+
+
+class MultipartAbortRequest(BaseModel):
+    file_key: str
+    upload_id: str
+
+
+def _multipart_key_ext(file_key: str, upload_id: str) -> str:
+    """presign-upload / initiate が発行した形式の file_key か検証する。戻り値: 拡張子"""
+    m = _UPLOAD_KEY_RE.match(file_key or "")
+    if not m or m.group(1) not in set(ALLOWED_MIME_EXT.values()):
+        raise HTTPException(status_code=400, detail="無効な file_key です")
+    if not (upload_id or "").strip():
+        raise HTTPException(status_code=400, detail="upload_id を指定してください")
+    return m.group(1)
+
+
+def _r2_storage(label: str):
+    try:
+        return get_bucket_name(), get_s3_client()
+    except Exception:
+        logger.exception("R2クライアント初期化失敗 (%s)", label)
+        raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
+
+
+def _multipart_error(e: ClientError, label: str) -> HTTPException:
+    code = e.response.get("Error", {}).get("Code", "")
+    if code == "NoSuchUpload":
+        return HTTPException(status_code=404, detail="アップロードが見つかりません（期限切れまたは中止済み）")
+    if code in {"InvalidPart", "InvalidPartOrder", "EntityTooSmall"}:
+        return HTTPException(status_code=400, detail=f"パート情報が不正です（{code}）")
+    logger.exception("[multipart] %s 失敗: code=%s", label, code)
+    return HTTPException(status_code=502, detail="ストレージ操作に失敗しました")
+
+
+def _multipart_initiate_impl(req: MultipartInitiateRequest) -> dict:
+    if req.content_type not in ALLOWED_MIME_EXT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"許可されていないファイル形式です: {req.content_type}。"
+                   f"対応形式: {', '.join(ALLOWED_MIME_EXT.keys())}",
+        )
+    ext = ALLOWED_MIME_EXT[req.content_type]
+    if req.size <= 0:
+        raise HTTPException(status_code=400, detail="size を指定してください")
+    _check_file_size(ext, req.size)
+    part_count = -(-req.size // _MULTIPART_PART_SIZE)
+    if part_count > _MULTIPART_MAX_PARTS:
+        raise HTTPException(status_code=400, detail="パート数が上限を超えています")
+
+    bucket, s3 = _r2_storage("multipart initiate")
+    key = f"documents/{uuid.uuid4()}.{ext}"
+    try:
+        resp = s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=req.content_type)
+    except ClientError as e:
+        raise _multipart_error(e, "initiate")
+    logger.info("[multipart] initiate: key=%s size=%d parts=%d", key, req.size, part_count)
+    return {
+        "upload_id":    resp["UploadId"],
+        "file_key":     key,
+        "content_type": req.content_type,
+        "file_ext":     ext,
+        "part_size":    _MULTIPART_PART_SIZE,
+        "part_count":   part_count,
+    }
+
+
+def _multipart_presign_parts_impl(req: MultipartPresignPartsRequest) -> dict:
+    _multipart_key_ext(req.file_key, req.upload_id)
+    numbers = sorted(set(req.part_numbers))
+    if not numbers:
+        raise HTTPException(status_code=400, detail="part_numbers を指定してください")
+    if len(numbers) > _MULTIPART_PRESIGN_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に署名できるパートは {_MULTIPART_PRESIGN_MAX} 件までです",
+        )
+    if numbers[0] < 1 or numbers[-1] > _MULTIPART_MAX_PARTS:
+        raise HTTPException(status_code=400, detail="part_number が範囲外です")
+
+    try:
+        bucket = get_bucket_name()
+        presigner = get_r2_presigner()
+    except Exception:
+        logger.exception("R2クライアント初期化失敗 (multipart presign)")
+        raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
+
+    parts = [
+        {
+            "part_number": n,
+            "url": presigner.generate_presigned_url(
+                ClientMethod="upload_part",
+                Params={"Bucket": bucket, "Key": req.file_key, "UploadId": req.upload_id, "PartNumber": n},
+                ExpiresIn=_MULTIPART_PART_URL_EXPIRES,
+            ),
+        }
+        for n in numbers
+    ]
+    return {"parts": parts, "expires_in": _MULTIPART_PART_URL_EXPIRES}
+
+
+def _multipart_complete_impl(req: MultipartCompleteRequest) -> dict:
+    """
+    パートを結合してオブジェクトを確定する。
+    initiate 時の申告サイズは信用せず、確定後の実サイズで形式ごとの上限を再確認する（超過時は削除）。
+    """
+    ext = _multipart_key_ext(req.file_key, req.upload_id)
+    parts = sorted(req.parts, key=lambda p: p.part_number)
+    if not parts:
+        raise HTTPException(status_code=400, detail="parts を指定してください")
+    if len({p.part_number for p in parts}) != len(parts):
+        raise HTTPException(status_code=400, detail="part_number が重複しています")
+
+    bucket, s3 = _r2_storage("multipart complete")
+    try:
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=req.file_key,
+            UploadId=req.upload_id,
+            MultipartUpload={"Parts": [{"ETag": p.etag, "PartNumber": p.part_number} for p in parts]},
+        )
+        size = int(s3.head_object(Bucket=bucket, Key=req.file_key).get("ContentLength") or 0)
+    except ClientError as e:
+        raise _multipart_error(e, "complete")
+
+    if size > _max_file_size(ext):
+        try:
+            s3.delete_object(Bucket=bucket, Key=req.file_key)
+        except ClientError:
+            logger.exception("[multipart] 上限超過オブジェクトの削除失敗: key=%s", req.file_key)
+        _check_file_size(ext, size)
+
+    logger.info("[multipart] complete: key=%s size=%d parts=%d", req.file_key, size, len(parts))
+    return {"file_key": req.file_key, "content_type": _EXT_MIME.get(ext), "file_ext": ext, "size": size}
+
+
+def _multipart_list_parts_impl(req: MultipartListPartsRequest) -> dict:
+    """R2 に届いているパートの一覧（再開時に送信済みパートを飛ばすため）。中止・期限切れは 404"""
+    _multipart_key_ext(req.file_key, req.upload_id)
+    bucket, s3 = _r2_storage("multipart list-parts")
+    parts: list[dict] = []
+    marker = 0
+    try:
+        while True:
+            resp = s3.list_parts(
+                Bucket=bucket, Key=req.file_key, UploadId=req.upload_id,
+                PartNumberMarker=marker, MaxParts=1000,
+            )
+            parts += [
+                {"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]}
+                for p in resp.get("Parts") or []
+            ]
+            if not resp.get("IsTruncated"):
+                break
+            marker = resp["NextPartNumberMarker"]
+    except ClientError as e:
+        raise _multipart_error(e, "list-parts")
+    return {"parts": parts, "part_size": _MULTIPART_PART_SIZE}
+
+
+def _multipart_abort_impl(req: MultipartAbortRequest) -> dict:
+    """アップロードを中止し、R2 上の送信済みパートを破棄する（中止済みでも ok を返す）"""
+    _multipart_key_ext(req.file_key, req.upload_id)
+    bucket, s3 = _r2_storage("multipart abort")
+    try:
+        s3.abort_multipart_upload(Bucket=bucket, Key=req.file_key, UploadId=req.upload_id)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code", "") != "NoSuchUpload":
+            raise _multipart_error(e, "abort")
+    logger.info("[multipart] abort: key=%s", req.file_key)
+    return {"ok": True}
+
+
+@app.post("/api/multipart-upload/initiate")
+def multipart_initiate_api(
+    body: MultipartInitiateRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/multipart-upload/initiate
+    マルチパートアップロードを開始する（JWT 必須）。
+    返却: { upload_id, file_key, content_type, file_ext, part_size, part_count }
+    """
+    return _multipart_initiate_impl(body)
+
+
+@app.post("/api/multipart-upload/presign-parts")
+def multipart_presign_parts_api(
+    body: MultipartPresignPartsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/multipart-upload/presign-parts
+    指定パート番号の PUT 用署名 URL を発行する（再送時は同じパート番号で再発行してよい）。
+    返却: { parts: [{part_number, url}], expires_in }
+    """
+    return _multipart_presign_parts_impl(body)
+
+
+@app.post("/api/multipart-upload/complete")
+def multipart_complete_api(
+    body: MultipartCompleteRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/multipart-upload/complete
+    全パートの ETag を受け取りオブジェクトを確定する。
+    返却: { file_key, content_type, file_ext, size }（以降は presign-upload と同じく file_key で OCR / 送信）
+    """
+    return _multipart_complete_impl(body)
+
+
+@app.post("/api/multipart-upload/list-parts")
+def multipart_list_parts_api(
+    body: MultipartListPartsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/multipart-upload/list-parts
+    送信済みパートを返す（中断したアップロードの再開用）。
+    返却: { parts: [{part_number, etag, size}], part_size }
+    """
+    return _multipart_list_parts_impl(body)
+
+
+@app.post("/api/multipart-upload/abort")
+def multipart_abort_api(
+    body: MultipartAbortRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """POST /api/multipart-upload/abort: アップロードを中止する（送信済みパートを破棄）"""
+    return _multipart_abort_impl(body)
+
+
+@app.post("/multipart-upload/initiate")
+def multipart_initiate_compat(
+    body: MultipartInitiateRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _multipart_initiate_impl(body)
+
+
+@app.post("/multipart-upload/presign-parts")
+def multipart_presign_parts_compat(
+    body: MultipartPresignPartsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _multipart_presign_parts_impl(body)
+
+
+@app.post("/multipart-upload/complete")
+def multipart_complete_compat(
+    body: MultipartCompleteRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _multipart_complete_impl(body)
+
+
+@app.post("/multipart-upload/list-parts")
+def multipart_list_parts_compat(
+    body: MultipartListPartsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _multipart_list_parts_impl(body)
+
+
+@app.post("/multipart-upload/abort")
+def multipart_abort_compat(
+    body: MultipartAbortRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _multipart_abort_impl(body)
+
+
+# ----------------------------
+# 一括 presign-download（受信BOX / 送信履歴の一覧表示用）
+# ----------------------------
+_PRESIGN_BATCH_MAX = 100   # 1リクエストあたりの最大キー数
+
+
+class PresignDownloadBatchRequest(BaseModel):
+    keys: List[str] = []
+    mode: str = "inline"   # inline | download（全キー共通）
+
+
+def _presign_download_batch_impl(
+    body: PresignDownloadBatchRequest,
+    credentials: HTTPAuthorizationCredentials,
+    user: dict,
+) -> dict:
+    """
+    一括 presign-download の共通実装。
+    1. hospital_id 解決は1回のみ
+    2. キーを個別にバリデーションし、アクセス確認は documents?file_key=in.(...) の1クエリで行う
+    3. キーごとの結果をリクエスト順で返す（アクセス不可のキーがあっても他のキーは発行する）
+       error: invalid_key（形式不正）/ forbidden（存在しない・自院の文書でない）
+    """
+    if body.mode not in {"inline", "download"}:
+        raise HTTPException(status_code=400, detail="mode は inline または download を指定してください")
+    if not body.keys:
+        raise HTTPException(status_code=400, detail="keys を指定してください")
+    if len(body.keys) > _PRESIGN_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に発行できる署名 URL は {_PRESIGN_BATCH_MAX} 件までです",
+        )
+
+    jwt_token = credentials.credentials
+    user_id = user.get("sub", "")
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)
+
+    valid_keys: list[str] = []
+    for key in body.keys:
+        try:
+            _validate_download_key(key)
+        except HTTPException:
+            continue
+        if key not in valid_keys:
+            valid_keys.append(key)
+
+    allowed = _assert_download_access_many(valid_keys, hospital_id, jwt_token)
+
+    items: list[dict] = []
+    for key in body.keys:
+        meta = allowed.get(key)
+        if meta is None:
+            error = "forbidden" if key in valid_keys else "invalid_key"
+            items.append({"key": key, "ok": False, "error": error})
+            continue
+        filename = _build_download_filename(meta) if body.mode == "download" else None
+        url = _presign_download(key, filename, body.mode)["download_url"]
+        items.append({"key": key, "ok": True, "download_url": url})
+
+    return {"items": items}
+
+
+@app.post("/api/presign-download-batch")
+def presign_download_batch_api(
+    body: PresignDownloadBatchRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/presign-download-batch
+    複数の file_key に対する署名 URL をまとめて発行する（最大 _PRESIGN_BATCH_MAX 件）。
+    返却: { items: [{key, ok, download_url} | {key, ok: false, error}] }
+    """
+    return _presign_download_batch_impl(body, credentials, user)
+
+
+@app.post("/presign-download-batch")
+def presign_download_batch_compat(
+    body: PresignDownloadBatchRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _presign_download_batch_impl(body, credentials, user)
+
+
+# ----------------------------
+# R2 オブジェクト取得（OCR 用。上限付きストリーミング）
+# - Content-Length が上限を超えていれば本文を読まずに中止
+# - 本文はチャンク単位で読み、累計が上限を超えた時点で接続を切る
+#   → 1件あたりのメモリ使用量は上限サイズ + チャンク1つ分で頭打ちになる
+# ----------------------------
+_R2_FETCH_CHUNK = 64 * 1024
+
+
+class _ObjectTooLarge(Exception):
+    def __init__(self, size: int):
+        super().__init__(f"object too large: {size} bytes")
+        self.size = size   # Content-Length、または中止時点までに読んだバイト数
+
+
+def _r2_fetch_bounded(url: str, max_bytes: int, timeout: float) -> bytes:
+    """
+    署名済み GET URL から最大 max_bytes まで読み込む（R2 専用の HTTP クライアント経由。Supabase とはプールを分ける）。
+    上限超過は _ObjectTooLarge、HTTP エラー・通信失敗は httpx の例外を送出する。
+    """
+    with get_r2_http_client().stream("GET", url, timeout=request_timeout(timeout)) as resp:
+        resp.raise_for_status()
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise _ObjectTooLarge(int(length))
+        buf = bytearray()
+        for chunk in resp.iter_bytes(_R2_FETCH_CHUNK):
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise _ObjectTooLarge(len(buf))
+    return bytes(buf)
+
+
+def _r2_read_object(
+    presigner, bucket: str, file_key: str, max_bytes: int, timeout: float, expires: int = 60
+) -> bytes:
+    """
+    R2 オブジェクトを取得する（ローカルディスクキャッシュ優先）。
+    キャッシュに無ければ署名 URL で上限付き取得し、成功したらキャッシュへ保存する。
+    キャッシュ済みでも上限は再判定する（上限を下げた後に古い大きなファイルを通さない）。
+    """
+    cache = get_object_cache()
+    cache_key = f"{bucket}/{file_key}"
+    data = cache.get(cache_key)
+    if data is not None:
+        if len(data) > max_bytes:
+            raise _ObjectTooLarge(len(data))
+        return data
+
+    url = presigner.generate_presigned_url(
+        ClientMethod="get_object",
+        Params={"Bucket": bucket, "Key": file_key},
+        ExpiresIn=expires,
+    )
+    data = _r2_fetch_bounded(url, max_bytes, timeout)
+    cache.put(cache_key, data)
+    return data
+
+
+def _r2_cache_store(file_key: str, data: bytes) -> None:
+    """R2 へ保存済みのバイト列をディスクキャッシュへ入れる（直後の OCR で再取得しないため）。best-effort。"""
+    try:
+        get_object_cache().put(f"{get_bucket_name()}/{file_key}", data)
+    except Exception as e:
+        logger.warning("[object_cache] 保存失敗（処理は続行）: %s", e)
+
+
+# ----------------------------
+# 一覧カード用サムネイル（documents.preview_file_key）
+# - アップロード後（POST /api/documents/{id}/thumbnail）と FAX受信時（バックグラウンド）に生成
+# - 一覧は数 KB のサムネイルだけを取得し、全体の PDF / 画像はプレビューを開いたときだけ取得する
+# ----------------------------
+def _generate_thumbnail(file_key: str) -> Optional[str]:
+    """
+    file_key のサムネイルを生成して R2 に保存し、サムネイルのキーを返す。
+    対象外の形式・キーは None。取得・描画・保存の失敗は例外を送出する（呼び出し側で best-effort 扱い）。
+    元ファイルは _r2_read_object 経由で読む（OCR と同じディスクキャッシュを使う）。
+    """
+    ext = file_key.rsplit(".", 1)[-1].lower() if "." in file_key else ""
+    preview_key = preview_key_for(file_key)
+    if ext not in THUMBNAIL_EXTS or preview_key is None:
+        return None
+
+    bucket = get_bucket_name()
+    presigner = get_r2_presigner()
+    data = _r2_read_object(presigner, bucket, file_key, _max_file_size(ext), timeout=15)
+    thumb = render_thumbnail(data, ext)
+
+    url = presigner.generate_presigned_url(
+        ClientMethod="put_object",
+        Params={"Bucket": bucket, "Key": preview_key, "ContentType": THUMBNAIL_CONTENT_TYPE},
+        ExpiresIn=60,
+    )
+    resp = get_r2_http_client().put(
+        url, content=thumb, headers={"Content-Type": THUMBNAIL_CONTENT_TYPE}, timeout=request_timeout(15),
+    )
+    if resp.status_code >= 300:
+        raise RuntimeError(f"R2 PUT 失敗 (HTTP {resp.status_code}): {resp.text[:200]}")
+    logger.info(
+        "[thumbnail] 生成完了: %s → %s (%d → %d bytes)", file_key, preview_key, len(data), len(thumb),
+    )
+    return preview_key
+
+
+def _thumbnail_impl(doc_id: str, credentials: HTTPAuthorizationCredentials, user: dict) -> dict:
+    """
+    サムネイル生成の共通実装（アップロード後にフロントが呼ぶ）。
+    1. 自院が送信元 / 送信先の文書か確認（user JWT で照会。RLS + 明示チェックの二重防御）
+    2. 生成済みならそのまま返す
+    3. 生成して documents.preview_file_key を user JWT で更新
+    生成に失敗しても文書の利用には影響しないため、preview_file_key=null を返す（エラーにしない）。
+    """
+    doc_id_stripped = doc_id.strip()
+    try:
+        uuid.UUID(doc_id_stripped)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="無効なドキュメントIDです")
+
+    jwt_token = credentials.credentials
+    user_id = user.get("sub", "")
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)
+
+    id_enc = urllib.parse.quote(doc_id_stripped, safe="")
+    rows = _supabase_get(
+        f"documents?id=eq.{id_enc}&select=id,file_key,preview_file_key,from_hospital_id,to_hospital_id",
+        jwt_token,
+    )
+    doc = rows[0] if rows else None
+    if not doc or hospital_id not in (doc.get("from_hospital_id"), doc.get("to_hospital_id")):
+        raise HTTPException(status_code=403, detail="ドキュメントへのアクセス権がありません")
+
+    if doc.get("preview_file_key"):
+        return {"document_id": doc_id_stripped, "preview_file_key": doc["preview_file_key"]}
+
+    try:
+        preview_key = _generate_thumbnail(doc.get("file_key") or "")
+    except Exception:
+        logger.exception("[thumbnail] 生成失敗: document_id=%s", doc_id_stripped)
+        preview_key = None
+
+    if preview_key:
+        updated = _supabase_patch(
+            f"documents?id=eq.{id_enc}", {"preview_file_key": preview_key}, jwt_token,
+        )
+        if not updated:
+            logger.warning("[thumbnail] preview_file_key 更新 0 件（RLS）: document_id=%s", doc_id_stripped)
+            preview_key = None
+
+    return {"document_id": doc_id_stripped, "preview_file_key": preview_key}
+
+
+def _fax_thumbnail_task(document_id: str, file_key: str) -> None:
+    """FAX受信文書のサムネイル生成（BackgroundTasks から呼ぶ。best-effort）"""
+    try:
+        preview_key = _generate_thumbnail(file_key)
+        if preview_key:
+            _supabase_service_patch(
+                f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
+                {"preview_file_key": preview_key},
+            )
+    except Exception:
+        logger.exception("[thumbnail] FAX受信サムネイル生成失敗: document_id=%s", document_id)
+
+
+@app.post("/api/documents/{doc_id}/thumbnail")
+def document_thumbnail_api(
+    doc_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/documents/{doc_id}/thumbnail
+    一覧カード用サムネイルを生成して documents.preview_file_key に保存する（生成済みなら何もしない）。
+    返却: { document_id, preview_file_key }（未対応形式・生成失敗時は null）
+    """
+    return _thumbnail_impl(doc_id, credentials, user)
+
+
+@app.post("/documents/{doc_id}/thumbnail")
+def document_thumbnail_compat(
+    doc_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（同じ認可）"""
+    return _thumbnail_impl(doc_id, credentials, user)
+
+
 # ----------------------------
 # OCR 設定
 # ----------------------------
-_MAX_PDF_SIZE_BYTES = 10 * 1024 * 1024   # 10MB（PDF / DOCX / XLSX 共通上限）
-_MAX_OCR_PAGES = 3                        # PDF ページ上限
+_MAX_OCR_PAGES = max(int(os.getenv("OCR_MAX_PAGES", "20")), 1)            # PDF ページ上限
+_OCR_PAGE_GROUP_SIZE = max(int(os.getenv("OCR_PAGE_GROUP_SIZE", "1")), 1)  # 1回の Vision 呼び出しに含めるページ数
+_OCR_PAGE_CONCURRENCY = max(int(os.getenv("OCR_PAGE_CONCURRENCY", "4")), 1)  # Vision 同時呼び出し数（プロセス全体）
+_OCR_PAGE_CONCURRENCY_PER_REQUEST = max(int(os.getenv("OCR_PAGE_CONCURRENCY_PER_REQUEST", "2")), 1)  # 1リクエストあたり
 _OCR_TIMEOUT_SECS = 30                    # 処理全体のタイムアウト（秒）
+_TEXT_LAYER_POLICY = TextLayerPolicy(     # テキストレイヤーを Vision OCR の代わりに使う条件（ページ単位）
+    min_chars=max(int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "50")), 0),
+    max_image_coverage=float(os.getenv("OCR_TEXT_LAYER_MAX_IMAGE_COVERAGE", "0.5")),
+)
+_PAGE_SKIP_POLICY = PageSkipPolicy(       # 空白ページを OCR から除外する条件（0 で無効）
+    blank_ink_ratio=float(os.getenv("OCR_SKIP_BLANK_INK_RATIO", "0.0002")),
+)
+_OCR_SKIP_LOOKAHEAD_PAGES = max(int(os.getenv("OCR_SKIP_LOOKAHEAD_PAGES", "3")), 0)  # 除外に備えて余分に描画するページ数
 
 _XLSX_MAX_CHARS = 20_000      # XLSX 全体テキスト上限文字数
 _XLSX_MAX_EMPTY_ROWS = 30     # 連続空行がこれ以上続いたらシート打ち切り
@@ -687,27 +2071,42 @@ _STRUCTURE_PROMPT = """\
 # ----------------------------
 # OCR 内部ヘルパー
 # ----------------------------
-def _render_pdf_to_png_list(pdf_bytes: bytes) -> tuple[list[bytes], int]:
+def _encode_image_for_ocr(file_bytes: bytes, ext: str) -> EncodedPage:
     """
-    pypdfium2 でPDFをページ画像化する。
-    - 最大 _MAX_OCR_PAGES ページまで処理
-    - scale=2.0（約144 DPI）でレンダリング（OCR精度向上）
-    - 戻り値: (PNG bytes のリスト, 総ページ数)
+    PNG / JPEG を Vision OCR 用に整える（page_encoder.encode_photo。解像度・色・形式は OCR_IMAGE_* に従う）。
+    Pillow で開けない画像は元のバイト列をそのまま返す（判定は OpenAI 側に任せる）。
     """
-    pdf = pdfium.PdfDocument(pdf_bytes)
-    total_pages = len(pdf)
-    pages_to_render = min(total_pages, _MAX_OCR_PAGES)
+    encoding = get_page_encoding()
+    try:
+        return encode_photo(file_bytes, encoding)
+    except Exception as e:
+        logger.warning("OCR用画像の前処理失敗（元の画像を送信）: %s", e)
+        mime = "image/jpeg" if ext == "jpg" else "image/png"
+        return EncodedPage(file_bytes, mime, encoding.detail, 0, 0)
 
-    png_list: list[bytes] = []
-    for i in range(pages_to_render):
-        page = pdf[i]
-        bitmap = page.render(scale=2.0)
-        pil_image = bitmap.to_pil()
-        buf = io.BytesIO()
-        pil_image.save(buf, format="PNG")
-        png_list.append(buf.getvalue())
 
-    return png_list, total_pages
+def _render_pdf_for_ocr(
+    pdf_bytes: bytes, timeout: Optional[float] = None
+) -> tuple[list[PdfPage], int, list[dict]]:
+    """
+    pypdfium2 でPDFをページごとに処理する（PDF 描画用プロセスプールでページごとに並列実行）。
+    - テキストレイヤーが使えるページ（_TEXT_LAYER_POLICY）は本文を取り出し、描画しない
+    - それ以外は画像化。解像度・色・形式は page_encoder の設定（OCR_IMAGE_*）に従う
+    - 空白ページ（_PAGE_SKIP_POLICY）を除き、残りの先頭 _MAX_OCR_PAGES ページを返す
+      （除外に備えて _OCR_SKIP_LOOKAHEAD_PAGES ページ余分に描画する）
+    - 戻り値: (OCR する PdfPage のリスト, 総ページ数, 除外したページの記録)
+    - timeout 超過は RenderTimeout
+    """
+    rendered, total = render_pdf_pages(
+        pdf_bytes, _MAX_OCR_PAGES + _OCR_SKIP_LOOKAHEAD_PAGES, get_page_encoding(),
+        timeout=timeout, text_layer=_TEXT_LAYER_POLICY,
+    )
+    pages, skipped = select_pages(rendered, _PAGE_SKIP_POLICY)
+    if len(pages) > _MAX_OCR_PAGES:
+        # 上限を超えた分は読まなかった扱い（それより後ろの除外記録も残さない）
+        pages = pages[:_MAX_OCR_PAGES]
+        skipped = [s for s in skipped if s["page"] <= pages[-1].index + 1]
+    return pages, total, skipped
 
 
 def _extract_docx_text(docx_bytes: bytes) -> tuple[str, list[str]]:
@@ -811,19 +2210,23 @@ def _call_openai_ocr(
     png_list: list[bytes],
     timeout: float,
     mime_types: Optional[list[str]] = None,
+    details: Optional[list[str]] = None,
 ) -> str:
     """
     OpenAI Vision API（gpt-4o）でページ画像をまとめてOCRする。
     全ページを1リクエストで送信してテキストを取得する。
     mime_types: 各画像の MIME タイプ（未指定時は全て image/png）
+    details: 各画像の detail（未指定時は OCR_IMAGE_DETAIL）
     """
     content: list[dict] = []
     for i, png in enumerate(png_list):
         mime = (mime_types[i] if mime_types and i < len(mime_types) else "image/png")
+        detail = (details[i] if details and i < len(details) else get_page_encoding().detail)
         content.append({
             "type": "image_url",
             "image_url": {
-                "url": f"data:{mime};base64,{base64.b64encode(png).decode()}"
+                "url": f"data:{mime};base64,{base64.b64encode(png).decode()}",
+                "detail": detail,
             },
         })
     content.append({"type": "text", "text": _OCR_PROMPT})
@@ -859,6 +2262,139 @@ def _call_openai_ocr(
         raise HTTPException(status_code=502, detail="OCR処理でエラーが発生しました")
 
 
+# ----------------------------
+# ページ単位の並列 Vision OCR
+# - テキストレイヤーを使うページはそのまま、残りのページだけを OCR する
+# - ページ（OCR_PAGE_GROUP_SIZE ページのグループ）ごとに別リクエストで OCR し、ページ順に結合する
+#   → 所要時間はページ数に比例せず、ほぼ「最も遅い1ページ」で決まる
+# - 同時呼び出し数はプロセス共有のスレッドプールで制限する（OpenAI のレート制限対策）
+#   1リクエストが同時に投入するのは OCR_PAGE_CONCURRENCY_PER_REQUEST グループまで（他のリクエストの枠を残す）
+# - 時間切れ・失敗したページがあっても、読み取れたページは返す（読み取れなかったページ番号を別に返す）
+# ----------------------------
+_OCR_PAGE_MARKER = "--- ページ {} ---"
+
+
+@lru_cache(maxsize=1)
+def _ocr_page_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=_OCR_PAGE_CONCURRENCY, thread_name_prefix="ocr-page")
+
+
+def _ocr_pdf_pages(
+    pages: list[PdfPage],
+    timeout: float,
+    on_page: Optional[Callable[[str, dict], None]] = None,
+) -> tuple[str, list[dict], list[int]]:
+    """
+    _render_pdf_for_ocr の結果を OCR する。テキストレイヤーのページは本文をそのまま使い、
+    画像のページはページごとの MIME / detail 付きで並列に Vision OCR する。
+    戻り値: (ページ順に結合したテキスト, ページ（グループ）ごとの所要時間・文字数・source, 読み取れなかったページ番号)
+    on_page: ページ（グループ）の本文が確定するたびに (テキスト, 所要時間) で呼ばれる（完了順。ワーカースレッドから）
+    timeout 超過・OpenAI のエラーになったページは読み取れなかったページとして返す。
+    1ページも読み取れなかった場合のみ例外（timeout 超過は 504、OpenAI のエラーは _call_openai_ocr と同じ 502）。
+    """
+    deadline = time.monotonic() + timeout
+    results: list[tuple[str, dict]] = []
+    for p in pages:
+        if p.text is not None:
+            timing = {"pages": [p.index + 1], "elapsed_ms": 0, "chars": len(p.text), "source": "text_layer"}
+            if on_page is not None:
+                on_page(p.text, timing)
+            results.append((p.text, timing))
+
+    vision = [p for p in pages if p.text is None]
+    groups = [vision[i:i + _OCR_PAGE_GROUP_SIZE] for i in range(0, len(vision), _OCR_PAGE_GROUP_SIZE)]
+    finished = threading.Event()   # 返却後に完了したグループは on_page を呼ばない
+    unread: list[int] = []
+    error: Optional[HTTPException] = None
+
+    def _run(group: list[PdfPage]) -> tuple[str, dict]:
+        t0 = time.monotonic()
+        remaining = deadline - t0
+        if remaining <= 1.0:
+            raise HTTPException(status_code=504, detail="OCR処理がタイムアウトしました")
+        text = _strip_code_fences(_call_openai_ocr(
+            [p.image.data for p in group],
+            timeout=remaining,
+            mime_types=[p.image.mime for p in group],
+            details=[p.image.detail for p in group],
+        ))
+        timing = {
+            "pages":      [p.index + 1 for p in group],
+            "elapsed_ms": int((time.monotonic() - t0) * 1000),
+            "chars":      len(text),
+            "source":     "vision",
+        }
+        if on_page is not None and not finished.is_set():
+            on_page(text, timing)
+        return text, timing
+
+    def _failed(group: list[PdfPage], e: Exception) -> None:
+        nonlocal error
+        if not isinstance(e, HTTPException):
+            logger.exception("ページOCR失敗: pages=%s", [p.index + 1 for p in group])
+            e = HTTPException(status_code=502, detail="OCR処理でエラーが発生しました")
+        error = error or e
+        unread.extend(p.index + 1 for p in group)
+
+    if len(groups) == 1:
+        # 1グループだけならスレッドを経由しない
+        try:
+            results.append(_run(groups[0]))
+        except Exception as e:
+            _failed(groups[0], e)
+    elif groups:
+        queued = list(groups)
+        running: dict[Future, list[PdfPage]] = {}
+        while queued or running:
+            while queued and len(running) < _OCR_PAGE_CONCURRENCY_PER_REQUEST:
+                group = queued.pop(0)
+                running[_ocr_page_executor().submit(_run, group)] = group
+            done, _ = wait(running, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                group = running.pop(f)
+                try:
+                    results.append(f.result())
+                except Exception as e:
+                    _failed(group, e)
+        if queued or running:
+            logger.warning(
+                "ページ並列OCR タイムアウト: 未完了 %d / %d", len(queued) + len(running), len(groups),
+            )
+            for f, group in running.items():
+                f.cancel()
+                _failed(group, HTTPException(status_code=504, detail="OCR処理がタイムアウトしました"))
+            for group in queued:
+                _failed(group, HTTPException(status_code=504, detail="OCR処理がタイムアウトしました"))
+    finished.set()
+
+    if unread and not results:
+        raise error
+    results.sort(key=lambda r: r[1]["pages"][0])
+    if len(pages) == 1:
+        return results[0][0], [results[0][1]], []
+    parts = []
+    for text, timing in results:
+        nums = timing["pages"]
+        contiguous = nums == list(range(nums[0], nums[-1] + 1))
+        label = (
+            str(nums[0]) if len(nums) == 1
+            else f"{nums[0]}-{nums[-1]}" if contiguous
+            else ",".join(str(n) for n in nums)
+        )
+        parts.append(f"{_OCR_PAGE_MARKER.format(label)}\n{text}")
+    return "\n\n".join(parts), [timing for _, timing in results], sorted(unread)
+
+
+def _pdf_source_type(page_timings: list[dict]) -> str:
+    """ページごとの経路から meta.source_type を決める"""
+    sources = {t["source"] for t in page_timings}
+    if sources == {"text_layer"}:
+        return "pdf_text"
+    return "pdf_mixed" if "text_layer" in sources else "pdf"
+
+
 # ----------------------------
 # テキスト正規化ヘルパー
 # ----------------------------
@@ -1148,6 +2684,56 @@ def _structure_referral_text(
         return None
 
 
+# ----------------------------
+# OCR 結果キャッシュ（ocr_cache.py。content_blobs の手前のローカル層）
+# - 結果に影響する設定（プロンプト・モデル・ページ上限・ページ分割・画像エンコード）のハッシュをキーに含める
+# - mode: "full"（構造化JSON あり）/ "text_only"。debug は full と同じ結果を使う
+# ----------------------------
+_OCR_CACHE_VERSION = hashlib.sha256(
+    "\0".join([
+        _OCR_PROMPT, _STRUCTURE_PROMPT, "gpt-4o", str(_MAX_OCR_PAGES), str(_OCR_PAGE_GROUP_SIZE),
+        repr(get_page_encoding()), repr(_TEXT_LAYER_POLICY), repr(_PAGE_SKIP_POLICY), str(_OCR_SKIP_LOOKAHEAD_PAGES),
+    ]).encode()
+).hexdigest()[:16]
+
+
+def _ocr_cache_mode(mode: str) -> str:
+    return "text_only" if mode == "text_only" else "full"
+
+
+def _ocr_cache_get(hospital_id: str, content_sha256: str, mode: str) -> Optional[dict]:
+    """text_only は text_only → full の順に探す（full の結果はテキスト部分がそのまま使える）"""
+    modes = ("text_only", "full") if mode == "text_only" else ("full",)
+    return get_ocr_cache().get(hospital_id, content_sha256, modes, _OCR_CACHE_VERSION)
+
+
+def _ocr_cache_put(
+    hospital_id: str,
+    content_sha256: str,
+    mode: str,
+    *,
+    text: str,
+    normalized: str,
+    structured: Optional[dict],
+    alerts: list,
+    page_count: Optional[int],
+    size: int,
+    source_type: str,
+) -> None:
+    # 構造化に失敗した full の結果は保存しない（次回は構造化を再試行させる）
+    if mode == "full" and structured is None and normalized:
+        return
+    get_ocr_cache().put(hospital_id, content_sha256, mode, _OCR_CACHE_VERSION, {
+        "text":            text,
+        "text_normalized": normalized,
+        "structured":      structured,
+        "alerts":          alerts,
+        "page_count":      page_count,
+        "size":            size,
+        "source_type":     source_type,
+    })
+
+
 # ----------------------------
 # OCR 実装（/api/ocr と /ocr の共通処理）
 # ----------------------------
@@ -1159,82 +2745,127 @@ class OcrRequest(BaseModel):
     # "debug"     : full と同等 + debug_normalize をレスポンスに追加（本番以外で使用）
 
 
+def _ocr_file_ext(fkey: str) -> str:
+    """
+    file_key バリデーション（パストラバーサル防止）。戻り値: 拡張子
+    対応拡張子: pdf / docx / xlsx / png / jpg
+    """
+    ext = fkey.rsplit(".", 1)[-1].lower() if "." in fkey else ""
+    if not fkey.startswith("documents/") or ext not in {"pdf", "docx", "xlsx", "png", "jpg"}:
+        raise HTTPException(status_code=400, detail="無効な file_key です（対応: .pdf / .docx / .xlsx / .png / .jpg）")
+    return ext
+
+
 def _ocr_impl(
     body: OcrRequest,
     credentials: HTTPAuthorizationCredentials,
     user: dict,
+    emit: Optional[Callable[[str, dict], None]] = None,
 ) -> dict:
     """
     PDF画像OCR / DOCX・XLSXテキスト抽出の共通実装。
     1. file_key バリデーション（.pdf / .docx / .xlsx のみ受け付ける）
     2. JWT + hospital_id 確認（送信前ファイル＝まだ documents 未登録のため DB照合はしない）
+    3〜6. _ocr_run
+    emit: 段階ごとの途中結果を受け取るコールバック（/api/ocr/stream 用。event 名, data）
+    """
+    start_time = time.time()
+    _ocr_file_ext(body.file_key)
+
+    # ---- JWT + hospital_id 確認 ----
+    # OCR は「送信前」専用のため documents テーブルにまだレコードが存在しない。
+    # _assert_download_access（DB照合）は行わず、有効な JWT + hospital_id を持つ
+    # ログイン済みユーザーであることのみ確認する。
+    jwt_token = credentials.credentials
+    user_id = user.get("sub", "")
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)  # hospital_id 未設定ユーザーを弾く
+
+    return _ocr_run(body, hospital_id, jwt_token, emit=emit, start_time=start_time)
+
+
+def _ocr_run(
+    body: OcrRequest,
+    hospital_id: str,
+    jwt_token: Optional[str],
+    emit: Optional[Callable[[str, dict], None]] = None,
+    *,
+    timeout_secs: float = _OCR_TIMEOUT_SECS,
+    start_time: Optional[float] = None,
+) -> dict:
+    """
+    認可済みの OCR 本体（_ocr_impl / 非同期 OCR ジョブから呼ぶ）。
     3. R2 からファイル取得（Presigned GET）+ サイズチェック
     4a. PDF:  pypdfium2 でページ画像化 → Gemini/OpenAI Vision OCR
     4b. DOCX: python-docx でテキスト抽出（Vision API 不使用。失敗は graceful degradation）
     4c. XLSX: openpyxl で全シートをテキスト化（Vision API 不使用。失敗は graceful degradation）
     5. OpenAI gpt-4o で構造化JSON生成（失敗時は structured=null）
     6. 結果テキスト + メタ（source_type 含む）+ 警告 + 構造化JSON + アラート を返す
+    jwt_token: content_blobs を user JWT（RLS）で読み書きする。None の場合は service_role（hospital_id で限定）
+    timeout_secs: 処理全体の上限秒数（start_time 起点）
     """
-    start_time = time.time()
+    start_time = time.time() if start_time is None else start_time
+
+    def _emit(event: str, data: dict) -> None:
+        if emit is not None:
+            emit(event, data)
 
     # ---- タイムアウト残時間チェック（内部ヘルパー） ----
     def _remaining() -> float:
         elapsed = time.time() - start_time
-        remaining = _OCR_TIMEOUT_SECS - elapsed
+        remaining = timeout_secs - elapsed
         if remaining <= 2.0:
             raise HTTPException(status_code=504, detail="OCR処理がタイムアウトしました")
         return remaining
 
-    # ---- file_key バリデーション（パストラバーサル防止） ----
-    # 対応拡張子: pdf / docx / xlsx / png / jpg
     fkey = body.file_key
-    ext = fkey.rsplit(".", 1)[-1].lower() if "." in fkey else ""
-    if not fkey.startswith("documents/") or ext not in {"pdf", "docx", "xlsx", "png", "jpg"}:
-        raise HTTPException(status_code=400, detail="無効な file_key です（対応: .pdf / .docx / .xlsx / .png / .jpg）")
-
-    # ---- JWT + hospital_id 確認 ----
-    # OCR は「送信前」専用のため documents テーブルにまだレコードが存在しない。
-    # _assert_download_access（DB照合）は行わず、有効な JWT + hospital_id を持つ
-    # ログイン済みユーザーであることのみ確認する。
-    jwt_token = credentials.credentials
-    user_id = user.get("sub", "")
-    _get_hospital_id(user_id, jwt_token)  # hospital_id 未設定ユーザーを弾く
+    ext = _ocr_file_ext(fkey)
 
     _remaining()
 
-    # ---- R2 からファイルを取得（Presigned GET、有効期限60秒） ----
+    # ---- R2 からファイルを取得（ディスクキャッシュ優先。無ければ Presigned GET、有効期限60秒） ----
     try:
         bucket = get_bucket_name()
-        s3 = get_s3_client()
+        presigner = get_r2_presigner()
     except Exception:
         logger.exception("R2クライアント初期化失敗 (OCR)")
         raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
 
-    presigned_url = s3.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={"Bucket": bucket, "Key": fkey},
-        ExpiresIn=60,
-    )
-
+    # ---- サイズチェック（形式ごとの上限。超過時は本文を読み切る前に中止） ----
     try:
-        with urllib.request.urlopen(presigned_url, timeout=10) as resp:
-            file_bytes = resp.read()
+        file_bytes = _r2_read_object(presigner, bucket, fkey, _max_file_size(ext), timeout=10)
+    except _ObjectTooLarge as e:
+        logger.warning("R2 ファイルサイズ超過のため取得中止: %s (%d bytes)", fkey, e.size)
+        _check_file_size(ext, e.size)
+        raise
     except Exception:
         logger.exception("R2からのファイル取得失敗: %s", fkey)
         raise HTTPException(status_code=400, detail="ファイルの取得に失敗しました")
-
-    # ---- サイズチェック（PDF / DOCX 共通） ----
-    if len(file_bytes) > _MAX_PDF_SIZE_BYTES:
-        mb = len(file_bytes) / 1024 / 1024
-        raise HTTPException(
-            status_code=400,
-            detail=f"ファイルサイズが上限（10MB）を超えています（{mb:.1f}MB）",
-        )
+    _emit("fetched", {"size": len(file_bytes), "elapsed_ms": int((time.time() - start_time) * 1000)})
+
+    # ---- 内容ハッシュで既知の OCR 結果を探す（PDF / 画像のみ。自院の結果のみ参照） ----
+    # 1. ローカルの OCR 結果キャッシュ（ヒットすれば OpenAI 呼び出しなし）
+    # 2. content_blobs（Supabase。他ワーカー・再デプロイ前の結果も含む）
+    content_sha256 = _content_sha256(file_bytes)
+    cache_mode = _ocr_cache_mode(body.mode)
+    cached = (
+        _ocr_cache_get(hospital_id, content_sha256, cache_mode)
+        if ext in _VISION_OCR_EXTS else None
+    )
+    blob = (
+        _content_blob_get(hospital_id, content_sha256, jwt_token)
+        if ext in _VISION_OCR_EXTS and cached is None else None
+    )
+    ocr_reused = False
 
     _remaining()
 
     # ---- ファイル種別ごとのテキスト抽出 ----
     total_pages: Optional[int] = None
+    image_bytes: Optional[int] = None
+    page_timings: Optional[list[dict]] = None
+    skipped_pages: Optional[list[dict]] = None
+    unread_pages: list[int] = []     # PDF: 時間切れ・OCR 失敗で読み取れなかったページ
+    read_pages = _MAX_OCR_PAGES   # PDF の先頭何ページまでを読んだか（除外したページを含む）
     extract_warnings: list[str] = []
 
     if ext == "docx":
@@ -1247,48 +2878,84 @@ def _ocr_impl(
         text, extract_warnings = _extract_xlsx_text(file_bytes)
         source_type = "xlsx"
 
+    elif cached:
+        # OCR 結果キャッシュにヒット: テキスト・構造化JSON・アラートをそのまま使う
+        text = cached["text"]
+        total_pages = cached.get("page_count")
+        source_type = cached.get("source_type") or ("pdf" if ext == "pdf" else "image")
+
+    elif _content_blob_has_current_ocr(blob):
+        # 既知の内容: 保存済みの OCR テキストを再利用（Vision API を呼ばない。現在の設定で作られたものに限る）
+        text = blob["ocr_text"]
+        total_pages = blob.get("page_count")
+        source_type = "pdf" if ext == "pdf" else "image"
+        ocr_reused = True
+        _dedup_count("ocr_calls_saved")
+
     elif ext in {"png", "jpg"}:
-        # 画像ファイル: そのまま Vision OCR（PDF化不要）
+        # 画像ファイル: 向き・解像度・コントラストを整えて Vision OCR（PDF化不要）
         if not OPENAI_API_KEY:
             raise HTTPException(
                 status_code=500,
                 detail="APIキーが未設定です（OPENAI_API_KEY を設定してください）",
             )
-        mime = "image/jpeg" if ext == "jpg" else "image/png"
+        image = _encode_image_for_ocr(file_bytes, ext)
         remaining = _remaining()
-        text = _call_openai_ocr([file_bytes], timeout=remaining, mime_types=[mime])
+        image_bytes = len(image.data)
+        text = _call_openai_ocr(
+            [image.data], timeout=remaining, mime_types=[image.mime], details=[image.detail],
+        )
         text = _strip_code_fences(text)
         source_type = "image"
 
     else:
-        # PDF: pypdfium2 でページ画像化 → Vision OCR
+        # PDF: テキストレイヤー判定 + pypdfium2 でページ画像化 → 画像のページのみ Vision OCR
         try:
-            png_list, total_pages = _render_pdf_to_png_list(file_bytes)
+            pages, total_pages, skipped_pages = _render_pdf_for_ocr(file_bytes, timeout=_remaining())
+        except RenderTimeout:
+            logger.warning("PDF画像化タイムアウト: %s", fkey)
+            raise HTTPException(status_code=504, detail="OCR処理がタイムアウトしました")
         except Exception:
             logger.exception("PDF画像化失敗: %s", fkey)
             raise HTTPException(status_code=500, detail="PDF処理でエラーが発生しました")
 
-        if not png_list:
+        if not pages and not skipped_pages:
             raise HTTPException(status_code=400, detail="PDFにページが含まれていません")
+        read_pages = max([p.index + 1 for p in pages] + [s["page"] for s in skipped_pages])
+        _emit("rendered", {
+            "page_count":    total_pages,
+            "ocr_pages":     len(pages),
+            "skipped_pages": skipped_pages,
+            "elapsed_ms":    int((time.time() - start_time) * 1000),
+        })
 
-        if not OPENAI_API_KEY:
+        vision_pages = [p for p in pages if p.image is not None]
+        if vision_pages and not OPENAI_API_KEY:
             raise HTTPException(
                 status_code=500,
                 detail="APIキーが未設定です（OPENAI_API_KEY を設定してください）",
             )
 
         remaining = _remaining()
-        text = _call_openai_ocr(png_list, timeout=remaining)
+        image_bytes = sum(len(p.image.data) for p in vision_pages) if vision_pages else None
+        text, page_timings, unread_pages = _ocr_pdf_pages(
+            pages, timeout=remaining,
+            on_page=(lambda t, timing: _emit("page", {**timing, "text": t})) if emit else None,
+        )
 
         text = _strip_code_fences(text)
-        source_type = "pdf"
+        source_type = _pdf_source_type(page_timings)
 
     elapsed_ms = int((time.time() - start_time) * 1000)
     stripped = text.strip()
+    _emit("text", {"text": stripped, "elapsed_ms": elapsed_ms})
 
     # ---- AI投入用テキストの正規化（raw は stripped で保持） ----
     _debug_mode = body.mode == "debug"
-    normalized, _debug_norm = _normalize_text(stripped, debug=_debug_mode)
+    if cached and not _debug_mode:
+        normalized, _debug_norm = cached["text_normalized"], None
+    else:
+        normalized, _debug_norm = _normalize_text(stripped, debug=_debug_mode)
 
     # ---- メタ情報（source_type を追加） ----
     meta = {
@@ -1296,7 +2963,13 @@ def _ocr_impl(
         "char_count": len(stripped),
         "file_key": fkey,
         "elapsed_ms": elapsed_ms,
-        "source_type": source_type,  # "pdf" | "docx" | "xlsx"
+        "source_type": source_type,  # "pdf" | "pdf_text" | "pdf_mixed" | "image" | "docx" | "xlsx"
+        "ocr_reused": ocr_reused,    # True: 同一内容の保存済み OCR 結果を再利用（content_blobs）
+        "ocr_cached": bool(cached),  # True: OCR 結果キャッシュ（ローカル）から返した
+        "image_bytes": image_bytes,  # Vision API に送った画像の合計バイト数（OCR しなかった場合は None）
+        "page_timings": page_timings,  # PDF: ページ（グループ）ごとの所要時間・文字数・source（text_layer / vision）
+        "skipped_pages": skipped_pages,  # PDF: OCR しなかった空白ページ（reason: blank）
+        "unread_pages": unread_pages or None,  # PDF: 時間切れ・OCR 失敗で読み取れなかったページ
     }
 
     # ---- 警告生成（要配慮キーワード検索は normalized を使用） ----
@@ -1316,14 +2989,68 @@ def _ocr_impl(
                 f"要配慮情報の可能性があります：{', '.join(found)} 等のキーワードが含まれています。"
                 "送信前に内容をご確認ください。"
             )
+    if skipped_pages:
+        blank = ", ".join(str(s["page"]) for s in skipped_pages)
+        warnings.append(f"空白ページ {blank} は読み取りませんでした。念のため原本をご確認ください。")
+    if unread_pages:
+        warnings.append(
+            f"ページ {', '.join(str(n) for n in unread_pages)} は時間内に読み取れませんでした。"
+            "該当ページは原本をご確認ください。"
+        )
+    if ext == "pdf" and total_pages and total_pages > read_pages:
+        warnings.append(
+            f"先頭 {read_pages} ページのみ読み取りました（全 {total_pages} ページ）。"
+            "残りのページは内容をご確認ください。"
+        )
 
-    # ---- 構造化JSON生成（normalized を入力。mode=full のみ実行） ----
-    structured = (
-        None if body.mode == "text_only" else _structure_referral_text(normalized)
-    )
+    _emit("normalized", {"text_normalized": normalized, "meta": meta, "warnings": warnings})
 
     # ---- アラート生成（normalized を入力。キーワードマッチ方式、断定禁止） ----
-    alerts = _generate_alerts(normalized) if normalized else []
+    if cached:
+        alerts = cached.get("alerts") or []
+    else:
+        alerts = _generate_alerts(normalized) if normalized else []
+
+    _emit("alerts", {"alerts": alerts})
+
+    # ---- 構造化JSON生成（normalized を入力。mode=full のみ実行） ----
+    # OCR テキストを再利用した場合は入力が同一のため、保存済みの構造化JSONも再利用する
+    if body.mode == "text_only":
+        structured = None
+    elif cached:
+        structured = cached.get("structured")
+    elif ocr_reused and blob.get("structured_json"):
+        structured = blob["structured_json"]
+        _dedup_count("structure_calls_saved")
+    else:
+        structured = _structure_referral_text(normalized)
+    _emit("structured", {"structured": structured})
+
+    # ---- 内容ハッシュ索引に登録 / 成果物を追記（best-effort。キャッシュヒット時は登録済み） ----
+    # 読み取れなかったページがある結果は成果物として保存しない（索引の登録のみ。次回は全ページを OCR し直す）
+    if ext in _VISION_OCR_EXTS and not cached:
+        _content_blob_record(
+            hospital_id, content_sha256, blob, jwt_token,
+            file_key=fkey,
+            size=len(file_bytes),
+            content_type=_EXT_MIME.get(ext, ""),
+            page_count=total_pages,
+            ocr_text=None if unread_pages else stripped,
+            structured=None if unread_pages else structured,
+        )
+
+    # ---- OCR 結果キャッシュに保存（PDF / 画像のみ。読み取れなかったページがある結果は保存しない） ----
+    if ext in _VISION_OCR_EXTS and not cached and not unread_pages:
+        _ocr_cache_put(
+            hospital_id, content_sha256, cache_mode,
+            text=stripped,
+            normalized=normalized,
+            structured=structured,
+            alerts=alerts,
+            page_count=total_pages,
+            size=len(file_bytes),
+            source_type=source_type,
+        )
 
     result: dict = {
         "text": stripped,
@@ -1354,9 +3081,9 @@ def ocr_pdf(
 
     - JWT検証済みユーザーのみ利用可
     - JWT + profiles テーブルで hospital_id 確認（送信前ファイル専用のため documents テーブル照合なし）
-    - R2 から Presigned GET でPDF取得（10MB上限）
-    - pypdfium2 でページ画像化（最大3ページ）
-    - OpenAI Vision API（gpt-4o）で画像OCR
+    - R2 から Presigned GET でPDF取得（形式ごとの上限: _MAX_FILE_SIZE_BYTES）
+    - pypdfium2 でページ画像化（最大 _MAX_OCR_PAGES ページ）
+    - OpenAI Vision API（gpt-4o）でページごとに並列に画像OCR
     - OpenAI gpt-4o で構造化JSON生成（OPENAI_API_KEY 未設定時は structured=null）
     - 返却: { text, text_normalized, meta, warnings, structured, alerts }
     """
@@ -1373,6 +3100,319 @@ def ocr_compat(
     return _ocr_impl(body, credentials, user)
 
 
+# ----------------------------
+# OCR ストリーミング（NDJSON / SSE）
+# - _ocr_impl をスレッドプールで実行し、emit された途中結果をイベントループ側のキューに渡して順に送る
+#   （emit も完了通知も call_soon_threadsafe 経由なので、result は必ず最後のイベントになる）
+# - HTTP ステータスは常に 200。処理中のエラーは error イベント（status / detail）で返す
+# - クライアントが切断しても処理は最後まで続ける（結果は OCR 結果キャッシュに残り、再試行で即返る）
+# ----------------------------
+_OCR_STREAM_DONE = object()
+_ocr_stream_tasks: set = set()   # 実行中タスクの参照保持（GC で消えないように）
+
+
+def _ocr_stream_chunk(event: str, data: dict, sse: bool) -> bytes:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+    return (json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n").encode()
+
+
+def _ocr_stream_response(
+    body: OcrRequest,
+    credentials: HTTPAuthorizationCredentials,
+    user: dict,
+    request: Request,
+) -> StreamingResponse:
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: dict) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def run() -> None:
+        try:
+            result = await run_in_threadpool(_ocr_impl, body, credentials, user, emit)
+            queue.put_nowait(("result", result))
+        except HTTPException as e:
+            queue.put_nowait(("error", {"status": e.status_code, "detail": e.detail}))
+        except Exception:
+            logger.exception("OCR ストリーミング処理失敗: %s", body.file_key)
+            queue.put_nowait(("error", {"status": 500, "detail": "OCR処理でエラーが発生しました"}))
+        finally:
+            queue.put_nowait(_OCR_STREAM_DONE)
+
+    task = asyncio.create_task(run())
+    _ocr_stream_tasks.add(task)
+    task.add_done_callback(_ocr_stream_tasks.discard)
+
+    async def stream():
+        while True:
+            item = await queue.get()
+            if item is _OCR_STREAM_DONE:
+                return
+            yield _ocr_stream_chunk(*item, sse)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/ocr/stream")
+async def ocr_stream(
+    body: OcrRequest,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/ocr/stream
+    /api/ocr と同じ処理を段階ごとに返す（1行1イベントの NDJSON: {"event": ..., "data": {...}}）。
+    Accept: text/event-stream を指定した場合は SSE 形式（event: / data: 行）。
+    - fetched:    { size, elapsed_ms }
+    - rendered:   { page_count, ocr_pages, elapsed_ms }（PDF を Vision OCR する場合のみ）
+    - page:       { pages, elapsed_ms, chars, text }（ページ（グループ）ごと。完了順）
+    - text:       { text, elapsed_ms }
+    - normalized: { text_normalized, meta, warnings }
+    - alerts:     { alerts }
+    - structured: { structured }
+    - result:     /api/ocr のレスポンスと同じ JSON（最後のイベント）
+    - error:      { status, detail }（最後のイベント）
+    """
+    return _ocr_stream_response(body, credentials, user, request)
+
+
+@app.post("/ocr/stream")
+async def ocr_stream_compat(
+    body: OcrRequest,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（/api/ocr/stream と同じ処理）"""
+    return _ocr_stream_response(body, credentials, user, request)
+
+
+# ----------------------------
+# 非同期 OCR ジョブ（ocr_jobs.py）
+# - 投入は受付（file_key・hospital_id 確認）だけ行って即時に返し、OCR は専用ワーカースレッドで実行する
+#   → HTTP の同時接続数と OCR の同時実行数を切り離す。/api/ocr の 30 秒上限も適用しない
+# - user JWT はメモリ上にのみ保持する。期限切れ・再起動後の再実行は service_role + 受付時の hospital_id で行う
+# - webhook は完了通知のみ（OCR 結果は含めない。結果は GET /api/ocr/jobs/{job_id} で JWT 付きで取得させる）
+# ----------------------------
+_OCR_JOB_WORKERS = max(int(os.getenv("OCR_JOB_WORKERS", "2")), 1)            # ジョブの同時実行数
+_OCR_JOB_MAX_PENDING = max(int(os.getenv("OCR_JOB_MAX_PENDING", "100")), 1)  # 未完了ジョブ数の上限（超過は 429）
+_OCR_JOB_TIMEOUT_SECS = max(int(os.getenv("OCR_JOB_TIMEOUT_SECS", "300")), _OCR_TIMEOUT_SECS)
+_OCR_JOB_WEBHOOK_HOSTS = frozenset(
+    h.strip().lower() for h in os.getenv("OCR_JOB_WEBHOOK_HOSTS", "").split(",") if h.strip()
+)
+_OCR_JOB_WEBHOOK_SECRET = os.getenv("OCR_JOB_WEBHOOK_SECRET", "")
+
+_ocr_job_tokens: dict[str, tuple[str, float]] = {}   # job_id → (user JWT, exp)。実行開始時に取り出す
+_ocr_job_tokens_lock = threading.Lock()
+
+
+class OcrJobRequest(OcrRequest):
+    webhook_url: Optional[str] = None   # 完了通知先（https かつ OCR_JOB_WEBHOOK_HOSTS のホストのみ）
+
+
+@lru_cache(maxsize=1)
+def _ocr_job_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=_OCR_JOB_WORKERS, thread_name_prefix="ocr-job")
+
+
+def _validate_ocr_job_webhook(url: str) -> str:
+    """SSRF 対策: https・認証情報なし・許可リストのホストのみ受け付ける"""
+    try:
+        parts = urllib.parse.urlsplit(url)
+        host = (parts.hostname or "").lower()
+        parts.port  # 不正なポート表記は ValueError
+    except ValueError:
+        host = ""
+    if (
+        not host
+        or parts.scheme != "https"
+        or parts.username is not None
+        or parts.password is not None
+        or host not in _OCR_JOB_WEBHOOK_HOSTS
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="webhook_url が許可されていません（https かつ許可されたホストのみ指定できます）",
+        )
+    return url
+
+
+def _notify_ocr_job_webhook(url: str, job_id: str, status: str) -> None:
+    """完了通知（best-effort・1回のみ。リダイレクトは追わない）"""
+    payload = json.dumps({"job_id": job_id, "status": status}).encode()
+    headers = {"Content-Type": "application/json"}
+    if _OCR_JOB_WEBHOOK_SECRET:
+        digest = hmac.new(_OCR_JOB_WEBHOOK_SECRET.encode(), payload, hashlib.sha256).hexdigest()
+        headers["X-DocPort-Signature"] = f"sha256={digest}"
+    try:
+        resp = get_http_client().post(
+            url, content=payload, headers=headers, timeout=request_timeout(5), follow_redirects=False,
+        )
+        if resp.status_code >= 300:
+            logger.warning("[ocr-job] webhook 応答異常: job_id=%s status=%d", job_id, resp.status_code)
+    except Exception as e:
+        logger.warning("[ocr-job] webhook 送信失敗: job_id=%s %s", job_id, e)
+
+
+def _run_ocr_job(job_id: str) -> None:
+    """ワーカースレッドで1ジョブを実行する（他プロセスが取得済みなら何もしない）"""
+    store = get_ocr_job_store()
+    with _ocr_job_tokens_lock:
+        token = _ocr_job_tokens.pop(job_id, None)
+    if not store.claim(job_id):
+        return
+    job = store.get(job_id)
+    # 残り有効期限が短い JWT は使わない（途中で失効して content_blobs の読み書きが失敗するため）
+    jwt_token = token[0] if token and token[1] > time.time() + 60 else None
+
+    try:
+        result = _ocr_run(
+            OcrRequest(file_key=job["file_key"], mode=job["mode"]),
+            job["hospital_id"], jwt_token,
+            timeout_secs=_OCR_JOB_TIMEOUT_SECS,
+        )
+        store.finish(job_id, result=result)
+        status = "succeeded"
+    except HTTPException as e:
+        store.finish(job_id, error_status=e.status_code, error_detail=str(e.detail))
+        status = "failed"
+    except Exception:
+        logger.exception("[ocr-job] 実行失敗: job_id=%s", job_id)
+        store.finish(job_id, error_status=500, error_detail="OCR処理でエラーが発生しました")
+        status = "failed"
+    logger.info(
+        "[ocr-job] 完了: job_id=%s status=%s elapsed=%.1fs",
+        job_id, status, time.time() - (job["started_at"] or time.time()),
+    )
+
+    if job["webhook_url"]:
+        _notify_ocr_job_webhook(job["webhook_url"], job_id, status)
+
+
+def _resume_ocr_jobs() -> None:
+    """起動時: 前回プロセスで未完了だったジョブを再投入する"""
+    try:
+        job_ids = get_ocr_job_store().recover()
+    except Exception as e:
+        logger.warning("[ocr-job] 未完了ジョブの復旧に失敗: %s", e)
+        return
+    if job_ids:
+        logger.info("[ocr-job] 未完了ジョブを再投入: %d 件", len(job_ids))
+    for job_id in job_ids:
+        _ocr_job_executor().submit(_run_ocr_job, job_id)
+
+
+def _ocr_job_submit_impl(
+    body: OcrJobRequest, credentials: HTTPAuthorizationCredentials, user: dict,
+) -> dict:
+    _ocr_file_ext(body.file_key)
+    if body.webhook_url:
+        _validate_ocr_job_webhook(body.webhook_url)
+
+    jwt_token = credentials.credentials
+    user_id = user.get("sub", "")
+    hospital_id = _get_hospital_id(user_id, jwt_token, claims=user)
+
+    store = get_ocr_job_store()
+    if store.count_pending() >= _OCR_JOB_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="OCR処理が混み合っています。しばらくしてから再度お試しください",
+        )
+
+    job_id = str(uuid.uuid4())
+    store.create(
+        job_id,
+        user_id=user_id,
+        hospital_id=hospital_id,
+        file_key=body.file_key,
+        mode=body.mode,
+        webhook_url=body.webhook_url,
+    )
+    with _ocr_job_tokens_lock:
+        _ocr_job_tokens[job_id] = (jwt_token, float(user.get("exp") or 0))
+    _ocr_job_executor().submit(_run_ocr_job, job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+def _ocr_job_get_impl(job_id: str, user: dict) -> dict:
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="無効なジョブIDです")
+    job = get_ocr_job_store().get(job_id)
+    # 他ユーザーのジョブは存在も明かさない
+    if job is None or job["user_id"] != user.get("sub", ""):
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+    def _iso(ts: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+    resp = {
+        "job_id":      job["id"],
+        "status":      job["status"],
+        "file_key":    job["file_key"],
+        "mode":        job["mode"],
+        "attempts":    job["attempts"],
+        "created_at":  _iso(job["created_at"]),
+        "started_at":  _iso(job["started_at"]),
+        "finished_at": _iso(job["finished_at"]),
+    }
+    if job["status"] == "succeeded":
+        resp["result"] = job["result"]   # /api/ocr のレスポンスと同じ JSON
+    elif job["status"] == "failed":
+        resp["error"] = {"status": job["error_status"], "detail": job["error_detail"]}
+    return resp
+
+
+@app.post("/api/ocr/jobs", status_code=202)
+def ocr_job_submit(
+    body: OcrJobRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/ocr/jobs
+    OCR ジョブを受け付けて { job_id, status: "queued" } を即時に返す（202）。
+    結果は GET /api/ocr/jobs/{job_id} で取得する（webhook_url 指定時は完了時に通知）。
+    """
+    return _ocr_job_submit_impl(body, credentials, user)
+
+
+@app.post("/ocr/jobs", status_code=202)
+def ocr_job_submit_compat(
+    body: OcrJobRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（/api/ocr/jobs と同じ処理）"""
+    return _ocr_job_submit_impl(body, credentials, user)
+
+
+@app.get("/api/ocr/jobs/{job_id}")
+def ocr_job_get(job_id: str, user: dict = Depends(verify_jwt)):
+    """
+    GET /api/ocr/jobs/{job_id}
+    ジョブの状態を返す（投入したユーザーのみ）。succeeded は result（/api/ocr と同じ JSON）、
+    failed は error（status / detail）を含む。
+    """
+    return _ocr_job_get_impl(job_id, user)
+
+
+@app.get("/ocr/jobs/{job_id}")
+def ocr_job_get_compat(job_id: str, user: dict = Depends(verify_jwt)):
+    """compat: Vite proxy 経由のローカル開発用（/api/ocr/jobs/{job_id} と同じ処理）"""
+    return _ocr_job_get_impl(job_id, user)
+
+
 # ----------------------------
 # 港モデル: Supabase PATCH / POST ヘルパー（user JWT 使用）
 # ----------------------------
@@ -1387,30 +3427,10 @@ def _supabase_patch(path: str, data: dict, jwt_token: str) -> list:
             status_code=500,
             detail="SUPABASE_URL / SUPABASE_ANON_KEY が未設定です",
         )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    payload = json.dumps(data).encode()
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        method="PATCH",
-        headers={
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {jwt_token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Prefer": "return=representation",
-        },
+    return _supabase_request(
+        "PATCH", path, SUPABASE_ANON_KEY, jwt_token,
+        data=data, prefer="return=representation", timeout=5, label="supabase-user-patch",
     )
-    try:
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            body_bytes = resp.read()
-            return json.loads(body_bytes) if body_bytes else []
-    except urllib.error.HTTPError as e:
-        logger.error("Supabase user PATCH エラー (%d): path=%s", e.code, path)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
-    except Exception:
-        logger.exception("Supabase user PATCH 接続エラー: path=%s", path)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
 
 
 def _supabase_post_db(path: str, data: dict, jwt_token: str) -> list:
@@ -1423,30 +3443,36 @@ def _supabase_post_db(path: str, data: dict, jwt_token: str) -> list:
             status_code=500,
             detail="SUPABASE_URL / SUPABASE_ANON_KEY が未設定です",
         )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    payload = json.dumps(data).encode()
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        method="POST",
-        headers={
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {jwt_token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Prefer": "return=representation",
-        },
+    return _supabase_request(
+        "POST", path, SUPABASE_ANON_KEY, jwt_token,
+        data=data, prefer="return=representation", timeout=5, label="supabase-user-post",
     )
+
+
+def _supabase_rpc(fn: str, args: dict, jwt_token: str, errors: Dict[str, Tuple[int, str]]) -> dict:
+    """
+    user JWT で PostgREST RPC（POST /rest/v1/rpc/<fn>）を呼び出す（関数内でも RLS が効く）。
+    errors: DB 関数が RAISE する SQLSTATE → (HTTP ステータス, detail) の対応表。
+    対応表にないエラーは 502、関数未作成（PGRST202: マイグレーション未適用）は 500 にする。
+    """
+    if not SUPABASE_URL or not SUPABASE_ANON_KEY:
+        raise HTTPException(
+            status_code=500,
+            detail="SUPABASE_URL / SUPABASE_ANON_KEY が未設定です",
+        )
     try:
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            body_bytes = resp.read()
-            return json.loads(body_bytes) if body_bytes else []
-    except urllib.error.HTTPError as e:
-        logger.error("Supabase user POST エラー (%d): path=%s", e.code, path)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
-    except Exception:
-        logger.exception("Supabase user POST 接続エラー: path=%s", path)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
+        return _supabase_request(
+            "POST", f"rpc/{fn}", SUPABASE_ANON_KEY, jwt_token,
+            data=args, timeout=8, label=f"supabase-rpc-{fn}",
+        )
+    except _SupabaseError as e:
+        if e.pg_code in errors:
+            status, detail = errors[e.pg_code]
+            raise HTTPException(status_code=status, detail=detail)
+        if e.pg_code == "PGRST202":
+            logger.error("[supabase-rpc] 関数 %s が見つかりません（マイグレーション未適用）", fn)
+            raise HTTPException(status_code=500, detail="データベース関数が未適用です")
+        raise
 
 
 # ----------------------------
@@ -1463,6 +3489,14 @@ _ASSIGN_VALID_STATUSES = frozenset(
 )
 
 
+# assign_document() が RAISE する SQLSTATE → HTTP ステータス
+_ASSIGN_RPC_ERRORS: Dict[str, Tuple[int, str]] = {
+    "P0002": (404, "ドキュメントが見つかりません（権限なし）"),
+    "42501": (403, "自院宛のドキュメントのみアサインできます"),
+    "22023": (400, "無効なステータスです"),
+}
+
+
 def _assign_impl(
     doc_id: str,
     body: AssignRequest,
@@ -1471,16 +3505,13 @@ def _assign_impl(
 ) -> dict:
     """
     アサイン処理の共通実装 (Phase 1: document_assignments テーブルに書き込む)。
-    1. JWT → hospital_id 取得
-    2. documents GET → to_hospital_id で自院チェック
-    3. document_assignments: 既存 is_current=true を false に更新
-    4. document_assignments: 新レコード INSERT
-    5. documents PATCH: status のみ更新（assigned_* は documents に書かない）
-    6. document_logs INSERT（best-effort）
+    DB 関数 assign_document()（db/migrations/004）を1回呼び出し、1トランザクションで以下を行う:
+    1. auth.uid() → hospital_id 取得、documents を FOR UPDATE でロックして自院チェック
+    2. document_assignments: 既存 is_current=true を false に更新 → 新レコード INSERT
+    3. documents: status のみ更新（assigned_* は documents に書かない）
+    4. document_logs INSERT（best-effort）
     """
     jwt_token = credentials.credentials
-    user_id = user.get("sub", "")
-    hospital_id = _get_hospital_id(user_id, jwt_token)
 
     # ---- doc_id バリデーション（UUID 形式のみ許可） ----
     doc_id_stripped = doc_id.strip()
@@ -1489,92 +3520,29 @@ def _assign_impl(
     except ValueError:
         raise HTTPException(status_code=400, detail="無効なドキュメントIDです")
 
-    doc_id_enc = urllib.parse.quote(doc_id_stripped, safe="")
-
-    # ---- 対象ドキュメント取得（RLS: to_hospital_id=自院のみ返る） ----
-    rows = _supabase_get(
-        f"documents?id=eq.{doc_id_enc}&select=id,status,to_hospital_id",
-        jwt_token,
-    )
-    if not rows:
-        raise HTTPException(
-            status_code=404, detail="ドキュメントが見つかりません（権限なし）"
-        )
-
-    doc = rows[0]
-    if doc.get("to_hospital_id") != hospital_id:
-        raise HTTPException(
-            status_code=403, detail="自院宛のドキュメントのみアサインできます"
-        )
-
-    old_status = doc.get("status", "UPLOADED")
-    new_status = body.to_status if body.to_status else old_status
-    if new_status not in _ASSIGN_VALID_STATUSES:
-        raise HTTPException(status_code=400, detail=f"無効なステータス: {new_status}")
-
-    assigned_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    hospital_id_enc = urllib.parse.quote(hospital_id, safe="")
-
-    # ---- 既存アサインを非現在化（0件でも正常） ----
-    # UNIQUE INDEX (document_id) WHERE is_current=true の制約があるため、
-    # 先に false にしてから INSERT する順序を守ること。
-    _supabase_patch(
-        f"document_assignments?document_id=eq.{doc_id_enc}&is_current=eq.true",
-        {"is_current": False},
-        jwt_token,
-    )
+    # 明示指定されたステータスは DB に投げる前に弾く（DB 側でも同じ検証をする）
+    if body.to_status and body.to_status not in _ASSIGN_VALID_STATUSES:
+        raise HTTPException(status_code=400, detail=f"無効なステータス: {body.to_status}")
 
-    # ---- 新アサインを INSERT ----
-    _supabase_post_db(
-        "document_assignments",
+    result = _supabase_rpc(
+        "assign_document",
         {
-            "document_id": doc_id_stripped,
-            "hospital_id": hospital_id,
-            "assigned_department": body.assigned_department,
-            "owner_user_id": body.owner_user_id,
-            "assigned_by": user_id,
-            "assigned_at": assigned_at,
-            "is_current": True,
+            "p_document_id":         doc_id_stripped,
+            "p_assigned_department": body.assigned_department,
+            "p_owner_user_id":       body.owner_user_id,
+            "p_to_status":           body.to_status,
         },
-        jwt_token,
-    )
-
-    # ---- documents の status のみ更新（担当情報は documents に書かない） ----
-    updated = _supabase_patch(
-        f"documents?id=eq.{doc_id_enc}&to_hospital_id=eq.{hospital_id_enc}",
-        {"status": new_status},
-        jwt_token,
-    )
-    if not updated:
-        raise HTTPException(
-            status_code=403,
-            detail="ステータス更新に失敗しました（RLS により更新が拒否されました）",
-        )
-
-    # ---- document_logs INSERT（best-effort） ----
-    try:
-        _supabase_post_db(
-            "document_logs",
-            {
-                "document_id": doc_id_stripped,
-                "hospital_id": hospital_id,
-                "action": "ASSIGN",
-                "from_status": old_status,
-                "to_status": new_status,
-                "changed_by": user_id,
-            },
-            jwt_token,
-        )
-    except Exception:
-        pass  # best-effort: ログ失敗でも本体処理を継続
+        jwt_token,
+        _ASSIGN_RPC_ERRORS,
+    )
 
     return {
         "ok": True,
         "document_id": doc_id_stripped,
-        "assigned_at": assigned_at,
+        "assigned_at": result.get("assigned_at"),
         "owner_user_id": body.owner_user_id,
         "assigned_department": body.assigned_department,
-        "status": new_status,
+        "status": result.get("status"),
     }
 
 
@@ -1609,6 +3577,149 @@ def assign_document_compat(
     return _assign_impl(doc_id, body, credentials, user)
 
 
+# ----------------------------
+# 港モデル: 一括アサイン API（受信BOXの一括振り分け用）
+# ----------------------------
+_BULK_ASSIGN_MAX = 100   # 1リクエストあたりの最大件数
+
+
+class BulkAssignItem(BaseModel):
+    doc_id: str
+    assigned_department: Optional[str] = None   # 省略時は BulkAssignRequest の値を使う
+    owner_user_id: Optional[str] = None
+    to_status: Optional[str] = None
+
+
+class BulkAssignRequest(BaseModel):
+    # 共通指定: doc_ids すべてに同じ部署・担当者・ステータスを適用する
+    doc_ids: List[str] = []
+    assigned_department: Optional[str] = None
+    owner_user_id: Optional[str] = None
+    to_status: Optional[str] = None
+    # 個別指定: 文書ごとに部署・担当者を指定する（未指定フィールドは共通指定で補完）
+    items: List[BulkAssignItem] = []
+
+
+def _assign_bulk_impl(
+    body: BulkAssignRequest,
+    credentials: HTTPAuthorizationCredentials,
+    user: dict,
+) -> dict:
+    """
+    一括アサインの共通実装。
+    1. doc_ids / items を文書ごとの指定に展開し、UUID（文書・担当者）・部署・ステータスを API 側で検証
+    2. 検証 OK の文書を DB 関数 assign_documents_bulk()（db/migrations/005）に1回で渡す
+       → 対象文書を1クエリで検証し、担当切替・status 更新・ログをまとめて書き込む
+    3. 文書ごとの結果をリクエスト順で返す（一部失敗しても他の文書は確定する）
+    """
+    jwt_token = credentials.credentials
+
+    requested: list[BulkAssignItem] = [BulkAssignItem(doc_id=d) for d in body.doc_ids] + list(body.items)
+    if not requested:
+        raise HTTPException(status_code=400, detail="doc_ids または items を指定してください")
+    if len(requested) > _BULK_ASSIGN_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度にアサインできるのは {_BULK_ASSIGN_MAX} 件までです",
+        )
+
+    results: list[dict] = []
+    rpc_items: list[dict] = []
+    seen: set[str] = set()
+    for item in requested:
+        doc_id = item.doc_id.strip()
+        department = item.assigned_department or body.assigned_department
+        owner = item.owner_user_id or body.owner_user_id
+        to_status = item.to_status or body.to_status
+
+        error = None
+        try:
+            doc_id = str(uuid.UUID(doc_id))
+        except ValueError:
+            error = "invalid_document_id"
+        if error is None and doc_id in seen:
+            error = "duplicate"
+        if error is None and owner:
+            # 不正な UUID を渡すと DB 関数の uuid キャストで RPC 全体が失敗するため、文書単位で弾く
+            try:
+                owner = str(uuid.UUID(owner.strip()))
+            except ValueError:
+                error = "invalid_owner_user_id"
+        if error is None and not department:
+            error = "missing_department"
+        if error is None and to_status and to_status not in _ASSIGN_VALID_STATUSES:
+            error = "invalid_status"
+
+        results.append({"document_id": doc_id, "ok": False, "error": error})
+        if error is None:
+            seen.add(doc_id)
+            rpc_items.append({
+                "document_id":         doc_id,
+                "assigned_department": department,
+                "owner_user_id":       owner,
+                "to_status":           to_status,
+            })
+
+    assigned_at = None
+    if rpc_items:
+        rpc = _supabase_rpc(
+            "assign_documents_bulk",
+            {"p_items": rpc_items},
+            jwt_token,
+            {"42501": (403, "プロフィールが見つかりません（hospital_id 未設定）")},
+        )
+        assigned_at = rpc.get("assigned_at")
+        by_id = {r.get("document_id"): r for r in rpc.get("results") or []}
+        for res in results:
+            if res["error"] is not None:
+                continue
+            r = by_id.get(res["document_id"])
+            if r is None:
+                res["error"] = "not_processed"
+                continue
+            res["ok"] = bool(r.get("ok"))
+            res["error"] = r.get("error")
+            if res["ok"]:
+                res["status"] = r.get("status")
+
+    succeeded = sum(1 for r in results if r["ok"])
+    return {
+        "ok":          True,
+        "assigned_at": assigned_at,
+        "succeeded":   succeeded,
+        "failed":      len(results) - succeeded,
+        "results":     results,
+    }
+
+
+@app.post("/api/documents/assign-bulk")
+def assign_documents_bulk_api(
+    body: BulkAssignRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """
+    POST /api/documents/assign-bulk
+    受信側一括アサイン: 複数文書の担当情報をまとめて書き込み、documents.status を更新する。
+
+    - JWT 必須（自院メンバーのみ）
+    - doc_ids + 共通の部署/担当者、または items で文書ごとに指定（最大 _BULK_ASSIGN_MAX 件）
+    - 自院宛チェック・担当切替・status 更新・ログは DB 関数内で1トランザクション
+    - 返却: { ok, assigned_at, succeeded, failed, results: [{document_id, ok, error, status}] }
+    """
+    return _assign_bulk_impl(body, credentials, user)
+
+
+@app.post("/documents/assign-bulk")
+def assign_documents_bulk_compat(
+    body: BulkAssignRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(_bearer),
+    user: dict = Depends(verify_jwt),
+):
+    """compat: Vite proxy 経由のローカル開発用（/api/documents/assign-bulk と同じ処理）"""
+    return _assign_bulk_impl(body, credentials, user)
+
+
 # ===========================================================================
 # 変更点（v2.6 CLOUD-FAX-API Webhook統合）:
 # 1. POST /api/webhook/cloudfax/inbound: Webhook受信→PDF取得→R2保存→documents INSERT
@@ -1689,115 +3800,266 @@ def _verify_webhook_secret(request: Request) -> None:
 # service_role 用 Supabase ヘルパー（Webhook処理専用）
 # service_role は fax_inbounds / documents の INSERT/PATCH のみに限定して使用する
 # ----------------------------
-def _supabase_service_post(path: str, data: dict, prefer: str = "return=representation") -> list:
-    """service_role で Supabase REST API に POST する（Webhook処理専用）"""
+def _require_service_role() -> None:
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise HTTPException(
             status_code=500,
             detail="SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY が未設定です",
         )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    payload = json.dumps(data).encode()
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        method="POST",
-        headers={
-            "apikey":        SUPABASE_SERVICE_ROLE_KEY,
-            "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-            "Content-Type":  "application/json",
-            "Accept":        "application/json",
-            "Prefer":        prefer,
-        },
+
+
+def _supabase_service_post(path: str, data: dict, prefer: str = "return=representation") -> list:
+    """service_role で Supabase REST API に POST する（Webhook処理専用）"""
+    _require_service_role()
+    return _supabase_request(
+        "POST", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        data=data, prefer=prefer, timeout=10, label="supabase-service-post",
     )
-    try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            body_bytes = resp.read()
-            return json.loads(body_bytes) if body_bytes else []
-    except urllib.error.HTTPError as e:
-        body_text = e.read().decode(errors="replace")
-        logger.error("Supabase service POST エラー (%d): %s", e.code, body_text)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
-    except Exception:
-        logger.exception("Supabase service POST 接続エラー")
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
 
 
 def _supabase_service_patch(path: str, data: dict) -> list:
     """service_role で Supabase REST API を PATCH する（Webhook処理専用）"""
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY が未設定です",
-        )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    payload = json.dumps(data).encode()
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        method="PATCH",
-        headers={
-            "apikey":        SUPABASE_SERVICE_ROLE_KEY,
-            "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-            "Content-Type":  "application/json",
-            "Accept":        "application/json",
-            "Prefer":        "return=representation",
-        },
+    _require_service_role()
+    return _supabase_request(
+        "PATCH", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        data=data, prefer="return=representation", timeout=10, label="supabase-service-patch",
     )
-    try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            body_bytes = resp.read()
-            return json.loads(body_bytes) if body_bytes else []
-    except urllib.error.HTTPError as e:
-        logger.error("Supabase service PATCH エラー (%d)", e.code)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
-    except Exception:
-        logger.exception("Supabase service PATCH 接続エラー")
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
 
 
 def _supabase_service_get(path: str) -> list:
     """service_role で Supabase REST API を GET する（Webhook処理専用）"""
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY が未設定です",
-        )
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{path}"
-    req = urllib.request.Request(
-        url,
-        method="GET",
-        headers={
-            "apikey":        SUPABASE_SERVICE_ROLE_KEY,
-            "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-            "Accept":        "application/json",
-        },
+    _require_service_role()
+    return _supabase_request(
+        "GET", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        timeout=10, label="supabase-service-get",
+    )
+
+
+async def _supabase_service_post_async(
+    path: str, data: dict, prefer: str = "return=representation"
+) -> list:
+    """_supabase_service_post の非同期版（Webhook / FAX送信の async 処理用）"""
+    _require_service_role()
+    return await _supabase_request_async(
+        "POST", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        data=data, prefer=prefer, timeout=10, label="supabase-service-post",
+    )
+
+
+async def _supabase_service_patch_async(path: str, data: dict) -> list:
+    """_supabase_service_patch の非同期版"""
+    _require_service_role()
+    return await _supabase_request_async(
+        "PATCH", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        data=data, prefer="return=representation", timeout=10, label="supabase-service-patch",
+    )
+
+
+async def _supabase_service_get_async(path: str) -> list:
+    """_supabase_service_get の非同期版"""
+    _require_service_role()
+    return await _supabase_request_async(
+        "GET", path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+        timeout=10, label="supabase-service-get",
     )
+
+
+# ----------------------------
+# 内容ハッシュ索引（content_blobs: db/migrations/006）
+# - 同じバイト列の R2 保存・OCR を省略するための sha256 → 正規キー + OCR 成果物 の索引（病院単位）
+# - sha256 は必ずサーバーが受信・取得したバイト列から計算する（クライアント申告値は使わない）
+# - 索引の読み書きは best-effort（テーブル未適用・通信失敗時は重複排除なしで従来どおり処理する）
+# - OCR 成果物は ocr_version（_OCR_CACHE_VERSION）が一致する行だけ再利用し、一致しない行は新しい結果で上書きする
+# ----------------------------
+_CONTENT_BLOB_SELECT = "file_key,size_bytes,page_count,ocr_text,structured_json,ocr_version,hit_count"
+_VISION_OCR_EXTS = {"pdf", "png", "jpg"}   # OCR テキストを索引に保存する形式（Vision API を使う形式）
+
+_dedup_lock = threading.Lock()
+_dedup_counters: dict[str, int] = {
+    "r2_puts_skipped":       0,   # 既知の内容のため R2 PUT を省略した回数
+    "r2_bytes_saved":        0,   # 省略した PUT のバイト数合計
+    "ocr_calls_saved":       0,   # 保存済み OCR テキストを再利用した回数（Vision API 呼び出し省略）
+    "structure_calls_saved": 0,   # 保存済み構造化JSONを再利用した回数
+}
+
+
+def _dedup_count(name: str, n: int = 1) -> None:
+    with _dedup_lock:
+        _dedup_counters[name] += n
+
+
+def _dedup_metrics() -> dict:
+    """重複排除による節約量（/api/metrics で返す。プロセス起動以降の累計）"""
+    with _dedup_lock:
+        return dict(_dedup_counters)
+
+
+def _content_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _content_blob_has_current_ocr(blob: Optional[dict]) -> bool:
+    """索引の OCR テキストが現在の設定（プロンプト・モデル・ページ上限など）で作られたものか"""
+    return bool(blob and blob.get("ocr_text") and blob.get("ocr_version") == _OCR_CACHE_VERSION)
+
+
+def _content_blob_path(hospital_id: str, sha256: str) -> str:
+    return (
+        f"content_blobs?hospital_id=eq.{urllib.parse.quote(hospital_id, safe='')}"
+        f"&sha256=eq.{sha256}"
+    )
+
+
+def _content_blob_write(
+    hospital_id: str,
+    sha256: str,
+    blob: Optional[dict],
+    *,
+    file_key: str,
+    size: int,
+    content_type: str,
+    page_count: Optional[int] = None,
+    ocr_text: Optional[str] = None,
+    structured: Optional[dict] = None,
+    repoint: bool = False,
+    count_hit: bool = True,
+) -> Tuple[str, str, dict, Optional[str]]:
+    """
+    索引への書き込み内容を組み立てる。戻り値: (method, path, data, prefer)
+    - 未登録: 新規 INSERT（同時登録は先勝ち。file_key は上書きしない）
+    - 登録済み: hit_count を加算し、未保存の成果物だけを埋める
+      ocr_version が現在と違う行は、OCR テキストと構造化JSONをまとめて新しい結果で置き換える
+      repoint=True のときのみ file_key を付け替える（索引のキーが R2 から消えていた場合）
+      count_hit=False のときは hit_count を加算しない（同じ受信の後続処理から成果物だけ書く場合）
+    """
+    if blob is None:
+        row = {
+            "hospital_id":     hospital_id,
+            "sha256":          sha256,
+            "file_key":        file_key,
+            "size_bytes":      size,
+            "content_type":    content_type,
+            "page_count":      page_count,
+            "ocr_text":        ocr_text or None,
+            "structured_json": structured,
+            "ocr_version":     _OCR_CACHE_VERSION if ocr_text else None,
+        }
+        return "POST", "content_blobs", row, "resolution=ignore-duplicates,return=minimal"
+
+    data: dict = {}
+    if count_hit:
+        data["hit_count"] = int(blob.get("hit_count") or 0) + 1
+        data["last_hit_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    if repoint:
+        data["file_key"] = file_key
+    if ocr_text and not _content_blob_has_current_ocr(blob):
+        data["ocr_text"] = ocr_text
+        data["page_count"] = page_count
+        data["ocr_version"] = _OCR_CACHE_VERSION
+        data["structured_json"] = structured   # 古い版の構造化JSONは残さない（None でも上書き）
+    elif structured and _content_blob_has_current_ocr(blob) and not blob.get("structured_json"):
+        data["structured_json"] = structured
+    return "PATCH", _content_blob_path(hospital_id, sha256), data, "return=minimal"
+
+
+def _content_blob_get(hospital_id: str, sha256: str, jwt_token: Optional[str] = None) -> Optional[dict]:
+    """索引を照会する。jwt_token 指定時は user JWT（RLS: 自院の行のみ）、未指定時は service_role。"""
+    path = f"{_content_blob_path(hospital_id, sha256)}&select={_CONTENT_BLOB_SELECT}"
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            body_bytes = resp.read()
-            return json.loads(body_bytes) if body_bytes else []
-    except urllib.error.HTTPError as e:
-        body_text = e.read().decode(errors="replace")
-        logger.error("Supabase service GET エラー (%d): %s", e.code, body_text)
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
-    except Exception:
-        logger.exception("Supabase service GET 接続エラー")
-        raise HTTPException(status_code=502, detail="データベース操作でエラーが発生しました")
+        rows = _supabase_get(path, jwt_token) if jwt_token else _supabase_service_get(path)
+    except Exception as e:
+        logger.warning("[dedup] content_blobs 照会失敗（重複排除なしで続行）: %s", e)
+        return None
+    return rows[0] if rows else None
+
+
+def _content_blob_record(
+    hospital_id: str, sha256: str, blob: Optional[dict], jwt_token: Optional[str] = None, **fields
+) -> None:
+    """索引に登録 / 成果物を追記する（best-effort）。fields は _content_blob_write のキーワード引数。"""
+    method, path, data, prefer = _content_blob_write(hospital_id, sha256, blob, **fields)
+    if not data:
+        return
+    try:
+        if jwt_token:
+            _supabase_request(
+                method, path, SUPABASE_ANON_KEY, jwt_token,
+                data=data, prefer=prefer, timeout=5, label="supabase-user-blob",
+            )
+        else:
+            _require_service_role()
+            _supabase_request(
+                method, path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+                data=data, prefer=prefer, timeout=10, label="supabase-service-blob",
+            )
+    except Exception as e:
+        logger.warning("[dedup] content_blobs 書き込み失敗（処理は続行）: %s", e)
+
+
+async def _content_blob_get_async(hospital_id: str, sha256: str) -> Optional[dict]:
+    """_content_blob_get の非同期版（service_role。Webhook 用）"""
+    path = f"{_content_blob_path(hospital_id, sha256)}&select={_CONTENT_BLOB_SELECT}"
+    try:
+        rows = await _supabase_service_get_async(path)
+    except Exception as e:
+        logger.warning("[dedup] content_blobs 照会失敗（重複排除なしで続行）: %s", e)
+        return None
+    return rows[0] if rows else None
+
+
+async def _content_blob_record_async(hospital_id: str, sha256: str, blob: Optional[dict], **fields) -> None:
+    """_content_blob_record の非同期版（service_role。Webhook 用）"""
+    method, path, data, prefer = _content_blob_write(hospital_id, sha256, blob, **fields)
+    if not data:
+        return
+    try:
+        _require_service_role()
+        await _supabase_request_async(
+            method, path, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_SERVICE_ROLE_KEY,
+            data=data, prefer=prefer, timeout=10, label="supabase-service-blob",
+        )
+    except Exception as e:
+        logger.warning("[dedup] content_blobs 書き込み失敗（処理は続行）: %s", e)
 
 
 # ----------------------------
 # R2 直接アップロードヘルパー（Webhook→PDF保存専用）
 # ----------------------------
-def _r2_put_object(file_key: str, data: bytes, content_type: str = "application/pdf") -> None:
-    """R2 に直接 PUT する（Presigned URL 不使用。Webhook処理でのみ使用）"""
+async def _r2_put_object(file_key: str, data: bytes, content_type: str = "application/pdf") -> None:
+    """
+    R2 に PUT する（Webhook処理でのみ使用）。
+    boto3 は同期 I/O のため、署名済み PUT URL をローカル署名で生成して非同期 HTTP クライアントで送信する
+    （イベントループを止めない）。
+    """
     try:
         bucket = get_bucket_name()
-        s3 = get_s3_client()
+        presigner = get_r2_presigner()
     except Exception:
         logger.exception("R2クライアント初期化失敗 (put_object)")
         raise HTTPException(status_code=500, detail="ストレージ接続エラーが発生しました")
-    s3.put_object(Bucket=bucket, Key=file_key, Body=data, ContentType=content_type)
+    url = presigner.generate_presigned_url(
+        ClientMethod="put_object",
+        Params={"Bucket": bucket, "Key": file_key, "ContentType": content_type},
+        ExpiresIn=60,
+    )
+    resp = await get_async_http_client().put(
+        url, content=data, headers={"Content-Type": content_type}, timeout=request_timeout(60),
+    )
+    if resp.status_code >= 300:
+        raise RuntimeError(f"R2 PUT 失敗 (HTTP {resp.status_code}): {resp.text[:200]}")
+
+
+async def _r2_object_exists(file_key: str) -> bool:
+    """署名済み HEAD URL で R2 上のオブジェクト存在を確認する（非同期）。"""
+    bucket = get_bucket_name()
+    presigner = get_r2_presigner()
+    url = presigner.generate_presigned_url(
+        ClientMethod="head_object",
+        Params={"Bucket": bucket, "Key": file_key},
+        ExpiresIn=60,
+    )
+    resp = await get_async_http_client().head(url, timeout=request_timeout(10))
+    return resp.status_code == 200
 
 
 # ----------------------------
@@ -1823,31 +4085,36 @@ def _cloudfax_auth_headers(accept: str = "application/json") -> dict:
     }
 
 
-def _cloudfax_fetch_status(transmission_id: str) -> dict:
+async def _cloudfax_fetch_status(transmission_id: str) -> dict:
     """
     GET /v1/Faxes/{transmission_id} で FAX ステータス JSON を取得する。
     media_url を含む CloudFAX のレスポンス dict を返す。
     """
     url = f"{CLOUDFAX_API_BASE}/Faxes/{urllib.parse.quote(transmission_id, safe='')}"
     logger.info("[cloudfax] ステータス取得: transmission_id=%s", transmission_id)
-    req = urllib.request.Request(url, headers=_cloudfax_auth_headers("application/json"))
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            body = json.loads(resp.read().decode())
-            logger.debug("[cloudfax] ステータスレスポンス: status=%s", body.get("status"))
-            return body
-    except urllib.error.HTTPError as e:
-        body_text = e.read().decode(errors="replace")
-        logger.error("[cloudfax] ステータス取得 HTTP エラー (%d): %s", e.code, body_text)
-        raise RuntimeError(f"CloudFAX ステータス取得失敗 (HTTP {e.code})")
+        resp = await get_async_http_client().get(
+            url, headers=_cloudfax_auth_headers("application/json"), timeout=request_timeout(30),
+            follow_redirects=True,
+        )
     except RuntimeError:
         raise
     except Exception as e:
         logger.exception("[cloudfax] ステータス取得 接続エラー")
         raise RuntimeError(f"CloudFAX ステータス取得 接続エラー: {e}")
 
+    if resp.status_code >= 400:
+        logger.error("[cloudfax] ステータス取得 HTTP エラー (%d): %s", resp.status_code, resp.text)
+        raise RuntimeError(f"CloudFAX ステータス取得失敗 (HTTP {resp.status_code})")
+    try:
+        body = resp.json()
+    except ValueError as e:
+        raise RuntimeError(f"CloudFAX ステータス取得 JSON 解析失敗: {e}")
+    logger.debug("[cloudfax] ステータスレスポンス: status=%s", body.get("status"))
+    return body
+
 
-def _cloudfax_fetch_media(media_url: str) -> bytes:
+async def _cloudfax_fetch_media(media_url: str) -> bytes:
     """
     media_url から PDF bytes を取得する。
     Accept: application/pdf,application/octet-stream,application/json
@@ -1855,41 +4122,43 @@ def _cloudfax_fetch_media(media_url: str) -> bytes:
     """
     safe_url = media_url.split("?")[0]
     logger.info("[cloudfax] PDF取得開始: media_url=%s", safe_url)
-    req = urllib.request.Request(
-        media_url,
-        headers=_cloudfax_auth_headers(
-            "application/pdf,application/octet-stream,application/json"
-        ),
-    )
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            content_type = resp.headers.get("Content-Type", "")
-            data = resp.read()
-            # Content-Type が JSON かつ %PDF ヘッダが無い場合は仕様齟齬として失敗扱い
-            if not data.startswith(b"%PDF") and "json" in content_type.lower():
-                logger.error(
-                    "[cloudfax] media_url が JSON を返しました (Content-Type=%s 先頭=%s)",
-                    content_type, data[:120],
-                )
-                raise RuntimeError(
-                    f"media_url が PDF ではなく JSON を返しました "
-                    f"(Content-Type={content_type!r})"
-                )
-            logger.info(
-                "[cloudfax] PDF取得完了: size=%d bytes, Content-Type=%s",
-                len(data), content_type,
-            )
-            return data
-    except urllib.error.HTTPError as e:
-        body_text = e.read().decode(errors="replace")
-        logger.error("[cloudfax] PDF取得 HTTP エラー (%d): %s", e.code, body_text)
-        raise RuntimeError(f"CloudFAX PDF取得失敗 (HTTP {e.code})")
+        resp = await get_async_http_client().get(
+            media_url,
+            headers=_cloudfax_auth_headers(
+                "application/pdf,application/octet-stream,application/json"
+            ),
+            timeout=request_timeout(60),
+            follow_redirects=True,
+        )
     except RuntimeError:
         raise
     except Exception as e:
         logger.exception("[cloudfax] PDF取得 接続エラー")
         raise RuntimeError(f"CloudFAX PDF取得 接続エラー: {e}")
 
+    if resp.status_code >= 400:
+        logger.error("[cloudfax] PDF取得 HTTP エラー (%d): %s", resp.status_code, resp.text)
+        raise RuntimeError(f"CloudFAX PDF取得失敗 (HTTP {resp.status_code})")
+
+    content_type = resp.headers.get("Content-Type", "")
+    data = resp.content
+    # Content-Type が JSON かつ %PDF ヘッダが無い場合は仕様齟齬として失敗扱い
+    if not data.startswith(b"%PDF") and "json" in content_type.lower():
+        logger.error(
+            "[cloudfax] media_url が JSON を返しました (Content-Type=%s 先頭=%s)",
+            content_type, data[:120],
+        )
+        raise RuntimeError(
+            f"media_url が PDF ではなく JSON を返しました "
+            f"(Content-Type={content_type!r})"
+        )
+    logger.info(
+        "[cloudfax] PDF取得完了: size=%d bytes, Content-Type=%s",
+        len(data), content_type,
+    )
+    return data
+
 
 # ----------------------------
 # A. PDF 妥当性確認ヘルパー
@@ -1903,18 +4172,18 @@ def _validate_pdf_bytes(data: bytes, source: str = "") -> None:
     - 先頭ページへのアクセス確認（ページオブジェクトが壊れていないか）
     壊れていた場合は ValueError を raise する。
     呼び出し元で ValueError を捕捉して error_stage=PDF_VALIDATE として記録すること。
+    描画プールのタイムアウト・異常終了（RenderTimeout / RenderCrashed）は PDF の不正と区別するためそのまま送出する。
     """
     if not data.startswith(b"%PDF"):
         raise ValueError(f"不正な PDF: %PDF ヘッダがありません (source={source!r})")
     try:
-        doc = pdfium.PdfDocument(data)
-        page_count = len(doc)
+        # 先頭ページオブジェクトへのアクセスまで確認（重いレンダリングは不要）。pdfium はプロセスプールで実行
+        page_count = pdf_page_count(data)
         if page_count < 1:
             raise ValueError(f"PDF にページがありません (source={source!r})")
-        _ = doc[0]  # 先頭ページオブジェクトへのアクセス確認（重いレンダリングは不要）
         logger.debug("[pdf_validate] OK: pages=%d source=%s", page_count, source)
-    except ValueError:
-        raise  # 上で raise した ValueError はそのまま伝播
+    except (ValueError, RenderTimeout, RenderCrashed):
+        raise  # 上で raise した ValueError・描画プールの一時的な失敗はそのまま伝播
     except Exception as e:
         raise ValueError(f"pypdfium2 で PDF を開けません: {e} (source={source!r})")
 
@@ -1947,7 +4216,7 @@ async def fetch_pdf_from_cloudfax(
         if not transmission_id:
             raise RuntimeError("transmission_id / provider_message_id が取得できません")
 
-        status_json = _cloudfax_fetch_status(transmission_id)
+        status_json = await _cloudfax_fetch_status(transmission_id)
         media_url   = str(status_json.get("media_url") or "").strip()
         if not media_url:
             raise RuntimeError(
@@ -1960,7 +4229,7 @@ async def fetch_pdf_from_cloudfax(
             transmission_id,
         )
 
-    return _cloudfax_fetch_media(media_url)
+    return await _cloudfax_fetch_media(media_url)
 
 
 # ----------------------------
@@ -1980,6 +4249,7 @@ class CloudFaxPayload(BaseModel):
 _STAGE_VALIDATION      = "VALIDATION"
 _STAGE_PDF_FETCH       = "PDF_FETCH"
 _STAGE_PDF_VALIDATE    = "PDF_VALIDATE"
+_STAGE_PDF_RENDER_POOL = "PDF_RENDER_POOL"   # 妥当性確認中の描画プールのタイムアウト・異常終了（一時的。再送で再処理）
 _STAGE_R2_UPLOAD       = "R2_UPLOAD"
 _STAGE_DOCUMENT_INSERT = "DOCUMENT_INSERT"
 _STAGE_STATUS_UPDATE   = "STATUS_UPDATE"
@@ -2027,7 +4297,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
     # GET で既存行を先に確認し、ステータスに応じて分岐する。
     # FAILED 行は PATCH でリセットして再処理続行、それ以外は冪等返却。
     msg_enc  = urllib.parse.quote(provider_message_id, safe="")
-    existing = _supabase_service_get(
+    existing = await _supabase_service_get_async(
         f"fax_inbounds?provider=eq.cloudfax&provider_message_id=eq.{msg_enc}&select=id,status"
     )
 
@@ -2039,7 +4309,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
         if existing_status == "FAILED":
             # FAILED → error をリセットして再処理続行
             fax_enc = urllib.parse.quote(fax_inbound_id, safe="")
-            _supabase_service_patch(
+            await _supabase_service_patch_async(
                 f"fax_inbounds?id=eq.{fax_enc}",
                 {"status": "RECEIVED", "error": None, "error_stage": None},
             )
@@ -2057,7 +4327,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
 
     else:
         # 既存行なし → 新規 INSERT
-        inserted = _supabase_service_post(
+        inserted = await _supabase_service_post_async(
             "fax_inbounds",
             {
                 "provider":            "cloudfax",
@@ -2080,13 +4350,34 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
 
         # ---- A. PDF 妥当性確認（R2 保存前に壊れた PDF を検出する）----
         error_stage = _STAGE_PDF_VALIDATE
-        _validate_pdf_bytes(pdf_bytes, source=provider_message_id)
+        # pypdfium2 のパースは CPU 処理のためスレッドプールで実行（イベントループを止めない）
+        try:
+            await run_in_threadpool(_validate_pdf_bytes, pdf_bytes, provider_message_id)
+        except (RenderTimeout, RenderCrashed):
+            error_stage = _STAGE_PDF_RENDER_POOL   # プールの混雑・再起動。PDF が不正とは限らない
+            raise
 
-        # ---- R2 保存 ----
+        # ---- R2 保存（同一内容が自院で保存済みなら既存キーを参照し PUT を省略）----
         error_stage = _STAGE_R2_UPLOAD
-        file_key = f"documents/{uuid.uuid4()}.pdf"
-        _r2_put_object(file_key, pdf_bytes)
-        logger.info("[cloudfax] R2 保存完了: file_key=%s", file_key)
+        content_sha256 = _content_sha256(pdf_bytes)
+        blob = await _content_blob_get_async(to_hospital_id, content_sha256)
+        deduplicated = bool(blob) and await _r2_object_exists(blob["file_key"])
+        if deduplicated:
+            file_key = blob["file_key"]
+            _dedup_count("r2_puts_skipped")
+            _dedup_count("r2_bytes_saved", len(pdf_bytes))
+            logger.info("[cloudfax] 同一内容のため R2 保存省略: file_key=%s", file_key)
+        else:
+            file_key = f"documents/{uuid.uuid4()}.pdf"
+            await _r2_put_object(file_key, pdf_bytes)
+            logger.info("[cloudfax] R2 保存完了: file_key=%s", file_key)
+        # 受信OCR（バックグラウンド）が R2 から読み直さないようディスクキャッシュへ入れておく
+        await run_in_threadpool(_r2_cache_store, file_key, pdf_bytes)
+        await _content_blob_record_async(
+            to_hospital_id, content_sha256, blob,
+            file_key=file_key, size=len(pdf_bytes), content_type="application/pdf",
+            repoint=bool(blob) and not deduplicated,   # 索引のキーが R2 に無かった → 新しいキーに付け替え
+        )
 
         # ---- documents INSERT ----
         # status=ARRIVED: 港モデルの「未担当BOX」に入港する
@@ -2094,7 +4385,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
         # from_hospital_id=to_hospital_id: FAX送信元病院は不明のため受信先と同値（NOT NULL 暫定措置）
         #   将来: 外部FAX送信元専用の hospital レコードを作成し、そちらの hospital_id を設定する
         error_stage = _STAGE_DOCUMENT_INSERT
-        doc_rows = _supabase_service_post(
+        doc_rows = await _supabase_service_post_async(
             "documents",
             {
                 "file_key":          file_key,
@@ -2117,9 +4408,14 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
         doc_id = doc_rows[0]["id"]
         logger.info("[cloudfax] documents INSERT 完了: doc_id=%s", doc_id)
 
+        # ---- サムネイル生成（best-effort。OCR より先に登録: 一覧表示に先に効く） ----
+        background_tasks.add_task(_fax_thumbnail_task, doc_id, file_key)
+
         # ---- バックグラウンドOCR（best-effort: 失敗してもWebhook応答は成功） ----
         if OPENAI_API_KEY:
-            background_tasks.add_task(_analyze_document_for_fax, doc_id, file_key)
+            background_tasks.add_task(
+                _analyze_document_for_fax, doc_id, file_key, to_hospital_id, content_sha256,
+            )
             logger.info("[cloudfax] OCRバックグラウンドタスク登録: doc_id=%s", doc_id)
         else:
             logger.warning("[cloudfax] OPENAI_API_KEY 未設定のためOCRスキップ: doc_id=%s", doc_id)
@@ -2127,7 +4423,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
         # ---- fax_inbounds を DOC_CREATED に更新 ----
         error_stage = _STAGE_STATUS_UPDATE
         fax_enc = urllib.parse.quote(fax_inbound_id, safe="")
-        _supabase_service_patch(
+        await _supabase_service_patch_async(
             f"fax_inbounds?id=eq.{fax_enc}",
             {"status": "DOC_CREATED", "document_id": doc_id, "file_key": file_key},
         )
@@ -2137,6 +4433,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
             "fax_inbound_id": fax_inbound_id,
             "document_id":    doc_id,
             "file_key":       file_key,
+            "deduplicated":   deduplicated,
         }
 
     except HTTPException:
@@ -2149,7 +4446,7 @@ async def _cloudfax_inbound_impl(payload_raw: dict, background_tasks: Background
         )
         try:
             fax_enc = urllib.parse.quote(fax_inbound_id, safe="")
-            _supabase_service_patch(
+            await _supabase_service_patch_async(
                 f"fax_inbounds?id=eq.{fax_enc}",
                 {"status": "FAILED", "error": str(e)[:500], "error_stage": error_stage},
             )
@@ -2171,82 +4468,141 @@ _REFERRAL_KEYWORDS = [
 _MAX_FAX_OCR_SECS = 90  # FAX OCRのタイムアウト（秒）
 
 
-def _analyze_document_for_fax(document_id: str, file_key: str) -> None:
+def _fax_ocr_from_r2(
+    document_id: str, file_key: str, file_ext: str
+) -> Tuple[Optional[str], Optional[int], int, str, list[int]]:
     """
-    FAX受信ファイル（PDF / 画像）に対してOCR + document_type分類を実行し、documentsを更新する。
-    - BackgroundTasks から呼ばれる（同期関数）
-    - 失敗しても documents 登録は影響しない（best-effort）
-    - document_type: "紹介状" | "不明"
+    _analyze_document_for_fax の OCR 本体: R2 からファイルを取得して Vision OCR を実行する。
+    戻り値: (OCR テキスト, PDF 総ページ数, ファイルサイズ, source_type, 読み取れなかったページ番号)。
+    source_type は /api/ocr の meta.source_type と同じ値（"image" / "pdf" / "pdf_text" / "pdf_mixed"）。
+    失敗時はテキストが None（ログ・FAILED 更新済み）
     """
-    logger.info("[fax-ocr] 開始: document_id=%s file_key=%s", document_id, file_key)
-    file_ext = file_key.rsplit(".", 1)[-1].lower() if "." in file_key else "pdf"
+    page_count: Optional[int] = None
+    source_type = "image"
+    unread: list[int] = []
+    try:
+        bucket = get_bucket_name()
+        presigner = get_r2_presigner()
+    except Exception:
+        logger.exception("[fax-ocr] R2クライアント初期化失敗")
+        return None, None, 0, source_type, []
+
     try:
-        # ---- R2 からファイル取得 ----
+        file_bytes = _r2_read_object(
+            presigner, bucket, file_key, _max_file_size(file_ext), timeout=15, expires=120
+        )
+    except _ObjectTooLarge as e:
+        logger.warning("[fax-ocr] ファイルサイズ超過 (%d bytes), スキップ", e.size)
+        return None, None, 0, source_type, []
+    except Exception:
+        logger.exception("[fax-ocr] R2からのファイル取得失敗: %s", file_key)
+        return None, None, 0, source_type, []
+
+    # ---- ファイル種別ごとに OCR 実行 ----
+    _supabase_service_patch(
+        f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
+        {"ocr_status": "RUNNING"},
+    )
+
+    if file_ext in {"png", "jpg"}:
+        # 画像ファイル: 向き・解像度・コントラストを整えて Vision OCR（PDF化不要）
+        image = _encode_image_for_ocr(file_bytes, file_ext)
+        logger.info(
+            "[fax-ocr] 画像OCR開始: document_id=%s mime=%s bytes=%d→%d",
+            document_id, image.mime, len(file_bytes), len(image.data),
+        )
         try:
-            bucket = get_bucket_name()
-            s3 = get_s3_client()
+            raw_text = _call_openai_ocr(
+                [image.data], timeout=_MAX_FAX_OCR_SECS, mime_types=[image.mime], details=[image.detail]
+            )
         except Exception:
-            logger.exception("[fax-ocr] R2クライアント初期化失敗")
-            return
+            logger.exception("[fax-ocr] OpenAI OCR失敗(image): %s", file_key)
+            _supabase_service_patch(
+                f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
+                {"ocr_status": "FAILED"},
+            )
+            return None, None, 0, source_type, []
+    else:
+        # PDF: pypdfium2 でページ画像化 → Vision OCR
+        try:
+            pages, page_count, skipped = _render_pdf_for_ocr(file_bytes)
+        except Exception:
+            logger.exception("[fax-ocr] PDF画像化失敗: %s", file_key)
+            _supabase_service_patch(
+                f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
+                {"ocr_status": "FAILED"},
+            )
+            return None, None, 0, source_type, []
 
-        presigned_url = s3.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": bucket, "Key": file_key},
-            ExpiresIn=120,
+        logger.info(
+            "[fax-ocr] OCR開始: pages=%d text_layer=%d skipped=%s bytes=%d document_id=%s",
+            len(pages), sum(1 for p in pages if p.text is not None),
+            [(s["page"], s["reason"]) for s in skipped],
+            sum(len(p.image.data) for p in pages if p.image is not None), document_id,
         )
         try:
-            with urllib.request.urlopen(presigned_url, timeout=15) as resp:
-                file_bytes = resp.read()
+            raw_text, page_timings, unread = _ocr_pdf_pages(pages, timeout=_MAX_FAX_OCR_SECS)
+            source_type = _pdf_source_type(page_timings)
+            logger.info(
+                "[fax-ocr] OCR完了: document_id=%s page_ms=%s",
+                document_id, [t["elapsed_ms"] for t in page_timings],
+            )
+            if unread:
+                logger.warning("[fax-ocr] 読み取れなかったページ: document_id=%s pages=%s", document_id, unread)
         except Exception:
-            logger.exception("[fax-ocr] R2からのファイル取得失敗: %s", file_key)
-            return
-
-        if len(file_bytes) > _MAX_PDF_SIZE_BYTES:
-            logger.warning("[fax-ocr] ファイルサイズ超過 (%d bytes), スキップ", len(file_bytes))
-            return
+            logger.exception("[fax-ocr] OpenAI OCR失敗: %s", file_key)
+            _supabase_service_patch(
+                f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
+                {"ocr_status": "FAILED"},
+            )
+            return None, None, 0, source_type, []
+    return raw_text, page_count, len(file_bytes), source_type, unread
 
-        # ---- ファイル種別ごとに OCR 実行 ----
-        _supabase_service_patch(
-            f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
-            {"ocr_status": "RUNNING"},
-        )
 
-        if file_ext in {"png", "jpg"}:
-            # 画像ファイル: そのまま Vision OCR（PDF化不要）
-            mime = "image/jpeg" if file_ext == "jpg" else "image/png"
-            logger.info("[fax-ocr] 画像OCR開始: document_id=%s mime=%s", document_id, mime)
-            try:
-                raw_text = _call_openai_ocr(
-                    [file_bytes], timeout=_MAX_FAX_OCR_SECS, mime_types=[mime]
-                )
-            except Exception:
-                logger.exception("[fax-ocr] OpenAI OCR失敗(image): %s", file_key)
-                _supabase_service_patch(
-                    f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
-                    {"ocr_status": "FAILED"},
-                )
-                return
+def _analyze_document_for_fax(
+    document_id: str,
+    file_key: str,
+    hospital_id: Optional[str] = None,
+    content_sha256: Optional[str] = None,
+) -> None:
+    """
+    FAX受信ファイル（PDF / 画像）に対してOCR + document_type分類を実行し、documentsを更新する。
+    - BackgroundTasks から呼ばれる（同期関数）
+    - 失敗しても documents 登録は影響しない（best-effort）
+    - document_type: "紹介状" | "不明"
+    - hospital_id / content_sha256（Webhook がサーバー側で計算した値）があれば
+      OCR 結果キャッシュ → 内容ハッシュ索引の順に参照し、
+      保存済みの OCR テキストがあれば R2 取得と Vision API 呼び出しを省略する
+    """
+    logger.info("[fax-ocr] 開始: document_id=%s file_key=%s", document_id, file_key)
+    file_ext = file_key.rsplit(".", 1)[-1].lower() if "." in file_key else "pdf"
+    cached = (
+        _ocr_cache_get(hospital_id, content_sha256, "full")
+        if hospital_id and content_sha256 else None
+    )
+    blob = (
+        _content_blob_get(hospital_id, content_sha256)
+        if hospital_id and content_sha256 and cached is None else None
+    )
+    unread: list[int] = []   # 時間切れ・OCR 失敗で読み取れなかったページ（あれば成果物を保存しない）
+    source_type = "pdf" if file_ext == "pdf" else "image"   # 保存済みテキストの再利用時（経路不明）
+    try:
+        if cached:
+            raw_text = cached["text"]
+            page_count = cached.get("page_count")
+            file_size = int(cached.get("size") or 0)
+            logger.info("[fax-ocr] OCR 結果キャッシュを使用: document_id=%s", document_id)
+        elif _content_blob_has_current_ocr(blob):
+            raw_text = blob["ocr_text"]
+            page_count = blob.get("page_count")
+            file_size = int(blob.get("size_bytes") or 0)
+            _dedup_count("ocr_calls_saved")
+            logger.info("[fax-ocr] 同一内容の OCR 結果を再利用: document_id=%s", document_id)
         else:
-            # PDF: pypdfium2 でページ画像化 → Vision OCR
-            try:
-                png_list, _ = _render_pdf_to_png_list(file_bytes)
-            except Exception:
-                logger.exception("[fax-ocr] PDF画像化失敗: %s", file_key)
-                _supabase_service_patch(
-                    f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
-                    {"ocr_status": "FAILED"},
-                )
-                return
-
-            logger.info("[fax-ocr] OCR開始: pages=%d document_id=%s", len(png_list), document_id)
-            try:
-                raw_text = _call_openai_ocr(png_list, timeout=_MAX_FAX_OCR_SECS)
-            except Exception:
-                logger.exception("[fax-ocr] OpenAI OCR失敗: %s", file_key)
-                _supabase_service_patch(
-                    f"documents?id=eq.{urllib.parse.quote(document_id, safe='')}",
-                    {"ocr_status": "FAILED"},
-                )
+            raw_text, page_count, file_size, source_type, unread = _fax_ocr_from_r2(
+                document_id, file_key, file_ext
+            )
+            if raw_text is None:
                 return
 
         logger.info("[fax-ocr] OCR完了: chars=%d document_id=%s", len(raw_text), document_id)
@@ -2259,13 +4615,42 @@ def _analyze_document_for_fax(document_id: str, file_key: str) -> None:
                 doc_type = "紹介状"
                 break
 
-        # ---- structured_json 生成（失敗時は None のまま） ----
-        structured = _structure_referral_text(normalized)
+        # ---- structured_json 生成（失敗時は None のまま。同一内容の保存済み結果があれば再利用） ----
+        if cached:
+            structured = cached.get("structured")
+        elif _content_blob_has_current_ocr(blob) and blob["ocr_text"] == raw_text and blob.get("structured_json"):
+            structured = blob["structured_json"]
+            _dedup_count("structure_calls_saved")
+        else:
+            structured = _structure_referral_text(normalized)
         if structured:
             logger.info("[fax-ocr] 構造化JSON生成完了: document_id=%s", document_id)
         else:
             logger.warning("[fax-ocr] 構造化JSON生成スキップ/失敗: document_id=%s", document_id)
 
+        # ---- 内容ハッシュ索引 / OCR 結果キャッシュに成果物を保存（best-effort。キャッシュヒット時は保存済み） ----
+        if hospital_id and content_sha256 and file_ext in _VISION_OCR_EXTS and not cached and not unread:
+            _ocr_cache_put(
+                hospital_id, content_sha256, "full",
+                text=raw_text,
+                normalized=normalized,
+                structured=structured,
+                alerts=_generate_alerts(normalized) if normalized else [],
+                page_count=page_count,
+                size=file_size,
+                source_type=source_type,
+            )
+            _content_blob_record(
+                hospital_id, content_sha256, blob,
+                file_key=file_key,
+                size=file_size,
+                content_type=_EXT_MIME.get(file_ext, ""),
+                page_count=page_count,
+                ocr_text=raw_text,
+                structured=structured,
+                count_hit=False,   # 重複の記録は Webhook 側で済んでいる
+            )
+
         # ---- documents を更新 ----
         patch_data: dict = {
             "ocr_text":      raw_text,
@@ -2405,7 +4790,7 @@ async def _cloudfax_outbound_impl(payload_raw: dict) -> dict:
 
     # ---- fax_webhook_events INSERT（冪等: provider + provider_message_id + event_status 単位）----
     # 同一 FAX への複数ステータス通知（QUEUED/SENDING/SENT 等）を個別に記録する。
-    inserted = _supabase_service_post(
+    inserted = await _supabase_service_post_async(
         "fax_webhook_events?on_conflict=provider,provider_message_id,event_status",
         {
             "provider":            "cloudfax",
@@ -2520,12 +4905,12 @@ async def _send_fax_impl(
     #    有効期限: 600s（CloudFAX がダウンロードしに来るまでの余裕を持たせる）
     try:
         bucket = get_bucket_name()
-        s3     = get_s3_client()
+        presigner = get_r2_presigner()
     except Exception:
         logger.exception("[send-fax] R2クライアント初期化失敗")
         raise HTTPException(status_code=500, detail="ストレージ接続エラー")
 
-    media_url = s3.generate_presigned_url(
+    media_url = presigner.generate_presigned_url(
         ClientMethod="get_object",
         Params={"Bucket": bucket, "Key": req.file_key},
         ExpiresIn=600,
@@ -2541,34 +4926,35 @@ async def _send_fax_impl(
         send_url, CLOUDFAX_FROM_NUMBER, fax_number, media_url[:80],
     )
 
-    send_req = urllib.request.Request(
-        send_url,
-        data=body_bytes,
-        method="POST",
-        headers={
-            "Accept":        "application/json",
-            "Authorization": f"Bearer {CLOUDFAX_BEARER_TOKEN}",
-            "Content-Type":  "application/json",
-            "x-api-key":     CLOUDFAX_API_KEY,
-        },
-    )
     try:
-        with urllib.request.urlopen(send_req, timeout=60) as resp:
-            send_result = json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        try:
-            err_body = e.read().decode(errors="replace")
-        except Exception:
-            err_body = "(body読み取り失敗)"
-        logger.error(
-            "[send-fax] CloudFAX HTTPError: status=%s reason=%s body=%s",
-            e.code, e.reason, err_body,
+        resp = await get_async_http_client().post(
+            send_url,
+            content=body_bytes,
+            headers={
+                "Accept":        "application/json",
+                "Authorization": f"Bearer {CLOUDFAX_BEARER_TOKEN}",
+                "Content-Type":  "application/json",
+                "x-api-key":     CLOUDFAX_API_KEY,
+            },
+            timeout=request_timeout(60),
         )
-        raise HTTPException(status_code=502, detail=f"FAX送信APIエラー: {e.code} {err_body}")
     except Exception as e:
         logger.exception("[send-fax] CloudFAX送信 予期せぬ例外")
         raise HTTPException(status_code=502, detail=f"FAX送信APIエラー: {e}")
 
+    if resp.status_code >= 400:
+        err_body = resp.text
+        logger.error(
+            "[send-fax] CloudFAX HTTPError: status=%s reason=%s body=%s",
+            resp.status_code, resp.reason_phrase, err_body,
+        )
+        raise HTTPException(status_code=502, detail=f"FAX送信APIエラー: {resp.status_code} {err_body}")
+    try:
+        send_result = resp.json()
+    except ValueError as e:
+        logger.exception("[send-fax] CloudFAX送信 レスポンス解析失敗")
+        raise HTTPException(status_code=502, detail=f"FAX送信APIエラー: {e}")
+
     transmission_id = send_result.get("transmission_id") or send_result.get("id") or ""
     logger.info("[send-fax] CloudFAX送信依頼完了: transmission_id=%s to=%s", transmission_id, fax_number)
     # TODO(transmission_id): documents に transmission_id カラムを追加し、ここで保存すること。
@@ -2576,7 +4962,7 @@ async def _send_fax_impl(
 
     # 3. documents テーブルに記録（source="fax_outbound"）
     # service_role 使用理由: JWT ユーザーのスコープ外テーブル行を書くため（RLS バイパス）
-    doc_rows = _supabase_service_post(
+    doc_rows = await _supabase_service_post_async(
         "documents",
         {
             "from_hospital_id":  hospital_id,
@@ -2598,7 +4984,7 @@ async def _send_fax_impl(
     # 4. 監査ログ（best-effort）
     if doc_id:
         try:
-            _supabase_service_post(
+            await _supabase_service_post_async(
                 "document_events",
                 {
                     "document_id": doc_id,
@@ -2633,9 +5019,10 @@ async def send_fax_api(
     """
     jwt_token   = credentials.credentials
     user_id     = user.get("sub", "")
-    hospital_id = _get_hospital_id(user_id, jwt_token)
-    contact     = _get_fax_contact(req.contact_id, hospital_id, jwt_token)
-    _assert_fax_file_key(req.file_key)
+    # user JWT の照会は同期ヘルパーのためスレッドプールで実行（イベントループを止めない）
+    hospital_id = await run_in_threadpool(_get_hospital_id, user_id, jwt_token, user)
+    contact     = await run_in_threadpool(_get_fax_contact, req.contact_id, hospital_id, jwt_token)
+    await _assert_fax_file_key(req.file_key)
     return await _send_fax_impl(req, hospital_id, user_id, jwt_token, contact["fax_number"])
 
 
@@ -2648,9 +5035,10 @@ async def send_fax_compat(
     """compat: Vite proxy 経由のローカル開発用（/api/send-fax と同じ処理）"""
     jwt_token   = credentials.credentials
     user_id     = user.get("sub", "")
-    hospital_id = _get_hospital_id(user_id, jwt_token)
-    contact     = _get_fax_contact(req.contact_id, hospital_id, jwt_token)
-    _assert_fax_file_key(req.file_key)
+    # user JWT の照会は同期ヘルパーのためスレッドプールで実行（イベントループを止めない）
+    hospital_id = await run_in_threadpool(_get_hospital_id, user_id, jwt_token, user)
+    contact     = await run_in_threadpool(_get_fax_contact, req.contact_id, hospital_id, jwt_token)
+    await _assert_fax_file_key(req.file_key)
     return await _send_fax_impl(req, hospital_id, user_id, jwt_token, contact["fax_number"])
 
 
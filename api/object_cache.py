@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# R2 オブジェクトのローカルディスクキャッシュ（OCR 再処理用）
+#  - file_key は UUID で内容が変わらないため無効化は不要（容量超過時の LRU 退避のみ）
+#  - 書き込みは一時ファイル → os.replace で原子的に行う（読み手が書きかけを読まない）
+#  - LRU の順序はファイルの mtime（読み込み時に更新）で管理する
+#    → 複数ワーカープロセスが同じディレクトリを共有しても整合する
+#  - ディレクトリは 0700、ファイルは 0600（mkstemp の既定。患者の紹介状・FAX を含む）
+#    既存ディレクトリも 0700 に締め直す。所有者が別で締め直せない場合はキャッシュを無効にする
+#  - R2_CACHE_MAX_MB=0 で無効化
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+_TMP_PREFIX = ".tmp-"
+_TMP_MAX_AGE = 3600     # 書きかけのまま残った一時ファイルを掃除するまでの秒数
+_LOW_WATERMARK = 0.9    # 退避時は上限の 90% まで減らす（退避の連発を防ぐ）
+
+
+class DiskLruCache:
+    """容量（バイト）上限付きのディスク LRU キャッシュ。スレッドセーフ。"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None   # 初回アクセス時にディレクトリを走査して求める
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0     # キャッシュから返したバイト数（R2 から取得せずに済んだ量）
+        self.bytes_written = 0
+        if self.enabled:
+            os.makedirs(directory, mode=0o700, exist_ok=True)   # mode は新規作成時のみ効く
+            os.chmod(directory, 0o700)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)   # LRU: 最終利用時刻を更新
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except OSError as e:
+            logger.warning("[object_cache] 読み込み失敗: %s", e)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += len(data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        try:
+            try:
+                replaced = os.stat(path).st_size   # 上書きする場合は旧ファイル分を容量から差し引く
+            except FileNotFoundError:
+                replaced = 0
+            fd, tmp = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=self.directory)   # 0600 で作成される
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.warning("[object_cache] 書き込み失敗: %s", e)
+            return
+
+        with self._lock:
+            self.bytes_written += len(data)
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) の一覧。古い一時ファイルはここで削除する。"""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                if e.name.startswith(_TMP_PREFIX):
+                    if now - st.st_mtime > _TMP_MAX_AGE:
+                        try:
+                            os.unlink(e.path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """古い順に削除して上限の _LOW_WATERMARK まで減らす（_lock 保持中に呼ぶ）"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * _LOW_WATERMARK)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("[object_cache] 退避失敗: %s", e)
+                continue
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled":       self.enabled,
+                "max_bytes":     self.max_bytes,
+                "size_bytes":    self._size,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "evictions":     self.evictions,
+                "bytes_served":  self.bytes_served,
+                "bytes_written": self.bytes_written,
+                "hit_ratio":     round(self.hits / total, 4) if total else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_object_cache() -> DiskLruCache:
+    """
+    プロセス共有のキャッシュを遅延生成。
+    R2_CACHE_DIR（既定: <tmp>/docport-r2-cache）/ R2_CACHE_MAX_MB（既定: 512、0 で無効）
+    """
+    directory = os.getenv("R2_CACHE_DIR", "").strip() or os.path.join(
+        tempfile.gettempdir(), "docport-r2-cache"
+    )
+    max_bytes = max(_env_int("R2_CACHE_MAX_MB", 512), 0) * 1024 * 1024
+    try:
+        return DiskLruCache(directory, max_bytes)
+    except OSError as e:
+        logger.warning("[object_cache] ディレクトリを作成・保護できないためキャッシュ無効: %s", e)
+        return DiskLruCache(directory, 0)
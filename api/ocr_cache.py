@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# OCR 結果の永続キャッシュ（ローカル SQLite）
+#  - キー: (hospital_id, sha256(ファイル内容), mode, prompt_version)
+#    hospital_id を含めるのは content_blobs と同じ理由（他院が同じ文書を持っているかを推測させない）
+#    prompt_version はプロンプト・モデルが変わったら自動的に別キーになる（古い結果は TTL / 容量で消える）
+#  - 値: OCR テキスト・正規化テキスト・構造化JSON・アラート等の JSON
+#  - 有効期限（OCR_CACHE_TTL_DAYS）と容量上限（OCR_CACHE_MAX_MB。0 で無効）で退避。容量超過時は最終利用が古い順
+#  - content_blobs（Supabase・病院単位の索引）の手前に置くローカル層。ネットワーク往復なしで判定できる
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+_PRUNE_EVERY = 50   # put 何回ごとに期限切れ・容量超過を掃除するか（掃除の間は上限を一時的に超えうる）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+  hospital_id    TEXT    NOT NULL,
+  sha256         TEXT    NOT NULL,
+  mode           TEXT    NOT NULL,
+  prompt_version TEXT    NOT NULL,
+  value          TEXT    NOT NULL,
+  size           INTEGER NOT NULL,
+  created_at     REAL    NOT NULL,
+  accessed_at    REAL    NOT NULL,
+  PRIMARY KEY (hospital_id, sha256, mode, prompt_version)
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_results_accessed ON ocr_results (accessed_at);
+"""
+
+
+class OcrResultCache:
+    """SQLite 1ファイルの OCR 結果キャッシュ。接続は1本をロックで共有する（1件あたりの処理は数十 µs）。"""
+
+    def __init__(self, path: str, max_bytes: int, ttl_secs: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_secs = ttl_secs
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self.errors = 0
+        if self.enabled:
+            self._conn = self._connect()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        try:
+            os.chmod(self.path, 0o600)   # OCR テキストは患者情報を含む
+        except OSError:
+            pass
+        conn.execute("PRAGMA journal_mode=WAL")     # 複数ワーカープロセスからの同時読み込み
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=2000")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def get(
+        self, hospital_id: str, sha256: str, modes: Sequence[str], prompt_version: str,
+    ) -> Optional[dict]:
+        """modes を先頭から順に探し、最初に見つかった結果を返す（見つかった mode は "_mode" に入る）。"""
+        if self._conn is None:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                for mode in modes:
+                    row = self._conn.execute(
+                        "SELECT value, created_at FROM ocr_results"
+                        " WHERE hospital_id=? AND sha256=? AND mode=? AND prompt_version=?",
+                        (hospital_id, sha256, mode, prompt_version),
+                    ).fetchone()
+                    if row is None or now - row[1] > self.ttl_secs:
+                        continue
+                    self._conn.execute(
+                        "UPDATE ocr_results SET accessed_at=?"
+                        " WHERE hospital_id=? AND sha256=? AND mode=? AND prompt_version=?",
+                        (now, hospital_id, sha256, mode, prompt_version),
+                    )
+                    self.hits += 1
+                    value = json.loads(row[0])
+                    value["_mode"] = mode
+                    return value
+                self.misses += 1
+        except (sqlite3.Error, ValueError) as e:
+            self._record_error("読み込み", e)
+        return None
+
+    def put(
+        self, hospital_id: str, sha256: str, mode: str, prompt_version: str, value: dict,
+    ) -> None:
+        if self._conn is None:
+            return
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ocr_results"
+                    " (hospital_id, sha256, mode, prompt_version, value, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (hospital_id, sha256, mode, prompt_version, payload, size, now, now),
+                )
+                self.puts += 1
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= _PRUNE_EVERY:
+                    self._prune(now)
+        except sqlite3.Error as e:
+            self._record_error("書き込み", e)
+
+    def _prune(self, now: float) -> None:
+        """期限切れを削除し、容量超過なら最終利用が古い順に削除する（_lock 保持中に呼ぶ）"""
+        self._puts_since_prune = 0
+        cur = self._conn.execute("DELETE FROM ocr_results WHERE created_at < ?", (now - self.ttl_secs,))
+        self.evictions += max(cur.rowcount, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM ocr_results ORDER BY accessed_at"
+        ).fetchall()
+        victims = []
+        for rowid, size in rows:
+            if excess <= 0:
+                break
+            victims.append((rowid,))
+            excess -= size
+        self._conn.executemany("DELETE FROM ocr_results WHERE rowid=?", victims)
+        self.evictions += len(victims)
+
+    def _record_error(self, label: str, e: Exception) -> None:
+        with self._lock:
+            self.errors += 1
+        logger.warning("[ocr_cache] %s失敗（キャッシュなしで続行）: %s", label, e)
+
+    def stats(self) -> dict:
+        entries = size = None
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    entries, size = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results"
+                    ).fetchone()
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled":    self.enabled,
+                "entries":    entries,
+                "size_bytes": size,
+                "max_bytes":  self.max_bytes,
+                "ttl_secs":   self.ttl_secs,
+                "hits":       self.hits,
+                "misses":     self.misses,
+                "puts":       self.puts,
+                "evictions":  self.evictions,
+                "errors":     self.errors,
+                "hit_ratio":  round(self.hits / total, 4) if total else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_ocr_cache() -> OcrResultCache:
+    """
+    プロセス共有の OCR 結果キャッシュを遅延生成。
+    OCR_CACHE_PATH（既定: <tmp>/docport-ocr-cache.sqlite3）/ OCR_CACHE_MAX_MB（既定: 256、0 で無効）
+    / OCR_CACHE_TTL_DAYS（既定: 30）
+    """
+    path = os.getenv("OCR_CACHE_PATH", "").strip() or os.path.join(
+        tempfile.gettempdir(), "docport-ocr-cache.sqlite3"
+    )
+    max_bytes = max(_env_int("OCR_CACHE_MAX_MB", 256), 0) * 1024 * 1024
+    ttl_secs = max(_env_int("OCR_CACHE_TTL_DAYS", 30), 1) * 24 * 3600
+    try:
+        return OcrResultCache(path, max_bytes, ttl_secs)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("[ocr_cache] 初期化できないためキャッシュ無効: %s", e)
+        return OcrResultCache(path, 0, ttl_secs)
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# 非同期 OCR ジョブの状態（ローカル SQLite）
+#  - status: queued → running → succeeded | failed
+#  - プロセス再起動で中断された running は queued に戻して再実行する（OCR_JOB_MAX_ATTEMPTS 回まで）
+#    owner_pid で「生きている別ワーカープロセスが実行中」のジョブは奪わない
+#  - 実行権の取得は UPDATE ... WHERE status='queued' の1文で行う（複数プロセスで二重実行しない）
+#  - 結果 JSON は OCR テキスト（患者情報）を含むため、ファイルは 0600・完了後 OCR_JOB_TTL_HOURS で削除
+#  - ユーザーの JWT は保存しない（再起動後の再実行は hospital_id を固定して service_role で行う）
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_jobs (
+  id           TEXT    PRIMARY KEY,
+  user_id      TEXT    NOT NULL,
+  hospital_id  TEXT    NOT NULL,
+  file_key     TEXT    NOT NULL,
+  mode         TEXT    NOT NULL,
+  webhook_url  TEXT,
+  status       TEXT    NOT NULL,
+  attempts     INTEGER NOT NULL DEFAULT 0,
+  owner_pid    INTEGER,
+  result       TEXT,
+  error_status INTEGER,
+  error_detail TEXT,
+  created_at   REAL    NOT NULL,
+  started_at   REAL,
+  finished_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_jobs_status ON ocr_jobs (status);
+CREATE INDEX IF NOT EXISTS idx_ocr_jobs_finished ON ocr_jobs (finished_at);
+"""
+
+_PRUNE_EVERY = 50   # create 何回ごとに期限切れの完了済みジョブを削除するか
+
+_COLUMNS = (
+    "id, user_id, hospital_id, file_key, mode, webhook_url, status, attempts,"
+    " result, error_status, error_detail, created_at, started_at, finished_at"
+)
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class OcrJobStore:
+    """SQLite 1ファイルのジョブ表。接続は1本をロックで共有する。"""
+
+    def __init__(self, path: str, ttl_secs: int, max_attempts: int):
+        self.path = path
+        self.ttl_secs = ttl_secs
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._creates_since_prune = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.resumed = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        try:
+            os.chmod(self.path, 0o600)   # 結果に OCR テキスト（患者情報）を含む
+        except OSError:
+            pass
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def create(
+        self, job_id: str, *, user_id: str, hospital_id: str, file_key: str, mode: str,
+        webhook_url: Optional[str],
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ocr_jobs (id, user_id, hospital_id, file_key, mode, webhook_url, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, user_id, hospital_id, file_key, mode, webhook_url, time.time()),
+            )
+            self.submitted += 1
+            self._creates_since_prune += 1
+            if self._creates_since_prune >= _PRUNE_EVERY:
+                self._prune(time.time())
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            cur = self._conn.execute(f"SELECT {_COLUMNS} FROM ocr_jobs WHERE id=?", (job_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            job = dict(zip([d[0] for d in cur.description], row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def count_pending(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM ocr_jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def claim(self, job_id: str) -> bool:
+        """queued のジョブを running にする。既に他で取得済み・完了済みなら False"""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE ocr_jobs SET status='running', attempts=attempts+1, owner_pid=?, started_at=?"
+                " WHERE id=? AND status='queued'",
+                (os.getpid(), time.time(), job_id),
+            )
+            return cur.rowcount == 1
+
+    def finish(
+        self, job_id: str, *, result: Optional[dict] = None,
+        error_status: Optional[int] = None, error_detail: Optional[str] = None,
+    ) -> None:
+        status = "failed" if error_status else "succeeded"
+        payload = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ocr_jobs SET status=?, result=?, error_status=?, error_detail=?, finished_at=?"
+                " WHERE id=?",
+                (status, payload, error_status, error_detail, time.time(), job_id),
+            )
+            if error_status:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+
+    def recover(self) -> list[str]:
+        """
+        起動時に呼ぶ。実行中のまま所有プロセスが消えたジョブを queued に戻し（試行回数超過は failed）、
+        再投入すべき queued ジョブの id を古い順に返す。期限切れの完了済みジョブも削除する。
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, attempts, owner_pid FROM ocr_jobs WHERE status='running'"
+            ).fetchall()
+            for job_id, attempts, owner_pid in rows:
+                if _pid_alive(owner_pid):
+                    continue
+                if attempts >= self.max_attempts:
+                    self._conn.execute(
+                        "UPDATE ocr_jobs SET status='failed', error_status=500, error_detail=?, finished_at=?"
+                        " WHERE id=?",
+                        ("OCR処理が中断されました（再試行回数の上限に達しました）", now, job_id),
+                    )
+                    self.failed += 1
+                else:
+                    self._conn.execute(
+                        "UPDATE ocr_jobs SET status='queued', owner_pid=NULL WHERE id=?", (job_id,)
+                    )
+            self._prune(now)
+            queued = [r[0] for r in self._conn.execute(
+                "SELECT id FROM ocr_jobs WHERE status='queued' ORDER BY created_at"
+            ).fetchall()]
+            self.resumed += len(queued)
+        return queued
+
+    def _prune(self, now: float) -> None:
+        """完了後 ttl_secs を過ぎたジョブを削除する（_lock 保持中に呼ぶ）"""
+        self._creates_since_prune = 0
+        self._conn.execute(
+            "DELETE FROM ocr_jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (now - self.ttl_secs,),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status"
+            ).fetchall())
+            return {
+                "queued":    by_status.get("queued", 0),
+                "running":   by_status.get("running", 0),
+                "stored":    sum(by_status.values()),
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed":    self.failed,
+                "resumed":   self.resumed,
+                "ttl_secs":  self.ttl_secs,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_ocr_job_store() -> OcrJobStore:
+    """
+    プロセス共有のジョブ表を遅延生成。
+    OCR_JOB_DB_PATH（既定: <tmp>/docport-ocr-jobs.sqlite3）/ OCR_JOB_TTL_HOURS（既定: 24）
+    / OCR_JOB_MAX_ATTEMPTS（既定: 2）
+    """
+    path = os.getenv("OCR_JOB_DB_PATH", "").strip() or os.path.join(
+        tempfile.gettempdir(), "docport-ocr-jobs.sqlite3"
+    )
+    ttl_secs = max(_env_int("OCR_JOB_TTL_HOURS", 24), 1) * 3600
+    max_attempts = max(_env_int("OCR_JOB_MAX_ATTEMPTS", 2), 1)
+    return OcrJobStore(path, ttl_secs, max_attempts)
@@ -0,0 +1,82 @@
+import threading
+from typing import TYPE_CHECKING, NamedTuple, Sequence
+
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    from pdf_render_pool import PdfPage
+
+
+# ----------------------------
+# 空白ページの判定（Vision OCR の前に除外する）
+#  - FAX の送付状の裏・空白の裏面を OpenAI に送らない
+#  - analyze_page は PDF 描画ワーカー内で描画直後の画像に対して実行し、結果（PageFeatures）だけを返す
+#  - 上下左右の余白（FAX のヘッダー行・スキャンの黒縁）を除いた範囲のインク密度で判定する
+#    4x4 画素のブロック平均で判定するため、FAX の孤立した点ノイズは数えない
+#  - 重複ページ（再送）の除外は行わない。数値1桁だけ違う検査結果と点ノイズの乗った再送ページは
+#    画像の差分では見分けられず、別の内容のページを落とす恐れがあるため
+# ----------------------------
+_MARGIN = 0.06          # 空白判定で無視する余白（各辺、ページ寸法に対する割合）
+_INK_BLOCK = 4          # インク判定のブロック（px）
+_INK_LEVEL = 160        # ブロック平均がこれより暗ければインクあり
+
+
+class PageFeatures(NamedTuple):
+    ink_ratio: float    # 余白を除いた範囲でインクのあるブロックの割合（0〜1）
+
+
+class PageSkipPolicy(NamedTuple):
+    """
+    除外の条件。
+    blank_ink_ratio: インク密度がこれ未満のページを空白として除外（0 で無効）
+    """
+    blank_ink_ratio: float = 0.0
+
+
+def _ink_ratio(gray: np.ndarray) -> float:
+    h, w = gray.shape
+    my, mx = int(h * _MARGIN), int(w * _MARGIN)
+    body = gray[my:h - my, mx:w - mx]
+    bh, bw = body.shape[0] // _INK_BLOCK, body.shape[1] // _INK_BLOCK
+    if bh == 0 or bw == 0:
+        return 0.0
+    blocks = body[:bh * _INK_BLOCK, :bw * _INK_BLOCK].reshape(bh, _INK_BLOCK, bw, _INK_BLOCK)
+    return float((blocks.mean(axis=(1, 3)) < _INK_LEVEL).mean())
+
+
+def analyze_page(img: Image.Image) -> PageFeatures:
+    """描画済みページ画像のインク密度を求める"""
+    return PageFeatures(ink_ratio=round(_ink_ratio(np.asarray(img.convert("L"))), 6))
+
+
+_lock = threading.Lock()
+_counters = {"pages": 0, "blank": 0}
+
+
+def select_pages(
+    pages: Sequence["PdfPage"], policy: PageSkipPolicy,
+) -> tuple[list["PdfPage"], list[dict]]:
+    """
+    空白のページを除く。
+    戻り値: (残すページ, 除外したページの記録)
+    記録: {"page", "reason": "blank", "ink_ratio"}
+    """
+    kept: list = []
+    skipped: list[dict] = []
+    for p in pages:
+        if p.features is not None and p.features.ink_ratio < policy.blank_ink_ratio:
+            skipped.append({"page": p.index + 1, "reason": "blank", "ink_ratio": p.features.ink_ratio})
+        else:
+            kept.append(p)
+
+    with _lock:
+        _counters["pages"] += len(pages)
+        _counters["blank"] += len(skipped)
+    return kept, skipped
+
+
+def get_page_skip_stats() -> dict:
+    """除外したページ数の累計（/api/metrics 用）"""
+    with _lock:
+        return dict(_counters)
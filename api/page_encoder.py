@@ -0,0 +1,158 @@
+import io
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+
+# ----------------------------
+# Vision OCR に送るページ画像のエンコード設定
+#  - 従来: scale=2.0 固定 + 可逆 PNG（FAX 1ページで数 MB の base64 になる）
+#  - 既定: 長辺 OCR_IMAGE_LONG_EDGE px に合わせて描画倍率を決める（適応 DPI）→ グレースケール → JPEG
+#    （OpenAI 側も detail=high では短辺 768px 程度に縮小するため、それ以上の解像度は送っても使われない）
+#  - OCR_IMAGE_FORMAT=png / OCR_IMAGE_GRAYSCALE=false / OCR_IMAGE_LONG_EDGE=0 で従来どおりの出力
+#  - PageEncoding はワーカープロセスへ渡すため pickle 可能な値だけを持つ
+#  - PNG / JPEG のアップロード（スマートフォン撮影の 12MP JPEG 等）も encode_photo で同じ設定に揃える
+#    EXIF の向きを反映 → 長辺 long_edge px に縮小 → グレースケール → 照明むらの補正・コントラストの正規化
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name, "").strip().lower()
+    return default if not v else v in {"1", "true", "yes"}
+
+
+_FORMATS = {"png": ("PNG", "image/png"), "jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+_DETAILS = {"auto", "low", "high"}
+_LEGACY_SCALE = 2.0
+_MIN_SCALE, _MAX_SCALE = 1.0, 3.0      # 適応 DPI の倍率範囲（72dpi 基準。1.0 = 72dpi、3.0 = 216dpi）
+_LOW_DETAIL_MAX_EDGE = 512             # この長辺以下の画像は detail=high にしても拡大されるだけなので low にする
+_BACKGROUND_REDUCE = 16                # 照明むら推定の縮小率（紙の明るさを 16px 単位で推定）
+_STRETCH_PERCENTILES = (1.0, 50.0)     # コントラスト正規化で黒・白に合わせる分位点（中央値 = 紙の地色を白にし、撮影ノイズを消す）
+
+
+@dataclass(frozen=True)
+class PageEncoding:
+    format: str = "jpeg"        # png | jpeg | webp
+    quality: int = 80           # jpeg / webp の品質（png では無視）
+    grayscale: bool = True      # L（8bit グレー）に変換
+    bilevel: bool = False       # 1bit 白黒に変換（png 向け。jpeg / webp ではグレースケール扱い）
+    long_edge: int = 1600       # 描画後の長辺 px（0 = 従来の scale=2.0 固定）
+    detail: str = "high"        # Vision API の detail（auto | low | high）
+    normalize: bool = True      # encode_photo で照明むらの補正・コントラストの正規化を行う（グレースケール時のみ）
+
+    def scale_for(self, width_pt: float, height_pt: float) -> float:
+        """ページサイズ（pt）から描画倍率を決める（適応 DPI）"""
+        if self.long_edge <= 0:
+            return _LEGACY_SCALE
+        scale = self.long_edge / max(width_pt, height_pt, 1.0)
+        return min(max(scale, _MIN_SCALE), _MAX_SCALE)
+
+
+class EncodedPage(NamedTuple):
+    data: bytes
+    mime: str
+    detail: str
+    width: int
+    height: int
+
+
+def encode_page(img: Image.Image, enc: PageEncoding) -> EncodedPage:
+    """描画済みページ画像を設定に従ってエンコードする"""
+    pil_format, mime = _FORMATS[enc.format]
+    if enc.bilevel and enc.format == "png":
+        # 誤差拡散ディザは地色のある原稿を網点だらけにするため、単純なしきい値で2値化する
+        img = img.convert("L").convert("1", dither=Image.Dither.NONE)
+    elif enc.grayscale or enc.bilevel:
+        img = img.convert("L")
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    if enc.format == "png":
+        img.save(buf, format=pil_format, optimize=enc.bilevel)
+    elif enc.format == "jpeg":
+        img.save(buf, format=pil_format, quality=enc.quality, optimize=True)
+    else:
+        img.save(buf, format=pil_format, quality=enc.quality, method=4)
+
+    detail = enc.detail
+    if detail == "high" and max(img.size) <= _LOW_DETAIL_MAX_EDGE:
+        detail = "low"
+    return EncodedPage(buf.getvalue(), mime, detail, img.size[0], img.size[1])
+
+
+def _flatten_background(img: Image.Image) -> Image.Image:
+    """
+    撮影画像の照明むら（影・周辺減光）を補正し、コントラストを正規化する（L 画像）。
+    縮小画像の局所最大値を紙の明るさとみなして割り、分位点で 0〜255 に引き伸ばす。
+    """
+    small = img.reduce(_BACKGROUND_REDUCE) if min(img.size) >= _BACKGROUND_REDUCE * 4 else img
+    background = (
+        small.filter(ImageFilter.MaxFilter(5))
+        .filter(ImageFilter.GaussianBlur(2))
+        .resize(img.size, Image.Resampling.BILINEAR)
+    )
+    a = np.asarray(img, dtype=np.float32)
+    flat = np.clip(a / np.maximum(np.asarray(background, dtype=np.float32), 1.0) * 255.0, 0, 255)
+    lo, hi = np.percentile(flat, _STRETCH_PERCENTILES)
+    lo = min(lo, 160.0)     # 文字がほとんど無い画像で紙のざらつきを強調しない
+    if hi - lo >= 32:
+        flat = np.clip((flat - lo) * (255.0 / (hi - lo)), 0, 255)
+    return Image.fromarray(flat.astype(np.uint8), mode="L")
+
+
+def encode_photo(data: bytes, enc: PageEncoding) -> EncodedPage:
+    """
+    アップロードされた PNG / JPEG を Vision OCR 用に整えてエンコードする（CPU 処理。スレッドプールから呼ぶ）。
+    壊れた画像は Pillow の例外を送出する。
+    """
+    gray = enc.grayscale or enc.bilevel
+    img = Image.open(io.BytesIO(data))
+    if enc.long_edge > 0:
+        # JPEG は縮小デコード（DCT スケーリング）でフル解像度の展開を避ける
+        img.draft("L" if gray else "RGB", (enc.long_edge, enc.long_edge))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        # 透過 PNG は白背景に合成
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    if gray:
+        img = img.convert("L")
+    if enc.long_edge > 0:
+        img.thumbnail((enc.long_edge, enc.long_edge), Image.Resampling.LANCZOS)
+    if gray and enc.normalize:
+        img = _flatten_background(img)
+    return encode_page(img, enc)
+
+
+@lru_cache(maxsize=1)
+def get_page_encoding() -> PageEncoding:
+    """
+    環境変数から設定を読む（未設定・不正値は既定値）。
+    OCR_IMAGE_FORMAT（png|jpeg|webp）/ OCR_IMAGE_QUALITY / OCR_IMAGE_GRAYSCALE / OCR_IMAGE_BILEVEL
+    / OCR_IMAGE_LONG_EDGE / OCR_IMAGE_DETAIL（auto|low|high）/ OCR_IMAGE_NORMALIZE
+    """
+    default = PageEncoding()
+    fmt = os.getenv("OCR_IMAGE_FORMAT", "").strip().lower()
+    fmt = {"jpg": "jpeg"}.get(fmt, fmt)
+    detail = os.getenv("OCR_IMAGE_DETAIL", "").strip().lower()
+    return PageEncoding(
+        format=fmt if fmt in _FORMATS else default.format,
+        quality=min(max(_env_int("OCR_IMAGE_QUALITY", default.quality), 1), 100),
+        grayscale=_env_bool("OCR_IMAGE_GRAYSCALE", default.grayscale),
+        bilevel=_env_bool("OCR_IMAGE_BILEVEL", default.bilevel),
+        long_edge=max(_env_int("OCR_IMAGE_LONG_EDGE", default.long_edge), 0),
+        detail=detail if detail in _DETAILS else default.detail,
+        normalize=_env_bool("OCR_IMAGE_NORMALIZE", default.normalize),
+    )
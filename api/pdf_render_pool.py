@@ -0,0 +1,323 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, NamedTuple, Optional, Sequence, Union
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from page_analysis import PageFeatures, analyze_page
+from page_encoder import EncodedPage, PageEncoding, encode_page
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# PDF 描画用プロセスプール（pypdfium2）
+#  - pdfium はスレッドセーフではなく、描画 + 画像エンコードは CPU を占有するため、
+#    FastAPI のスレッドプールではなく専用のワーカープロセスで実行する
+#  - 1ページ = 1タスク。同じ文書のページも、別リクエストの文書も並列に描画される
+#  - spawn で起動（fork は uvicorn のスレッド・ロック状態を引き継ぐため使わない）
+#  - max_tasks_per_child でワーカーを定期的に作り直す（pdfium のメモリ断片化・リーク対策）
+#  - タイムアウト時はプールごと破棄してワーカーを強制終了する（ProcessPoolExecutor は個別タスクを止められない）
+#    巻き添えで中断された他リクエストのタスクは新しいプールで1回だけ再実行する
+#  - PDF_RENDER_WORKERS=0 でプロセスプールを使わず呼び出し元スレッドで実行（ローカル開発用）
+#  - テキストレイヤー判定（TextLayerPolicy）もワーカー内で行い、文字を取り出せたページは描画しない
+#  - 描画したページは空白判定用の特徴量（page_analysis.PageFeatures）も求めて返す
+#  - PDF 本体は一時ファイル（0600、呼び出し終了時に削除）に1回だけ書き、ワーカーにはパスを渡す
+#    （バイト列を渡すとタスクごとに pickle されてプロセス間で転送される。50MB × ページ数）
+#    総ページ数を先に調べ、存在するページのタスクだけを投入する
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+PDF_RENDER_WORKERS = max(_env_int("PDF_RENDER_WORKERS", min(os.cpu_count() or 1, 4)), 0)
+PDF_RENDER_MAX_TASKS_PER_CHILD = max(_env_int("PDF_RENDER_MAX_TASKS_PER_CHILD", 200), 1)
+PDF_RENDER_TIMEOUT = max(_env_int("PDF_RENDER_TIMEOUT", 20), 1)   # 1回の呼び出し（全ページ）の上限秒数
+
+
+class RenderTimeout(Exception):
+    """描画が PDF_RENDER_TIMEOUT（または呼び出し側指定）内に終わらなかった"""
+
+
+class RenderCrashed(Exception):
+    """ワーカープロセスが異常終了した（壊れた PDF で pdfium が落ちた等）"""
+
+
+class TextLayerPolicy(NamedTuple):
+    """
+    テキストレイヤーを OCR の代わりに使う条件（電子カルテ等が出力した PDF 向け）。
+    - 空白以外の文字が min_chars 以上
+    - 画像オブジェクトがページ面積の max_image_coverage 未満（スキャン画像 + 透明テキストの PDF は Vision に回す）
+    - 文字化け（U+FFFD・私用領域・制御文字）が max_garbage_ratio 未満（ToUnicode の無いフォント対策）
+    min_chars=0 で無効（全ページ Vision OCR）。
+    """
+    min_chars: int = 0
+    max_image_coverage: float = 0.5
+    max_garbage_ratio: float = 0.1
+
+
+class PdfPage(NamedTuple):
+    index: int                      # 0 始まりのページ番号
+    text: Optional[str]             # テキストレイヤーを使う場合の本文（None なら image を Vision OCR）
+    image: Optional[EncodedPage]    # Vision OCR 用の画像（text を使う場合は描画しないので None）
+    text_chars: int                 # テキストレイヤーの文字数（空白除く）
+    image_coverage: float           # 画像オブジェクトが覆うページ面積の割合（0〜1、重なりは二重に数える）
+    features: Optional[PageFeatures] = None   # 描画したページのインク密度（テキストレイヤーのページは None）
+
+
+# ---- ワーカープロセス側で実行する関数（モジュールトップレベル = pickle 可能） ----
+def _is_garbage_char(ch: str) -> bool:
+    code = ord(ch)
+    return ch == "\ufffd" or 0xE000 <= code <= 0xF8FF or (code < 0x20 and ch not in "\n\r\t")
+
+
+def _page_text_layer(page: "pdfium.PdfPage") -> tuple[str, int, float]:
+    """テキストレイヤーの本文・文字数（空白除く）・文字化け率を返す"""
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+    finally:
+        textpage.close()
+    chars = [ch for ch in text if not ch.isspace()]
+    garbage = sum(1 for ch in chars if _is_garbage_char(ch))
+    return text.strip(), len(chars), (garbage / len(chars) if chars else 0.0)
+
+
+def _page_image_coverage(page: "pdfium.PdfPage") -> float:
+    width, height = page.get_size()
+    area = max(width * height, 1.0)
+    covered = 0.0
+    for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE], max_depth=2):
+        left, bottom, right, top = obj.get_bounds()
+        w = min(right, width) - max(left, 0)
+        h = min(top, height) - max(bottom, 0)
+        if w > 0 and h > 0:
+            covered += w * h
+    return min(covered / area, 1.0)
+
+
+PdfSource = Union[bytes, str]   # PDF のバイト列、または一時ファイルのパス
+
+
+def _render_page(
+    src: PdfSource, index: int, encoding: PageEncoding, policy: TextLayerPolicy,
+) -> tuple[Optional[PdfPage], int]:
+    """
+    index ページのテキストレイヤーを判定し、使えなければ描画・エンコードする。
+    戻り値: (PdfPage | ページが存在しなければ None, 総ページ数)
+    """
+    pdf = pdfium.PdfDocument(src)
+    try:
+        total = len(pdf)
+        if index >= total:
+            return None, total
+        page = pdf[index]
+        try:
+            text_chars, coverage = 0, 0.0
+            if policy.min_chars > 0:
+                text, text_chars, garbage_ratio = _page_text_layer(page)
+                coverage = _page_image_coverage(page)
+                if (
+                    text_chars >= policy.min_chars
+                    and coverage < policy.max_image_coverage
+                    and garbage_ratio < policy.max_garbage_ratio
+                ):
+                    return PdfPage(index, text, None, text_chars, round(coverage, 3)), total
+
+            bitmap = page.render(
+                scale=encoding.scale_for(*page.get_size()),
+                grayscale=encoding.grayscale or encoding.bilevel,
+            )
+            try:
+                img = bitmap.to_pil()
+                features = analyze_page(img)
+                image = encode_page(img, encoding)
+            finally:
+                bitmap.close()
+            return PdfPage(index, None, image, text_chars, round(coverage, 3), features), total
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+
+def _page_count(src: PdfSource) -> int:
+    """PDF を開いて総ページ数を返す（先頭ページの読み込みまで確認する）"""
+    pdf = pdfium.PdfDocument(src)
+    try:
+        total = len(pdf)
+        if total >= 1:
+            pdf[0].close()
+        return total
+    finally:
+        pdf.close()
+
+
+def _noop() -> None:
+    return None
+
+
+# ---- 親プロセス側 ----
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_generation = 0
+_pool_lock = threading.Lock()
+_counters = {"tasks": 0, "timeouts": 0, "crashes": 0, "retries": 0, "pool_restarts": 0}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _pool_lock:
+        _counters[name] += n
+
+
+def _get_pool() -> tuple[ProcessPoolExecutor, int]:
+    global _pool, _pool_generation
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=PDF_RENDER_MAX_TASKS_PER_CHILD,
+            )
+            _pool_generation += 1
+        return _pool, _pool_generation
+
+
+def _discard_pool(generation: int) -> None:
+    """generation のプールを破棄してワーカーを強制終了する（既に作り直されていれば何もしない）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or generation != _pool_generation:
+            return
+        pool, _pool = _pool, None
+        _counters["pool_restarts"] += 1
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for p in processes:
+        if p.is_alive():
+            p.terminate()
+
+
+def run_many(fn: Callable, args_list: Sequence[tuple], timeout: Optional[float] = None) -> list:
+    """
+    fn(*args) を args_list の各要素についてワーカーで並列実行し、結果を同じ順で返す。
+    timeout（既定 PDF_RENDER_TIMEOUT）は全タスク合計の上限。
+    超過は RenderTimeout、ワーカー異常終了は RenderCrashed、fn の例外はそのまま送出する。
+    """
+    if not args_list:
+        return []
+    if PDF_RENDER_WORKERS == 0:
+        return [fn(*args) for args in args_list]
+
+    timeout = PDF_RENDER_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    for attempt in (1, 2):
+        pool, generation = _get_pool()
+        try:
+            futures = [pool.submit(fn, *args) for args in args_list]
+        except (BrokenProcessPool, RuntimeError):
+            # 他のリクエストがプールを破棄した直後（shutdown 済み）→ 作り直して再投入
+            _discard_pool(generation)
+            continue
+        _count("tasks", len(futures))
+        try:
+            return [f.result(timeout=max(deadline - time.monotonic(), 0)) for f in futures]
+        except FutureTimeoutError:
+            for f in futures:
+                f.cancel()
+            _count("timeouts")
+            logger.warning("[pdf_render] タイムアウト（%.1fs）: ワーカーを再起動します", timeout)
+            _discard_pool(generation)
+            raise RenderTimeout(f"PDF 描画が {timeout:.0f} 秒以内に終わりませんでした")
+        except (BrokenProcessPool, CancelledError):
+            if generation == _pool_generation and _pool is not None:
+                # このリクエストのタスクでワーカーが落ちた
+                _count("crashes")
+                logger.warning("[pdf_render] ワーカーが異常終了しました: ワーカーを再起動します")
+                _discard_pool(generation)
+            if attempt == 2 or time.monotonic() >= deadline:
+                raise RenderCrashed("PDF 描画ワーカーが異常終了しました")
+            _count("retries")
+    raise RenderCrashed("PDF 描画ワーカーを起動できませんでした")
+
+
+def render_pdf_pages(
+    pdf_bytes: bytes,
+    max_pages: int,
+    encoding: PageEncoding,
+    timeout: Optional[float] = None,
+    text_layer: TextLayerPolicy = TextLayerPolicy(),
+) -> tuple[list[PdfPage], int]:
+    """
+    先頭 max_pages ページを並列に処理する。戻り値: (PdfPage のリスト, 総ページ数)
+    text_layer の条件を満たすページはテキストレイヤーの本文を返し、それ以外は描画・エンコードする。
+    ワーカーには一時ファイルのパスを渡し、総ページ数を調べてから存在するページのタスクだけを投入する。
+    """
+    if PDF_RENDER_WORKERS == 0:
+        total = _page_count(pdf_bytes)
+        return [_render_page(pdf_bytes, i, encoding, text_layer)[0] for i in range(min(total, max_pages))], total
+
+    timeout = PDF_RENDER_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    fd, path = tempfile.mkstemp(prefix="docport-render-", suffix=".pdf")   # 0600 で作成される
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        total = run_many(_page_count, [(path,)], timeout)[0]
+        results = run_many(
+            _render_page,
+            [(path, i, encoding, text_layer) for i in range(min(total, max_pages))],
+            max(deadline - time.monotonic(), 0.001),
+        )
+    finally:
+        try:
+            os.unlink(path)   # タイムアウトで強制終了したワーカーが開いていても削除できる
+        except OSError:
+            pass
+    return [page for page, _ in results if page is not None], total
+
+
+def pdf_page_count(pdf_bytes: bytes, timeout: Optional[float] = None) -> int:
+    """PDF の総ページ数（壊れた PDF は pypdfium2 の例外を送出）"""
+    return run_many(_page_count, [(pdf_bytes,)], timeout)[0]
+
+
+def warm_up() -> None:
+    """全ワーカーを起動しておく（アプリ起動時に呼ぶ。初回リクエストの spawn 待ちを避ける）"""
+    if PDF_RENDER_WORKERS == 0:
+        return
+    try:
+        run_many(_noop, [()] * PDF_RENDER_WORKERS, timeout=60)
+    except Exception as e:
+        logger.warning("[pdf_render] ウォームアップ失敗（初回利用時に起動）: %s", e)
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_render_pool_stats() -> dict:
+    """プロセスプールの設定と統計（/api/metrics 用）"""
+    with _pool_lock:
+        return {
+            "workers":             PDF_RENDER_WORKERS,
+            "max_tasks_per_child": PDF_RENDER_MAX_TASKS_PER_CHILD,
+            "timeout":             PDF_RENDER_TIMEOUT,
+            "running":             _pool is not None,
+            **_counters,
+        }
@@ -1,8 +1,10 @@
 import os
-from functools import lru_cache
+import threading
 from typing import Optional
 
 import boto3
+import boto3.session
+from botocore.config import Config
 
 # ----------------------------
 # dotenv は「ローカル開発時だけ」読む
@@ -47,25 +49,97 @@ def get_bucket_name() -> str:
     return bucket
 
 
-@lru_cache(maxsize=1)
+# ----------------------------
+# boto3 クライアント設定（R2 用）
+#  - 既定の boto3 はプール 10 接続のため、スレッドプール（既定 40 スレッド）から共有すると
+#    あふれた分は毎回新規接続（TCP + TLS ハンドシェイク）→ 使用後に破棄される
+#  - プール数・リトライ・タイムアウト・TCP keepalive を環境変数で調整できるようにする
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = _get_env(name)
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    v = _get_env(name)
+    try:
+        return float(v) if v else default
+    except ValueError:
+        return default
+
+
+R2_MAX_POOL_CONNECTIONS = max(_env_int("R2_MAX_POOL_CONNECTIONS", 50), 1)  # urllib3 プールの接続数上限
+R2_RETRY_MODE = (_get_env("R2_RETRY_MODE") or "standard").lower()         # legacy / standard / adaptive
+R2_MAX_ATTEMPTS = max(_env_int("R2_MAX_ATTEMPTS", 3), 1)                   # 初回を含む試行回数
+R2_CONNECT_TIMEOUT = _env_float("R2_CONNECT_TIMEOUT", 5.0)                 # 接続タイムアウト（秒）
+R2_READ_TIMEOUT = _env_float("R2_READ_TIMEOUT", 30.0)                      # 読み込みタイムアウト（秒）
+R2_TCP_KEEPALIVE = (_get_env("R2_TCP_KEEPALIVE") or "true").lower() in {"1", "true", "yes"}
+
+if R2_RETRY_MODE not in {"legacy", "standard", "adaptive"}:
+    R2_RETRY_MODE = "standard"
+
+
+def _client_config() -> Config:
+    return Config(
+        max_pool_connections=R2_MAX_POOL_CONNECTIONS,
+        retries={"mode": R2_RETRY_MODE, "total_max_attempts": R2_MAX_ATTEMPTS},
+        connect_timeout=R2_CONNECT_TIMEOUT,
+        read_timeout=R2_READ_TIMEOUT,
+        tcp_keepalive=R2_TCP_KEEPALIVE,
+    )
+
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
 def get_s3_client():
     """
     R2(S3互換)クライアントを遅延生成。
     import 時点で落ちないので、Render デプロイが安定する。
+
+    boto3 のクライアント生成（デフォルトセッション）はスレッドセーフではないため、
+    専用 Session を使いロック内で1回だけ生成する。生成後のクライアントはスレッドセーフで、
+    全スレッドプールワーカーで共有してよい。
     """
-    endpoint = _get_env("R2_ENDPOINT")
-    access_key = _get_env("R2_ACCESS_KEY_ID")
-    secret_key = _get_env("R2_SECRET_ACCESS_KEY")
-
-    if not endpoint:
-        raise RuntimeError("R2_ENDPOINT is missing (set in Render Environment)")
-    if not access_key or not secret_key:
-        raise RuntimeError("R2_ACCESS_KEY_ID / R2_SECRET_ACCESS_KEY is missing")
-
-    return boto3.client(
-        "s3",
-        endpoint_url=endpoint,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name="auto",
-    )
\ No newline at end of file
+    global _s3_client
+    if _s3_client is not None:
+        return _s3_client
+    with _s3_client_lock:
+        if _s3_client is not None:
+            return _s3_client
+
+        endpoint = _get_env("R2_ENDPOINT")
+        access_key = _get_env("R2_ACCESS_KEY_ID")
+        secret_key = _get_env("R2_SECRET_ACCESS_KEY")
+
+        if not endpoint:
+            raise RuntimeError("R2_ENDPOINT is missing (set in Render Environment)")
+        if not access_key or not secret_key:
+            raise RuntimeError("R2_ACCESS_KEY_ID / R2_SECRET_ACCESS_KEY is missing")
+
+        _s3_client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name="auto",
+            config=_client_config(),
+        )
+        return _s3_client
+
+
+def get_s3_client_config() -> dict:
+    """現在の boto3 クライアント設定（/api/metrics 用）"""
+    return {
+        "max_pool_connections": R2_MAX_POOL_CONNECTIONS,
+        "retry_mode":           R2_RETRY_MODE,
+        "max_attempts":         R2_MAX_ATTEMPTS,
+        "connect_timeout":      R2_CONNECT_TIMEOUT,
+        "read_timeout":         R2_READ_TIMEOUT,
+        "tcp_keepalive":        R2_TCP_KEEPALIVE,
+        "initialized":          _s3_client is not None,
+    }
@@ -0,0 +1,148 @@
+import datetime
+import hashlib
+import hmac
+import urllib.parse
+from functools import lru_cache
+from typing import Optional
+
+from r2_client import _get_env
+
+# ----------------------------
+# R2 用の軽量 SigV4 プリサイナー
+#  - boto3 の generate_presigned_url（botocore のリクエスト組み立て一式を通る）を置き換える
+#  - 出力 URL は boto3（path-style / s3v4 / region=auto）とバイト単位で一致させる
+#  - 日付ごとの派生署名鍵はキャッシュする（HMAC 4段のうち3段を省略）
+# ----------------------------
+_ALGORITHM = "AWS4-HMAC-SHA256"
+_SERVICE = "s3"
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# ClientMethod ごとの HTTP メソッドと、Params → クエリ文字列 の対応
+# （クエリの並びは boto3 と同じく Params の指定順）
+_METHODS: dict[str, str] = {
+    "get_object":  "GET",
+    "head_object": "HEAD",
+    "put_object":  "PUT",
+    "upload_part": "PUT",
+}
+_QUERY_PARAMS: dict[str, dict[str, str]] = {
+    "get_object": {
+        "ResponseCacheControl":       "response-cache-control",
+        "ResponseContentDisposition": "response-content-disposition",
+        "ResponseContentEncoding":    "response-content-encoding",
+        "ResponseContentLanguage":    "response-content-language",
+        "ResponseContentType":        "response-content-type",
+        "ResponseExpires":            "response-expires",
+    },
+    "upload_part": {
+        "PartNumber": "partNumber",
+        "UploadId":   "uploadId",
+    },
+}
+# 署名対象ヘッダーになる Params（PUT 時にクライアントが同じ値を送る必要がある）
+_HEADER_PARAMS: dict[str, list[tuple[str, str]]] = {
+    "put_object": [("ContentType", "content-type")],
+}
+
+
+def _quote(s: str, safe: str = "-_.~") -> str:
+    return urllib.parse.quote(s, safe=safe)
+
+
+@lru_cache(maxsize=8)
+def _signing_key(secret_key: str, datestamp: str, region: str) -> bytes:
+    """日付単位の派生署名鍵（同日中は再計算しない）"""
+    k_date = hmac.new(("AWS4" + secret_key).encode(), datestamp.encode(), hashlib.sha256).digest()
+    k_region = hmac.new(k_date, region.encode(), hashlib.sha256).digest()
+    k_service = hmac.new(k_region, _SERVICE.encode(), hashlib.sha256).digest()
+    return hmac.new(k_service, b"aws4_request", hashlib.sha256).digest()
+
+
+class R2Presigner:
+    """boto3 の generate_presigned_url と同じ呼び出し形式で SigV4 クエリ署名 URL を生成する。"""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, region: str = "auto"):
+        parsed = urllib.parse.urlsplit(endpoint)
+        self._scheme = parsed.scheme or "https"
+        self._host = parsed.netloc
+        self._base_path = parsed.path.rstrip("/")
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+
+    def generate_presigned_url(
+        self,
+        ClientMethod: str,
+        Params: dict,
+        ExpiresIn: int = 3600,
+        now: Optional[datetime.datetime] = None,
+    ) -> str:
+        method = _METHODS.get(ClientMethod)
+        if method is None:
+            raise ValueError(f"未対応の ClientMethod です: {ClientMethod}")
+
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self._region}/{_SERVICE}/aws4_request"
+
+        path = f"{self._base_path}/{_quote(Params['Bucket'], '/~')}/{_quote(Params['Key'], '/~')}"
+
+        headers = {"host": self._host}
+        for param, header in _HEADER_PARAMS.get(ClientMethod, []):
+            if Params.get(param) is not None:
+                headers[header] = str(Params[param]).strip()
+        signed_headers = ";".join(sorted(headers))
+
+        query_names = _QUERY_PARAMS.get(ClientMethod, {})
+        query: list[tuple[str, str]] = [
+            (query_names[param], str(value))
+            for param, value in Params.items()
+            if param in query_names and value is not None
+        ]
+        query += [
+            ("X-Amz-Algorithm",     _ALGORITHM),
+            ("X-Amz-Credential",    f"{self._access_key}/{scope}"),
+            ("X-Amz-Date",          amz_date),
+            ("X-Amz-Expires",       str(int(ExpiresIn))),
+            ("X-Amz-SignedHeaders", signed_headers),
+        ]
+        encoded = [(_quote(k), _quote(v)) for k, v in query]
+
+        canonical_request = "\n".join([
+            method,
+            path,
+            "&".join(f"{k}={v}" for k, v in sorted(encoded)),
+            "".join(f"{k}:{headers[k]}\n" for k in sorted(headers)),
+            signed_headers,
+            _UNSIGNED_PAYLOAD,
+        ])
+        string_to_sign = "\n".join([
+            _ALGORITHM,
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        key = _signing_key(self._secret_key, datestamp, self._region)
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        qs = "&".join(f"{k}={v}" for k, v in encoded)
+        return f"{self._scheme}://{self._host}{path}?{qs}&X-Amz-Signature={signature}"
+
+
+@lru_cache(maxsize=1)
+def get_r2_presigner() -> R2Presigner:
+    """
+    R2 用プリサイナーを遅延生成（get_s3_client と同じ環境変数を使う）。
+    ネットワーク I/O を伴わないため async 処理からも直接呼び出してよい。
+    """
+    endpoint = _get_env("R2_ENDPOINT")
+    access_key = _get_env("R2_ACCESS_KEY_ID")
+    secret_key = _get_env("R2_SECRET_ACCESS_KEY")
+
+    if not endpoint:
+        raise RuntimeError("R2_ENDPOINT is missing (set in Render Environment)")
+    if not access_key or not secret_key:
+        raise RuntimeError("R2_ACCESS_KEY_ID / R2_SECRET_ACCESS_KEY is missing")
+
+    return R2Presigner(endpoint, access_key, secret_key, region="auto")
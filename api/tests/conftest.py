@@ -0,0 +1,5 @@
+import os
+import sys
+
+# api/ 直下のモジュール（main, r2_presign 等）をそのまま import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
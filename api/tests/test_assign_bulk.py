@@ -0,0 +1,51 @@
+import uuid
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import main
+
+_CREDS = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+
+
+def _fake_rpc(calls, denied=()):
+    def rpc(name, params, jwt_token, errors=None):
+        calls.append(params["p_items"])
+        return {
+            "assigned_at": "2026-01-01T00:00:00Z",
+            "results": [
+                {"document_id": i["document_id"], "ok": i["document_id"] not in denied,
+                 "error": "update_denied" if i["document_id"] in denied else None, "status": "IN_PROGRESS"}
+                for i in params["p_items"]
+            ],
+        }
+    return rpc
+
+
+def test_invalid_owner_is_rejected_per_item(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "_supabase_rpc", _fake_rpc(calls))
+    good, bad = str(uuid.uuid4()), str(uuid.uuid4())
+    owner = str(uuid.uuid4())
+    body = main.BulkAssignRequest(
+        assigned_department="内科",
+        items=[
+            main.BulkAssignItem(doc_id=good, owner_user_id=owner.upper()),
+            main.BulkAssignItem(doc_id=bad, owner_user_id="not-a-uuid"),
+        ],
+    )
+    out = main._assign_bulk_impl(body, _CREDS, {"sub": "u1"})
+
+    assert [r["error"] for r in out["results"]] == [None, "invalid_owner_user_id"]
+    assert out["succeeded"] == 1 and out["failed"] == 1
+    # 不正な担当者の文書は RPC に渡さない（渡すと uuid キャストで全体が失敗する）
+    assert calls == [[{"document_id": good, "assigned_department": "内科",
+                       "owner_user_id": owner, "to_status": None}]]
+
+
+def test_update_denied_is_not_reported_ok(monkeypatch):
+    a, b = str(uuid.uuid4()), str(uuid.uuid4())
+    monkeypatch.setattr(main, "_supabase_rpc", _fake_rpc([], denied={b}))
+    body = main.BulkAssignRequest(doc_ids=[a, b], assigned_department="内科", to_status="IN_PROGRESS")
+    out = main._assign_bulk_impl(body, _CREDS, {"sub": "u1"})
+
+    assert [(r["ok"], r["error"]) for r in out["results"]] == [(True, None), (False, "update_denied")]
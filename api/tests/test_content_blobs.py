@@ -0,0 +1,85 @@
+import pytest
+
+import main
+
+_SHA = "a" * 64
+_FIELDS = {"file_key": "documents/x.pdf", "size": 10, "content_type": "application/pdf"}
+
+
+def _blob(**kw):
+    return {"file_key": "documents/x.pdf", "size_bytes": 10, "hit_count": 1, **kw}
+
+
+def test_new_row_records_ocr_version():
+    _, _, row, _ = main._content_blob_write("h1", _SHA, None, ocr_text="本文", **_FIELDS)
+    assert row["ocr_version"] == main._OCR_CACHE_VERSION
+    _, _, row, _ = main._content_blob_write("h1", _SHA, None, **_FIELDS)
+    assert row["ocr_version"] is None
+
+
+def test_stale_row_is_overwritten():
+    stale = _blob(ocr_text="古い本文", structured_json={"old": True}, ocr_version="0" * 16)
+    assert not main._content_blob_has_current_ocr(stale)
+    _, _, data, _ = main._content_blob_write(
+        "h1", _SHA, stale, ocr_text="新しい本文", structured=None, count_hit=False, **_FIELDS,
+    )
+    assert data == {
+        "ocr_text": "新しい本文", "page_count": None,
+        "ocr_version": main._OCR_CACHE_VERSION, "structured_json": None,
+    }
+
+
+def test_current_row_is_kept():
+    current = _blob(ocr_text="本文", structured_json=None, ocr_version=main._OCR_CACHE_VERSION)
+    _, _, data, _ = main._content_blob_write(
+        "h1", _SHA, current, ocr_text="本文", structured={"a": 1}, count_hit=False, **_FIELDS,
+    )
+    assert data == {"structured_json": {"a": 1}}
+
+
+def test_fax_ocr_ignores_stale_row(monkeypatch):
+    stale = _blob(ocr_text="古い本文", structured_json={"old": True}, ocr_version=None)
+    ran, patched = [], []
+    monkeypatch.setattr(main, "_ocr_cache_get", lambda *a: None)
+    monkeypatch.setattr(main, "_ocr_cache_put", lambda *a, **k: None)
+    monkeypatch.setattr(main, "_content_blob_get", lambda *a: stale)
+    monkeypatch.setattr(main, "_content_blob_record", lambda *a, **k: None)
+    monkeypatch.setattr(main, "_structure_referral_text", lambda text: {"new": True})
+    monkeypatch.setattr(main, "_supabase_service_patch", lambda path, data: patched.append(data))
+
+    def fresh_ocr(document_id, file_key, file_ext):
+        ran.append(file_key)
+        return "新しい本文", 1, 10, "pdf", []
+    monkeypatch.setattr(main, "_fax_ocr_from_r2", fresh_ocr)
+
+    main._analyze_document_for_fax("d1", "documents/x.pdf", "h1", _SHA)
+    assert ran == ["documents/x.pdf"]
+    assert patched[0]["ocr_text"] == "新しい本文"
+    assert patched[0]["structured_json"] == {"new": True}
+
+
+@pytest.mark.parametrize("source_type", ["pdf_text", "pdf_mixed", "pdf"])
+def test_fax_ocr_caches_actual_source_type(monkeypatch, source_type):
+    puts = []
+    monkeypatch.setattr(main, "_ocr_cache_get", lambda *a: None)
+    monkeypatch.setattr(main, "_ocr_cache_put", lambda *a, **k: puts.append(k))
+    monkeypatch.setattr(main, "_content_blob_get", lambda *a: None)
+    monkeypatch.setattr(main, "_content_blob_record", lambda *a, **k: None)
+    monkeypatch.setattr(main, "_structure_referral_text", lambda text: {"a": 1})
+    monkeypatch.setattr(main, "_supabase_service_patch", lambda path, data: None)
+    monkeypatch.setattr(main, "_fax_ocr_from_r2", lambda *a: ("本文", 1, 10, source_type, []))
+
+    main._analyze_document_for_fax("d1", "documents/x.pdf", "h1", _SHA)
+    assert [k["source_type"] for k in puts] == [source_type]
+
+
+def test_fax_ocr_from_r2_reports_page_sources(monkeypatch):
+    timings = [{"pages": [1], "source": "text_layer", "elapsed_ms": 0}]
+    monkeypatch.setattr(main, "get_bucket_name", lambda: "bucket")
+    monkeypatch.setattr(main, "get_r2_presigner", lambda: None)
+    monkeypatch.setattr(main, "_r2_read_object", lambda *a, **k: b"%PDF-1.4\n")
+    monkeypatch.setattr(main, "_supabase_service_patch", lambda path, data: None)
+    monkeypatch.setattr(main, "_render_pdf_for_ocr", lambda data: ([], 1, []))
+    monkeypatch.setattr(main, "_ocr_pdf_pages", lambda pages, timeout: ("本文", timings, []))
+
+    assert main._fax_ocr_from_r2("d1", "documents/x.pdf", "pdf") == ("本文", 1, 9, "pdf_text", [])
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import main
+import pdf_render_pool
+from benchmarks._stub import StubServer
+
+# ----------------------------
+# Webhook / FAX 送信（async def）がイベントループを止めないことの確認
+#  - Supabase / CloudFAX / R2 をすべてローカルスタブ（応答 _LATENCY 秒）に向け、3種を _CONCURRENCY 本ずつ同時に実行する
+#  - その間 5ms 間隔のティッカーでイベントループの遅れ（lag）を測る
+#  - ブロッキング I/O が1つでも残っていれば lag はスタブの応答時間（_LATENCY）以上になる
+#    スタブが同一プロセスのスレッドで動くため GIL 待ちで数十ms の lag は出る。上限は _LATENCY の半分とする
+# ----------------------------
+_LATENCY = 0.3
+_CONCURRENCY = 10
+_MAX_LAG = _LATENCY / 2
+_PDF = (
+    b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+    b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n"
+    b"3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] >> endobj\n"
+    b"trailer << /Root 1 0 R >>\n%%EOF\n"
+)
+
+
+def _handler(method, path, headers, body):
+    if path.startswith("/media/"):
+        return 200, {"Content-Type": "application/pdf"}, _PDF
+    if path.startswith("/r2/"):
+        return 200, {}, b""
+    if path.startswith("/cloudfax/Faxes"):
+        return 200, {"Content-Type": "application/json"}, b'{"id": "tx-1"}'
+    if path.startswith("/rest/v1/contacts"):
+        row = {"id": "c1", "fax_number": "0312345678", "hospital_id": "h1", "is_active": True}
+        return 200, {"Content-Type": "application/json"}, json.dumps([row]).encode()
+    if method == "GET":
+        return 200, {"Content-Type": "application/json"}, b"[]"
+    return 201, {"Content-Type": "application/json"}, b'[{"id": "row-1"}]'
+
+
+class _FakePresigner:
+    def __init__(self, base: str):
+        self.base = base
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"{self.base}/r2/{Params['Key']}"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with StubServer(_handler, latency=_LATENCY) as stub:
+        monkeypatch.setattr(main, "SUPABASE_URL", stub.url)
+        monkeypatch.setattr(main, "SUPABASE_ANON_KEY", "anon")
+        monkeypatch.setattr(main, "SUPABASE_SERVICE_ROLE_KEY", "service")
+        monkeypatch.setattr(main, "CLOUDFAX_API_BASE", f"{stub.url}/cloudfax")
+        monkeypatch.setattr(main, "CLOUDFAX_BEARER_TOKEN", "token")
+        monkeypatch.setattr(main, "CLOUDFAX_API_KEY", "key")
+        monkeypatch.setattr(main, "CLOUDFAX_FROM_NUMBER", "0300000000")
+        monkeypatch.setattr(main, "CLOUDFAX_WEBHOOK_SECRET", "")
+        monkeypatch.setattr(main, "FAX_DEFAULT_HOSPITAL_ID", "h1")
+        monkeypatch.setattr(main, "OPENAI_API_KEY", "")
+        monkeypatch.setattr(main, "get_r2_presigner", lambda: _FakePresigner(stub.url))
+        monkeypatch.setattr(main, "get_bucket_name", lambda: "bucket")
+        monkeypatch.setattr(main, "_r2_cache_store", lambda *a, **k: None)
+        monkeypatch.setattr(main, "_fax_thumbnail_task", lambda *a, **k: None)
+        monkeypatch.setattr(pdf_render_pool, "PDF_RENDER_WORKERS", 0)
+        main.app.dependency_overrides[main.verify_jwt] = lambda: {"sub": "u1", "hospital_id": "h1"}
+        main.get_async_http_client.cache_clear()
+        yield stub
+        main.app.dependency_overrides.clear()
+        main.get_async_http_client.cache_clear()
+
+
+def _requests(base: str, n: int) -> list[tuple[str, dict]]:
+    reqs = []
+    for i in range(n):
+        reqs.append(("/api/webhook/cloudfax/inbound",
+                     {"id": f"fax-{i}", "media_url": f"{base}/media/{i}.pdf", "to_hospital_id": "h1"}))
+        reqs.append(("/api/webhook/cloudfax/outbound", {"id": f"out-{i}", "status": "SENT"}))
+        reqs.append(("/api/send-fax",
+                     {"file_key": f"documents/{i:08d}-0000-0000-0000-000000000000.pdf", "contact_id": "c1"}))
+    return reqs
+
+
+async def _measure(reqs: list[tuple[str, dict]]) -> tuple[float, float, list[int]]:
+    """reqs を同時に実行し、(最大 lag, 所要時間, ステータス一覧) を返す"""
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t - 0.005)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        tick = asyncio.create_task(ticker())
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(path, json=body, headers={"Authorization": "Bearer t"}) for path, body in reqs
+        ))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await tick
+    # 非同期クライアントはイベントループに紐づくため、ループごとに作り直す
+    await main.get_async_http_client().aclose()
+    main.get_async_http_client.cache_clear()
+    return max(lags), elapsed, [r.status_code for r in responses]
+
+
+def test_webhooks_and_send_fax_do_not_block_event_loop(stub):
+    asyncio.run(_measure(_requests(stub.url, 1)))   # 初回の import・クライアント生成は測らない
+    max_lag, elapsed, statuses = asyncio.run(_measure(_requests(stub.url, _CONCURRENCY)))
+
+    assert statuses == [200] * (3 * _CONCURRENCY)
+    assert max_lag < _MAX_LAG, f"event loop lag {max_lag * 1000:.0f}ms"
+    # inbound 1 件でスタブ往復が 7 回程度。直列に処理されていれば 30 件で数十秒かかる
+    assert elapsed < 10 * _LATENCY * 2
+
+
+def test_lag_probe_detects_blocking_io(stub, monkeypatch):
+    """対照: Supabase への POST を同期版に差し替えると lag がスタブの応答時間を超える"""
+    async def blocking_post(path, data, prefer="return=representation"):
+        return main._supabase_service_post(path, data, prefer)
+
+    monkeypatch.setattr(main, "_supabase_service_post_async", blocking_post)
+    outbound = [r for r in _requests(stub.url, 3) if r[0].endswith("/outbound")]
+    max_lag, _, _ = asyncio.run(_measure(outbound))
+    assert max_lag >= _LATENCY * 0.9
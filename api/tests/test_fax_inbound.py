@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+import main
+from pdf_render_pool import RenderCrashed, RenderTimeout
+
+_PDF = b"%PDF-1.4\n"
+
+
+@pytest.fixture
+def inbound(monkeypatch):
+    patches: list[dict] = []
+
+    async def fake_get(path):
+        return []
+
+    async def fake_post(path, payload, prefer=None):
+        return [{"id": "fax-1"}]
+
+    async def fake_patch(path, payload):
+        patches.append(payload)
+        return [payload]
+
+    async def fake_fetch(provider_message_id, payload_raw=None):
+        return _PDF
+
+    monkeypatch.setattr(main, "_supabase_service_get_async", fake_get)
+    monkeypatch.setattr(main, "_supabase_service_post_async", fake_post)
+    monkeypatch.setattr(main, "_supabase_service_patch_async", fake_patch)
+    monkeypatch.setattr(main, "fetch_pdf_from_cloudfax", fake_fetch)
+    return patches
+
+
+def _run_inbound() -> None:
+    payload = {"id": "msg-1", "to_hospital_id": "h1"}
+    with pytest.raises(HTTPException):
+        asyncio.run(main._cloudfax_inbound_impl(payload, BackgroundTasks()))
+
+
+@pytest.mark.parametrize("error", [RenderTimeout("busy"), RenderCrashed("restarted")])
+def test_render_pool_failure_is_not_recorded_as_invalid_pdf(monkeypatch, inbound, error):
+    def fail(data, timeout=None):
+        raise error
+
+    monkeypatch.setattr(main, "pdf_page_count", fail)
+    with pytest.raises(type(error)):
+        main._validate_pdf_bytes(_PDF, "msg-1")
+
+    _run_inbound()
+    assert inbound[-1]["status"] == "FAILED"
+    assert inbound[-1]["error_stage"] == "PDF_RENDER_POOL"
+
+
+def test_broken_pdf_is_recorded_as_pdf_validate(monkeypatch, inbound):
+    def fail(data, timeout=None):
+        raise RuntimeError("Failed to load document")
+
+    monkeypatch.setattr(main, "pdf_page_count", fail)
+    with pytest.raises(ValueError):
+        main._validate_pdf_bytes(_PDF, "msg-1")
+
+    _run_inbound()
+    assert inbound[-1]["error_stage"] == "PDF_VALIDATE"
@@ -0,0 +1,27 @@
+from fastapi.security import HTTPAuthorizationCredentials
+
+import main
+
+
+def test_refresh_drops_stale_cache_entry(monkeypatch):
+    lookups = []
+
+    def fake_get(path, jwt_token, *args, **kwargs):
+        lookups.append(path)
+        return [{"hospital_id": "hosp-new"}]
+
+    monkeypatch.setattr(main, "_supabase_get", fake_get)
+    main._hospital_id_cache.set("user-1", "hosp-old", main.time.time() + 300)
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+
+    assert main._get_hospital_id("user-1", "jwt") == "hosp-old"   # TTL 内はキャッシュ
+    assert main._hospital_id_refresh_impl(creds, {"sub": "user-1"}) == {"hospital_id": "hosp-new"}
+    assert main._get_hospital_id("user-1", "jwt") == "hosp-new"
+    assert len(lookups) == 1
+
+
+def test_refresh_prefers_claims(monkeypatch):
+    monkeypatch.setattr(main, "_supabase_get", lambda *a, **k: [])
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+    user = {"sub": "user-2", "app_metadata": {"hospital_id": "hosp-claim"}}
+    assert main._hospital_id_refresh_impl(creds, user) == {"hospital_id": "hosp-claim"}
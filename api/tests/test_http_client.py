@@ -0,0 +1,47 @@
+import threading
+import time
+
+import httpx
+import pytest
+
+import http_client
+from benchmarks._stub import StubServer
+
+
+def test_request_timeout_keeps_pool_limit():
+    t = http_client.request_timeout(30)
+    assert t.read == 30 and t.connect == 30
+    assert t.pool == http_client.HTTP_POOL_TIMEOUT
+
+
+def test_pool_wait_is_bounded_by_pool_timeout(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_POOL_TIMEOUT", 0.2)
+    client = httpx.Client(limits=httpx.Limits(max_connections=1), timeout=httpx.Timeout(10.0, pool=0.2))
+    with StubServer(latency=1.0) as stub, client:
+        holder = threading.Thread(target=client.get, args=(stub.url,))
+        holder.start()
+        time.sleep(0.1)
+        t0 = time.monotonic()
+        with pytest.raises(httpx.PoolTimeout):
+            client.get(stub.url, timeout=http_client.request_timeout(5))
+        # 秒数だけ渡すとプール待ちも 5 秒になっていた
+        assert time.monotonic() - t0 < 0.8
+        holder.join()
+
+
+def test_r2_reads_do_not_hold_supabase_pool(monkeypatch):
+    import main
+
+    monkeypatch.setattr(http_client, "HTTP_POOL_TIMEOUT", 0.2)
+    supabase = httpx.Client(limits=httpx.Limits(max_connections=1), timeout=httpx.Timeout(10.0, pool=0.2))
+    r2 = httpx.Client(limits=httpx.Limits(max_connections=1), timeout=httpx.Timeout(10.0, pool=0.2))
+    monkeypatch.setattr(main, "get_http_client", lambda: supabase)
+    monkeypatch.setattr(main, "get_r2_http_client", lambda: r2)
+    with StubServer(latency=0.5) as stub, supabase, r2:
+        monkeypatch.setattr(main, "SUPABASE_URL", stub.url)
+        reader = threading.Thread(target=main._r2_fetch_bounded, args=(f"{stub.url}/obj.pdf", 1 << 20, 5))
+        reader.start()
+        time.sleep(0.1)
+        # R2 の取得中でも Supabase 側のプールは空いている（共有していた頃は PoolTimeout）
+        assert main._supabase_request("GET", "profiles", "anon", "jwt", timeout=5) == []
+        reader.join()
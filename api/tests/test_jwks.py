@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def cold_jwks(monkeypatch):
+    """起動直後（鍵なし）の JWKS 状態"""
+    monkeypatch.setattr(main, "_jwks_keys", {})
+    monkeypatch.setattr(main, "_jwks_fetched_at", 0.0)
+    monkeypatch.setattr(main, "_jwks_failed_at", 0.0)
+    monkeypatch.setattr(main, "_jwks_forced_at", 0.0)
+    monkeypatch.setattr(main, "_jwks_last_error", None)
+
+
+def _failing_fetch(calls):
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        raise HTTPException(status_code=500, detail="認証サービスへの接続に失敗しました")
+    return fetch
+
+
+def test_waiters_share_fetch_error(cold_jwks, monkeypatch):
+    calls: list = []
+    monkeypatch.setattr(main, "_fetch_jwks", _failing_fetch(calls))
+    errors: list = []
+
+    def worker():
+        try:
+            main._refresh_jwks()
+        except HTTPException as e:
+            errors.append(e.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1                 # single-flight のまま
+    assert errors == [500] * 5             # 待機スレッドも黙って成功扱いにしない
+
+
+def test_cold_start_outage_is_5xx_not_kid_mismatch(cold_jwks, monkeypatch):
+    monkeypatch.setattr(main, "_fetch_jwks", _failing_fetch([]))
+    with pytest.raises(HTTPException) as exc:
+        main._get_signing_key("kid-1")
+    assert exc.value.status_code == 500
+
+
+def test_success_clears_previous_error(cold_jwks, monkeypatch):
+    monkeypatch.setattr(main, "_fetch_jwks", _failing_fetch([]))
+    with pytest.raises(HTTPException):
+        main._refresh_jwks()
+    monkeypatch.setattr(main, "_fetch_jwks", lambda: {"kid-1": {"kid": "kid-1"}})
+    monkeypatch.setattr(main, "_jwks_fetched_at", 0.0)
+    assert main._get_signing_key("kid-1") == {"kid": "kid-1"}
+    assert main._jwks_last_error is None
@@ -0,0 +1,46 @@
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+
+import main
+
+_KEY = "documents/0b7c2f8e-7a51-4c1e-9a55-4f5e0e6b2d11.pdf"
+
+
+class _FakeS3:
+    def __init__(self, parts=(), missing=False):
+        self.parts = list(parts)
+        self.missing = missing
+        self.calls = []
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker, MaxParts):
+        self.calls.append(PartNumberMarker)
+        if self.missing:
+            raise ClientError({"Error": {"Code": "NoSuchUpload"}}, "ListParts")
+        page = [p for p in self.parts if p["PartNumber"] > PartNumberMarker][:2]   # 2件ずつ返す
+        truncated = bool(page) and page[-1]["PartNumber"] < self.parts[-1]["PartNumber"]
+        return {"Parts": page, "IsTruncated": truncated,
+                "NextPartNumberMarker": page[-1]["PartNumber"] if page else 0}
+
+
+def test_list_parts_follows_pagination(monkeypatch):
+    s3 = _FakeS3([{"PartNumber": n, "ETag": f'"e{n}"', "Size": 8} for n in (1, 2, 4, 5, 7)])
+    monkeypatch.setattr(main, "_r2_storage", lambda label: ("bucket", s3))
+    out = main._multipart_list_parts_impl(main.MultipartListPartsRequest(file_key=_KEY, upload_id="u1"))
+
+    assert [p["part_number"] for p in out["parts"]] == [1, 2, 4, 5, 7]
+    assert out["parts"][0] == {"part_number": 1, "etag": '"e1"', "size": 8}
+    assert s3.calls == [0, 2, 5]
+
+
+def test_list_parts_of_aborted_upload_is_404(monkeypatch):
+    monkeypatch.setattr(main, "_r2_storage", lambda label: ("bucket", _FakeS3(missing=True)))
+    with pytest.raises(HTTPException) as e:
+        main._multipart_list_parts_impl(main.MultipartListPartsRequest(file_key=_KEY, upload_id="u1"))
+    assert e.value.status_code == 404
+
+
+def test_list_parts_rejects_foreign_key():
+    with pytest.raises(HTTPException) as e:
+        main._multipart_list_parts_impl(main.MultipartListPartsRequest(file_key="previews/x.webp", upload_id="u1"))
+    assert e.value.status_code == 400
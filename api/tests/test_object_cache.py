@@ -0,0 +1,31 @@
+import os
+import stat
+
+from object_cache import DiskLruCache
+
+
+def _mode(path: str) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = DiskLruCache(str(tmp_path / "c"), 1000)
+    cache.put("k", b"x" * 300)
+    for _ in range(5):
+        cache.put("k", b"y" * 300)
+    assert cache.stats()["size_bytes"] == 300
+    assert cache.evictions == 0
+    cache.put("k", b"z" * 100)
+    assert cache.stats()["size_bytes"] == 100
+    assert cache.get("k") == b"z" * 100
+
+
+def test_existing_directory_is_tightened(tmp_path):
+    directory = tmp_path / "c"
+    directory.mkdir(mode=0o755)
+    os.chmod(directory, 0o755)
+    cache = DiskLruCache(str(directory), 1000)
+    cache.put("k", b"data")
+
+    assert _mode(str(directory)) == 0o700
+    assert [_mode(str(p)) for p in directory.iterdir()] == [0o600]
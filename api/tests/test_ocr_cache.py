@@ -0,0 +1,85 @@
+import pytest
+
+import main
+import ocr_cache
+from ocr_cache import OcrResultCache
+
+_DAY = 24 * 3600
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ocr_cache の time.time を手動で進める時計に置き換える"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(ocr_cache.time, "time", lambda: now[0])
+    return now
+
+
+def _cache(tmp_path, max_bytes=1_000_000, ttl_secs=30 * _DAY) -> OcrResultCache:
+    return OcrResultCache(str(tmp_path / "ocr.sqlite3"), max_bytes, ttl_secs)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_secs=_DAY)
+    cache.put("h1", "s1", "full", "v1", {"text": "本文"})
+    clock[0] += _DAY - 1
+    assert cache.get("h1", "s1", ["full"], "v1")["text"] == "本文"
+    clock[0] += 2
+    assert cache.get("h1", "s1", ["full"], "v1") is None
+
+
+def test_size_eviction_removes_least_recently_used(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "_PRUNE_EVERY", 1)
+    value = {"text": "x" * 100}
+    cache = _cache(tmp_path, max_bytes=400)
+    for key in ("a", "b", "c"):
+        clock[0] += 1
+        cache.put("h1", key, "full", "v1", value)
+    clock[0] += 1
+    assert cache.get("h1", "a", ["full"], "v1") is not None   # a を最近使ったことにする
+
+    clock[0] += 1
+    cache.put("h1", "d", "full", "v1", value)                 # 4件目で容量超過
+    present = [k for k in "abcd" if cache.get("h1", k, ["full"], "v1") is not None]
+    assert present == ["a", "c", "d"]
+    assert cache.evictions == 1
+
+
+def test_entries_are_isolated_by_hospital(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("h1", "s1", "full", "v1", {"text": "h1 の本文"})
+    assert cache.get("h2", "s1", ["full"], "v1") is None
+    assert cache.get("h1", "s1", ["full"], "v2") is None
+    assert cache.get("h1", "s1", ["full"], "v1")["text"] == "h1 の本文"
+
+
+@pytest.fixture
+def main_cache(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    monkeypatch.setattr(main, "get_ocr_cache", lambda: cache)
+    return cache
+
+
+def _put(mode, structured, text="本文"):
+    main._ocr_cache_put(
+        "h1", "s1", mode, text=text, normalized=text, structured=structured,
+        alerts=[], page_count=1, size=10, source_type="pdf_text",
+    )
+
+
+def test_text_only_falls_back_to_full(main_cache):
+    _put("full", {"patient_name": "山田"})
+    hit = main._ocr_cache_get("h1", "s1", "text_only")
+    assert hit["_mode"] == "full" and hit["text"] == "本文"
+    # full の要求は text_only の結果を使わない（構造化JSON が無いため）
+    main_cache.put("h1", "s2", "text_only", main._OCR_CACHE_VERSION, {"text": "t"})
+    assert main._ocr_cache_get("h1", "s2", "full") is None
+    assert main._ocr_cache_get("h1", "s2", "text_only")["_mode"] == "text_only"
+
+
+def test_full_result_without_structured_is_not_stored(main_cache):
+    _put("full", None)
+    assert main._ocr_cache_get("h1", "s1", "full") is None
+    assert main_cache.puts == 0
+    _put("text_only", None)
+    assert main._ocr_cache_get("h1", "s1", "text_only")["_mode"] == "text_only"
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from page_encoder import EncodedPage
+from pdf_render_pool import PdfPage
+
+
+def _vision_page(index: int) -> PdfPage:
+    return PdfPage(index, None, EncodedPage(f"img{index + 1}".encode(), "image/jpeg", "high", 10, 10), 0, 0.0)
+
+
+def _text_page(index: int) -> PdfPage:
+    return PdfPage(index, f"text{index + 1}", None, 50, 0.0)
+
+
+class _FakeVision:
+    """画像のバイト列（img<N>）からページ番号を読み、ページごとの遅延・失敗を再現する"""
+
+    def __init__(self, delays=None, fail=()):
+        self.delays = delays or {}
+        self.fail = set(fail)
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, images, timeout, mime_types=None, details=None):
+        nums = [int(i.decode()[3:]) for i in images]
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(max(self.delays.get(n, 0.01) for n in nums))
+            if self.fail & set(nums):
+                raise HTTPException(status_code=502, detail="OCR処理でエラーが発生しました")
+            return " ".join(f"ocr{n}" for n in nums)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    def install(**kw) -> _FakeVision:
+        fake = _FakeVision(**kw)
+        monkeypatch.setattr(main, "_call_openai_ocr", fake)
+        return fake
+    return install
+
+
+def test_pages_are_merged_in_page_order(vision):
+    # 後ろのページほど先に終わる
+    vision(delays={1: 0.3, 3: 0.2, 4: 0.1, 5: 0.0})
+    pages = [_vision_page(0), _text_page(1), _vision_page(2), _vision_page(3), _vision_page(4)]
+    seen = []
+    text, timings, unread = main._ocr_pdf_pages(pages, timeout=30, on_page=lambda t, timing: seen.append(t))
+
+    assert unread == []
+    assert [t["pages"] for t in timings] == [[1], [2], [3], [4], [5]]
+    assert [t["source"] for t in timings] == ["vision", "text_layer", "vision", "vision", "vision"]
+    assert text == "\n\n".join(
+        f"--- ページ {n} ---\n{body}" for n, body in
+        [(1, "ocr1"), (2, "text2"), (3, "ocr3"), (4, "ocr4"), (5, "ocr5")]
+    )
+    assert sorted(seen) == ["ocr1", "ocr3", "ocr4", "ocr5", "text2"]
+
+
+def test_single_page_has_no_marker(vision):
+    vision()
+    text, timings, unread = main._ocr_pdf_pages([_vision_page(0)], timeout=30)
+    assert (text, unread) == ("ocr1", [])
+
+
+def test_group_markers_for_contiguous_and_non_contiguous_pages(vision, monkeypatch):
+    vision()
+    monkeypatch.setattr(main, "_OCR_PAGE_GROUP_SIZE", 2)
+    pages = [_vision_page(0), _vision_page(1), _vision_page(2), _text_page(3), _vision_page(4)]
+    text, timings, unread = main._ocr_pdf_pages(pages, timeout=30)
+
+    assert [t["pages"] for t in timings] == [[1, 2], [3, 5], [4]]
+    assert text.split("\n\n") == [
+        "--- ページ 1-2 ---\nocr1 ocr2",
+        "--- ページ 3,5 ---\nocr3 ocr5",
+        "--- ページ 4 ---\ntext4",
+    ]
+
+
+def test_timeout_returns_completed_pages(vision):
+    vision(delays={2: 5.0, 4: 5.0})
+    pages = [_vision_page(i) for i in range(4)] + [_text_page(4)]
+    t0 = time.monotonic()
+    text, timings, unread = main._ocr_pdf_pages(pages, timeout=1.5)
+
+    assert time.monotonic() - t0 < 3
+    assert unread == [2, 4]
+    assert [t["pages"] for t in timings] == [[1], [3], [5]]
+    assert text == "--- ページ 1 ---\nocr1\n\n--- ページ 3 ---\nocr3\n\n--- ページ 5 ---\ntext5"
+
+
+def test_failed_group_does_not_fail_document(vision):
+    vision(fail={2})
+    text, timings, unread = main._ocr_pdf_pages([_vision_page(i) for i in range(3)], timeout=30)
+    assert unread == [2]
+    assert text == "--- ページ 1 ---\nocr1\n\n--- ページ 3 ---\nocr3"
+
+
+def test_nothing_read_raises(vision):
+    vision(delays={1: 5.0, 2: 5.0})
+    with pytest.raises(HTTPException) as e:
+        main._ocr_pdf_pages([_vision_page(0), _vision_page(1)], timeout=1.2)
+    assert e.value.status_code == 504
+
+    vision(fail={1})
+    with pytest.raises(HTTPException) as e:
+        main._ocr_pdf_pages([_vision_page(0)], timeout=30)
+    assert e.value.status_code == 502
+
+
+def test_one_request_uses_limited_slots(vision, monkeypatch):
+    monkeypatch.setattr(main, "_OCR_PAGE_CONCURRENCY_PER_REQUEST", 2)
+    fake = vision(delays={n: 0.05 for n in range(1, 9)})
+    text, timings, unread = main._ocr_pdf_pages([_vision_page(i) for i in range(8)], timeout=30)
+    assert unread == [] and len(timings) == 8
+    assert fake.max_active == 2
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+_BODY = {"file_key": "documents/0b7c2f8e-7a51-4c1e-9a55-4f5e0e6b2d11.pdf"}
+
+
+@pytest.fixture
+def client():
+    main.app.dependency_overrides[main.verify_jwt] = lambda: {"sub": "u1", "hospital_id": "h1"}
+    with TestClient(main.app) as c:
+        yield c
+    main.app.dependency_overrides.clear()
+
+
+def _stub_ocr(monkeypatch, error=None):
+    def fake_impl(body, credentials, user, emit=None):
+        emit("fetched", {"size": 10, "elapsed_ms": 1})
+        emit("page", {"pages": [1], "elapsed_ms": 2, "chars": 2, "text": "本文"})
+        if error is not None:
+            raise error
+        emit("text", {"text": "本文", "elapsed_ms": 3})
+        return {"text": "本文", "meta": {}, "warnings": []}
+
+    monkeypatch.setattr(main, "_ocr_impl", fake_impl)
+
+
+def _post(client, path="/api/ocr/stream", accept=None):
+    headers = {"Authorization": "Bearer t"}
+    if accept:
+        headers["Accept"] = accept
+    return client.post(path, json=_BODY, headers=headers)
+
+
+def _ndjson_events(res) -> list[tuple[str, dict]]:
+    return [(e["event"], e["data"]) for e in map(json.loads, res.text.splitlines())]
+
+
+def _sse_events(res) -> list[tuple[str, dict]]:
+    out = []
+    for block in res.text.split("\n\n"):
+        if not block:
+            continue
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        out.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return out
+
+
+@pytest.mark.parametrize("path", ["/api/ocr/stream", "/ocr/stream"])
+def test_ndjson_by_default_and_result_is_last(monkeypatch, client, path):
+    _stub_ocr(monkeypatch)
+    res = _post(client, path)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    events = _ndjson_events(res)
+    assert [e for e, _ in events] == ["fetched", "page", "text", "result"]
+    assert events[-1][1]["text"] == "本文"
+
+
+def test_sse_when_accept_event_stream(monkeypatch, client):
+    _stub_ocr(monkeypatch)
+    res = _post(client, accept="text/event-stream")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(res)
+    assert [e for e, _ in events] == ["fetched", "page", "text", "result"]
+    assert events[1][1]["text"] == "本文"
+
+
+@pytest.mark.parametrize("accept, parse", [(None, _ndjson_events), ("text/event-stream", _sse_events)])
+def test_http_error_becomes_last_error_event(monkeypatch, client, accept, parse):
+    _stub_ocr(monkeypatch, HTTPException(status_code=400, detail="ページ数が上限を超えています"))
+    res = _post(client, accept=accept)
+    assert res.status_code == 200
+    events = parse(res)
+    assert [e for e, _ in events] == ["fetched", "page", "error"]
+    assert events[-1][1] == {"status": 400, "detail": "ページ数が上限を超えています"}
+
+
+def test_unexpected_error_becomes_500_error_event(monkeypatch, client):
+    _stub_ocr(monkeypatch, RuntimeError("boom"))
+    events = _ndjson_events(_post(client))
+    assert events[-1] == ("error", {"status": 500, "detail": "OCR処理でエラーが発生しました"})
@@ -0,0 +1,72 @@
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+import main
+from page_analysis import PageSkipPolicy, analyze_page, select_pages
+from pdf_render_pool import PdfPage
+
+_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype(_FONT, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _lab_page(seed: int, changed: str = "") -> Image.Image:
+    """
+    同じ様式の検査結果（値の列は seed で決まる。changed を指定すると最初の行の値だけを差し替える）。
+    大きさは A4 200dpi を OCR_IMAGE_LONG_EDGE 相当に縮小したもの
+    """
+    rnd = random.Random(seed)
+    img = Image.new("L", (1132, 1600), 255)
+    d = ImageDraw.Draw(img)
+    f = _font(20)
+    d.text((40, 20), "FROM: 03-1234-5678  2026/10/01 10:22", fill=0, font=f)
+    for y in range(120, 1500, 60):
+        d.rectangle((70, y, 1060, y + 54), outline=0, width=2)
+        d.text((85, y + 14), f"Test item {y}", fill=0, font=f)
+        value = f"{rnd.uniform(0, 200):.1f}"
+        d.text((760, y + 14), f"{changed if changed and y == 120 else value} mg/dL", fill=0, font=f)
+    return img
+
+
+def _blank_fax_page(seed: int) -> Image.Image:
+    """空白の裏面: FAX のヘッダー行（余白内）と 2x2 画素の点ノイズだけ"""
+    rnd = random.Random(seed)
+    img = Image.new("L", (1132, 1600), 255)
+    d = ImageDraw.Draw(img)
+    d.text((40, 20), "FROM: 03-1234-5678  2026/10/01 10:22", fill=0, font=_font(20))
+    for _ in range(300):
+        x, y = rnd.randrange(1130), rnd.randrange(1598)
+        d.rectangle((x, y, x + 1, y + 1), fill=0)
+    return img
+
+
+def _one_line_page() -> Image.Image:
+    img = Image.new("L", (1132, 1600), 255)
+    ImageDraw.Draw(img).text((120, 400), "See attached.", fill=0, font=_font(20))
+    return img
+
+
+def _page(index: int, img: Image.Image) -> PdfPage:
+    return PdfPage(index, None, None, 0, 0.0, analyze_page(img))
+
+
+def test_blank_pages_are_skipped():
+    pages = [_page(0, _lab_page(1)), _page(1, _blank_fax_page(1)), _page(2, _one_line_page())]
+    kept, skipped = select_pages(pages, main._PAGE_SKIP_POLICY)
+    assert [p.index for p in kept] == [0, 2]
+    assert [(s["page"], s["reason"]) for s in skipped] == [(2, "blank")]
+    assert select_pages(pages, PageSkipPolicy()) == (pages, [])
+
+
+def test_repeated_pages_are_all_read():
+    # 再送と同じ画像・数値1つだけ違う同じ様式のページも OCR に送る（重複ページの除外は行わない）
+    img = _lab_page(1, "98.6")
+    pages = [_page(0, img), _page(1, img.copy()), _page(2, _lab_page(1, "98.8")), _page(3, _lab_page(2))]
+    kept, skipped = select_pages(pages, main._PAGE_SKIP_POLICY)
+    assert [p.index for p in kept] == [0, 1, 2, 3] and skipped == []
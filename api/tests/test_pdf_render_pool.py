@@ -0,0 +1,112 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import pdf_render_pool
+from page_encoder import PageEncoding
+
+
+def _pdf(pages: int) -> bytes:
+    images = [Image.new("RGB", (200, 260), "white") for _ in range(pages)]
+    buf = io.BytesIO()
+    images[0].save(buf, "PDF", save_all=True, append_images=images[1:])
+    return buf.getvalue()
+
+
+def test_only_existing_pages_are_submitted_by_path(monkeypatch):
+    submitted = []
+
+    def inline_run_many(fn, args_list, timeout=None):
+        submitted.append((fn.__name__, [args[:2] for args in args_list]))
+        return [fn(*args) for args in args_list]
+
+    monkeypatch.setattr(pdf_render_pool, "PDF_RENDER_WORKERS", 2)
+    monkeypatch.setattr(pdf_render_pool, "run_many", inline_run_many)
+    pages, total = pdf_render_pool.render_pdf_pages(_pdf(2), 23, PageEncoding())
+
+    assert total == 2 and [p.index for p in pages] == [0, 1]
+    (count_fn, count_args), (render_fn, render_args) = submitted
+    path = count_args[0][0]
+    assert count_fn == "_page_count" and render_fn == "_render_page"
+    # ワーカーにはバイト列ではなく一時ファイルのパスを渡し、存在する2ページ分だけ投入する
+    assert render_args == [(path, 0), (path, 1)]
+    assert not os.path.exists(path)
+
+
+def test_inline_mode_renders_existing_pages(monkeypatch):
+    monkeypatch.setattr(pdf_render_pool, "PDF_RENDER_WORKERS", 0)
+    pages, total = pdf_render_pool.render_pdf_pages(_pdf(3), 2, PageEncoding())
+    assert total == 3 and [p.index for p in pages] == [0, 1]
+
+
+# ---- 実際のワーカープロセス（1プロセス）で、タイムアウト・異常終了・再試行・再作成を確かめる ----
+def _sleep_task(secs: float, marker: str = "") -> str:
+    if marker:
+        open(marker, "w").close()
+    time.sleep(secs)
+    return "slept"
+
+
+def _exit_task() -> None:
+    os._exit(3)
+
+
+def _pid_task() -> int:
+    return os.getpid()
+
+
+@pytest.fixture
+def real_pool(monkeypatch):
+    monkeypatch.setattr(pdf_render_pool, "PDF_RENDER_WORKERS", 1)
+    pdf_render_pool.shutdown()
+    yield
+    pdf_render_pool.shutdown()
+
+
+def _stats_delta(before: dict) -> dict:
+    after = pdf_render_pool.get_render_pool_stats()
+    return {k: after[k] - before[k] for k in ("timeouts", "crashes", "retries", "pool_restarts")}
+
+
+def test_timeout_kills_worker_and_next_call_uses_new_pool(real_pool):
+    first_pid = pdf_render_pool.run_many(_pid_task, [()], timeout=60)[0]
+    before = pdf_render_pool.get_render_pool_stats()
+    with pytest.raises(pdf_render_pool.RenderTimeout):
+        pdf_render_pool.run_many(_sleep_task, [(30,)], timeout=0.5)
+    assert _stats_delta(before) == {"timeouts": 1, "crashes": 0, "retries": 0, "pool_restarts": 1}
+
+    # 強制終了したワーカーの代わりに新しいプールで動く
+    assert pdf_render_pool.run_many(_pid_task, [()], timeout=60)[0] != first_pid
+
+
+def test_crashing_task_is_retried_once_then_reported(real_pool):
+    pdf_render_pool.run_many(_pid_task, [()], timeout=60)
+    before = pdf_render_pool.get_render_pool_stats()
+    with pytest.raises(pdf_render_pool.RenderCrashed):
+        pdf_render_pool.run_many(_exit_task, [()], timeout=60)
+    assert _stats_delta(before) == {"timeouts": 0, "crashes": 2, "retries": 1, "pool_restarts": 2}
+    assert pdf_render_pool.run_many(_pid_task, [()], timeout=60)[0] > 0
+
+
+def test_pool_discarded_by_another_request_is_retried(real_pool, tmp_path):
+    pdf_render_pool.run_many(_pid_task, [()], timeout=60)
+    marker = str(tmp_path / "started")
+    result: list = []
+    t = threading.Thread(target=lambda: result.append(
+        pdf_render_pool.run_many(_sleep_task, [(1.0, marker)], timeout=60)
+    ))
+    before = pdf_render_pool.get_render_pool_stats()
+    t.start()
+    deadline = time.monotonic() + 30
+    while not os.path.exists(marker) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    # 他のリクエストのタイムアウトでプールが破棄された状況（このリクエストのタスクの異常終了ではない）
+    pdf_render_pool._discard_pool(pdf_render_pool._pool_generation)
+    t.join(60)
+
+    assert result == [["slept"]]
+    assert _stats_delta(before) == {"timeouts": 0, "crashes": 0, "retries": 1, "pool_restarts": 1}
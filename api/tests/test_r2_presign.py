@@ -0,0 +1,54 @@
+import datetime
+import urllib.parse
+
+import boto3
+import pytest
+
+import r2_client
+from r2_presign import R2Presigner
+
+_ENDPOINT = "https://0123456789abcdef.r2.cloudflarestorage.com"
+_ACCESS_KEY = "AKIDEXAMPLE"
+_SECRET_KEY = "wJalrXUtnFEMI/K7MDENG/bPxRfiCYEXAMPLEKEY"
+
+_CASES = [
+    ("get_object", {"Bucket": "docs", "Key": "documents/a b/日本語+(1).pdf"}, 300),
+    ("get_object", {
+        "Bucket": "docs", "Key": "documents/x.pdf",
+        "ResponseContentDisposition": "attachment; filename*=UTF-8''%E7%B4%B9%E4%BB%8B.pdf",
+        "ResponseContentType": "application/pdf",
+    }, 600),
+    ("head_object", {"Bucket": "docs", "Key": "documents/~tilde=eq&amp.png"}, 60),
+    ("put_object", {"Bucket": "docs", "Key": "documents/new.pdf", "ContentType": "application/pdf"}, 900),
+    ("put_object", {"Bucket": "docs", "Key": "previews/new.webp"}, 900),
+    ("upload_part", {"Bucket": "docs", "Key": "documents/big.pdf", "UploadId": "2~abc/DEF+ghi=", "PartNumber": 7}, 3600),
+]
+
+
+@pytest.fixture(scope="module")
+def boto_client():
+    # 本番の get_s3_client と同じ設定（endpoint / region=auto / _client_config）
+    return boto3.session.Session().client(
+        "s3",
+        endpoint_url=_ENDPOINT,
+        aws_access_key_id=_ACCESS_KEY,
+        aws_secret_access_key=_SECRET_KEY,
+        region_name="auto",
+        config=r2_client._client_config(),
+    )
+
+
+@pytest.mark.parametrize("method,params,expires", _CASES)
+def test_matches_boto3_byte_for_byte(boto_client, method, params, expires):
+    expected = boto_client.generate_presigned_url(ClientMethod=method, Params=params, ExpiresIn=expires)
+    # boto3 の URL に入った X-Amz-Date を now= に渡して時刻を揃える
+    amz_date = urllib.parse.parse_qs(urllib.parse.urlsplit(expected).query)["X-Amz-Date"][0]
+    now = datetime.datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+
+    presigner = R2Presigner(_ENDPOINT, _ACCESS_KEY, _SECRET_KEY, region="auto")
+    assert presigner.generate_presigned_url(method, params, ExpiresIn=expires, now=now) == expected
+
+
+def test_unsupported_method_is_rejected():
+    with pytest.raises(ValueError):
+        R2Presigner(_ENDPOINT, _ACCESS_KEY, _SECRET_KEY).generate_presigned_url("delete_object", {"Bucket": "b", "Key": "k"})
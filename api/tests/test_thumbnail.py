@@ -0,0 +1,101 @@
+import io
+from urllib.parse import unquote
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from PIL import Image
+
+import main
+import pdf_render_pool
+import thumbnail
+
+_CREDS = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+_UUID = "0b7c2f8e-7a51-4c1e-9a55-4f5e0e6b2d11"
+_DOC_ID = "5d0f4a9e-2c3b-4f6a-8e7d-1a2b3c4d5e6f"
+
+
+def _image(fmt: str, size: tuple[int, int]) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, "white").save(buf, fmt)
+    return buf.getvalue()
+
+
+def test_preview_key_for():
+    assert thumbnail.preview_key_for(f"documents/{_UUID}.pdf") == f"previews/{_UUID}.webp"
+    assert thumbnail.preview_key_for(f"documents/{_UUID}.jpg") == f"previews/{_UUID}.webp"
+    for key in (f"documents/../{_UUID}.pdf", f"documents/{_UUID}", "documents/x.pdf", f"other/{_UUID}.pdf"):
+        assert thumbnail.preview_key_for(key) is None
+
+
+def test_validate_download_key_accepts_only_exact_preview_keys():
+    assert main._validate_download_key(f"previews/{_UUID}.webp") == "webp"
+    for key in (
+        f"previews/../documents/{_UUID}.webp",
+        f"previews/{_UUID}.webp/../../secret.pdf",
+        f"previews/{_UUID}.png",
+        f"previews/{_UUID.upper()}.webp",
+        "previews/x.webp",
+    ):
+        with pytest.raises(HTTPException) as e:
+            main._validate_download_key(key)
+        assert e.value.status_code == 400
+
+
+def test_access_many_queries_file_key_and_preview_key_separately(monkeypatch):
+    source, preview, other = f"documents/{_UUID}.pdf", f"previews/{_UUID}.webp", "documents/other.pdf"
+    queries = []
+
+    def fake_get(path, jwt_token):
+        queries.append(unquote(path))
+        column = path.split("=in.", 1)[0].split("?", 1)[1]
+        rows = {
+            "file_key": [
+                {"file_key": source, "from_hospital_id": "h1", "to_hospital_id": "h2"},
+                {"file_key": other, "from_hospital_id": "h8", "to_hospital_id": "h9"},
+            ],
+            "preview_file_key": [{"preview_file_key": preview, "from_hospital_id": "h3", "to_hospital_id": "h1"}],
+        }[column]
+        return rows
+
+    monkeypatch.setattr(main, "_supabase_get", fake_get)
+    allowed = main._assert_download_access_many([source, preview, other], "h1", "jwt")
+
+    assert len(queries) == 2
+    assert queries[0].startswith(f'documents?file_key=in.("{source}","{other}")')
+    assert queries[1].startswith(f'documents?preview_file_key=in.("{preview}")')
+    assert set(allowed) == {source, preview}
+    assert allowed[source]["file_ext"] == "pdf" and allowed[preview]["file_ext"] == "webp"
+
+
+def test_thumbnail_of_other_hospitals_document_is_403(monkeypatch):
+    monkeypatch.setattr(main, "_get_hospital_id", lambda user_id, jwt, claims=None: "h1")
+    monkeypatch.setattr(main, "_supabase_get", lambda path, jwt: [{
+        "id": _DOC_ID, "file_key": f"documents/{_UUID}.pdf", "preview_file_key": None,
+        "from_hospital_id": "h2", "to_hospital_id": "h3",
+    }])
+    monkeypatch.setattr(main, "_generate_thumbnail", lambda key: pytest.fail("生成してはいけない"))
+    with pytest.raises(HTTPException) as e:
+        main._thumbnail_impl(_DOC_ID, _CREDS, {"sub": "u1"})
+    assert e.value.status_code == 403
+
+
+@pytest.mark.parametrize("ext, fmt, size", [
+    ("png", "PNG", (1000, 500)),
+    ("jpg", "JPEG", (600, 1200)),
+    ("pdf", "PDF", (595, 842)),    # 72dpi で A4 1ページ
+])
+def test_render_thumbnail_fits_max_edge(monkeypatch, ext, fmt, size):
+    monkeypatch.setattr(pdf_render_pool, "PDF_RENDER_WORKERS", 0)
+    img = Image.open(io.BytesIO(thumbnail.render_thumbnail(_image(fmt, size), ext)))
+    assert img.format == "WEBP"
+    assert max(img.size) == thumbnail.THUMBNAIL_MAX_EDGE
+    # 縦横比を保つ（PDF は描画倍率の丸めで 1px ずれうる）
+    short = min(size) * thumbnail.THUMBNAIL_MAX_EDGE / max(size)
+    assert abs(min(img.size) - short) <= 1
+    assert (img.size[0] > img.size[1]) == (size[0] > size[1])
+
+
+def test_render_thumbnail_rejects_unsupported_format():
+    with pytest.raises(ValueError):
+        thumbnail.render_thumbnail(b"x", "xlsx")
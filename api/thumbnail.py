@@ -0,0 +1,98 @@
+import io
+import logging
+import os
+import re
+from typing import Optional
+
+import pypdfium2 as pdfium
+from PIL import Image, ImageOps
+
+from pdf_render_pool import run_many
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# 一覧カード用サムネイル生成
+#  - PDF は 1 ページ目だけを pypdfium2 で描画、画像は縮小のみ
+#  - 出力は WebP（長辺 THUMBNAIL_MAX_EDGE px）。数 KB〜数十 KB に収まる
+#  - キーは元ファイルの UUID から決定的に作る（previews/<uuid>.webp）
+#    → 再生成しても同じキーに上書きされ、重複排除で file_key を共有する文書はサムネイルも共有する
+# ----------------------------
+def _env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "").strip()
+    try:
+        return int(v) if v else default
+    except ValueError:
+        return default
+
+
+THUMBNAIL_MAX_EDGE = max(_env_int("THUMBNAIL_MAX_EDGE", 320), 64)
+THUMBNAIL_QUALITY = min(max(_env_int("THUMBNAIL_QUALITY", 70), 1), 100)
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+THUMBNAIL_EXTS = {"pdf", "png", "jpg"}
+
+_SOURCE_KEY_RE = re.compile(r"^documents/([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.[a-z]+$")
+PREVIEW_KEY_RE = re.compile(r"^previews/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.webp$")
+
+
+def preview_key_for(file_key: str) -> Optional[str]:
+    """documents/<uuid>.<ext> → previews/<uuid>.webp（形式外のキーは None）"""
+    m = _SOURCE_KEY_RE.match(file_key)
+    return f"previews/{m.group(1)}.webp" if m else None
+
+
+def _render_pdf_first_page(data: bytes) -> Image.Image:
+    pdf = pdfium.PdfDocument(data)
+    try:
+        page = pdf[0]
+        try:
+            width, height = page.get_size()
+            scale = THUMBNAIL_MAX_EDGE / max(width, height, 1)
+            bitmap = page.render(scale=scale)
+            try:
+                return bitmap.to_pil().convert("RGB")
+            finally:
+                bitmap.close()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+
+def _load_image(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    # JPEG は縮小デコード（DCT スケーリング）でフル解像度の展開を避ける
+    img.draft("RGB", (THUMBNAIL_MAX_EDGE, THUMBNAIL_MAX_EDGE))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        # 透過 PNG は白背景に合成（WebP の透過をそのまま使うとカード背景色が透ける）
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    return img
+
+
+def render_thumbnail(data: bytes, ext: str) -> bytes:
+    """
+    PDF / PNG / JPEG のバイト列から WebP サムネイルを生成する（CPU 処理。スレッドプールから呼ぶ）。
+    PDF は pdfium を使うため PDF 描画用プロセスプールで実行する。
+    未対応形式は ValueError、壊れたファイルは pypdfium2 / Pillow の例外を送出する。
+    """
+    if ext == "pdf":
+        return run_many(_render_thumbnail_local, [(data, ext)])[0]
+    return _render_thumbnail_local(data, ext)
+
+
+def _render_thumbnail_local(data: bytes, ext: str) -> bytes:
+    if ext == "pdf":
+        img = _render_pdf_first_page(data)
+    elif ext in {"png", "jpg"}:
+        img = _load_image(data)
+    else:
+        raise ValueError(f"サムネイル未対応の形式です: {ext}")
+
+    img.thumbnail((THUMBNAIL_MAX_EDGE, THUMBNAIL_MAX_EDGE))
+    out = io.BytesIO()
+    img.save(out, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    return out.getvalue()
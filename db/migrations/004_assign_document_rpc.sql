@@ -0,0 +1,120 @@
+-- =============================================================================
+-- Migration 004: assign_document() RPC 追加
+-- 目的:
+--   POST /api/documents/{doc_id}/assign が行っていた5回の REST 呼び出し
+--   （documents GET → assignments PATCH → assignments INSERT → documents PATCH → logs INSERT）を
+--   1回の RPC（1トランザクション）にまとめる。
+--
+-- 変更内容:
+--   1. public.assign_document(...) を作成（SECURITY INVOKER: 既存 RLS がそのまま効く）
+--   2. documents 行を SELECT ... FOR UPDATE でロックしてから is_current を切り替えるため、
+--      同一ドキュメントへの同時アサインで UNIQUE(document_id) WHERE is_current の競合が起きない
+--   3. document_logs INSERT は従来どおり best-effort（失敗しても本体は COMMIT する）
+--
+-- エラー（PostgREST レスポンスの code で FastAPI 側が HTTP ステータスに変換する）:
+--   P0002: ドキュメントが見つからない（RLS で見えない場合を含む） → 404
+--   42501: 自院宛でない / プロフィール未設定 / 更新拒否             → 403
+--   22023: 無効なステータス                                         → 400
+--
+-- 実行環境: Supabase SQL Editor（手動実行）
+-- 実行順序: API のデプロイ前に適用すること（未適用の場合 assign API は 500 を返す）
+-- ロールバック:
+--   DROP FUNCTION IF EXISTS public.assign_document(uuid, text, uuid, text);
+-- =============================================================================
+
+CREATE OR REPLACE FUNCTION public.assign_document(
+  p_document_id         uuid,
+  p_assigned_department text,
+  p_owner_user_id       uuid DEFAULT NULL,
+  p_to_status           text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+  v_uid          uuid := auth.uid();
+  v_hospital_id  uuid;
+  v_to_hospital  uuid;
+  v_old_status   text;
+  v_new_status   text;
+  v_assigned_at  timestamp with time zone := now();
+BEGIN
+  SELECT hospital_id INTO v_hospital_id FROM public.profiles WHERE id = v_uid;
+  IF v_uid IS NULL OR v_hospital_id IS NULL THEN
+    RAISE EXCEPTION 'profile not found' USING ERRCODE = '42501';
+  END IF;
+
+  -- 対象ドキュメントをロック（RLS: to_hospital_id=自院の行のみ見える）
+  SELECT status, to_hospital_id
+    INTO v_old_status, v_to_hospital
+    FROM public.documents
+   WHERE id = p_document_id
+   FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'document not found' USING ERRCODE = 'P0002';
+  END IF;
+  IF v_to_hospital IS DISTINCT FROM v_hospital_id THEN
+    RAISE EXCEPTION 'not addressed to own hospital' USING ERRCODE = '42501';
+  END IF;
+
+  v_old_status := COALESCE(v_old_status, 'UPLOADED');
+  v_new_status := COALESCE(NULLIF(p_to_status, ''), v_old_status);
+  IF v_new_status NOT IN ('UPLOADED', 'IN_PROGRESS', 'DOWNLOADED', 'ARCHIVED', 'CANCELLED') THEN
+    RAISE EXCEPTION 'invalid status: %', v_new_status USING ERRCODE = '22023';
+  END IF;
+
+  -- 既存アサインを非現在化 → 新アサイン INSERT（同一トランザクション内）
+  UPDATE public.document_assignments
+     SET is_current = false
+   WHERE document_id = p_document_id
+     AND is_current = true;
+
+  INSERT INTO public.document_assignments (
+    document_id, hospital_id, assigned_department, owner_user_id,
+    assigned_by, assigned_at, is_current
+  ) VALUES (
+    p_document_id, v_hospital_id, p_assigned_department, p_owner_user_id,
+    v_uid, v_assigned_at, true
+  );
+
+  -- documents は status のみ更新（担当情報は documents に書かない）
+  UPDATE public.documents
+     SET status = v_new_status
+   WHERE id = p_document_id
+     AND to_hospital_id = v_hospital_id;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'status update rejected' USING ERRCODE = '42501';
+  END IF;
+
+  -- document_logs（best-effort: 失敗してもアサイン本体はロールバックしない）
+  BEGIN
+    INSERT INTO public.document_logs (
+      document_id, hospital_id, action, from_status, to_status, changed_by
+    ) VALUES (
+      p_document_id, v_hospital_id, 'ASSIGN', v_old_status, v_new_status, v_uid
+    );
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  RETURN jsonb_build_object(
+    'document_id', p_document_id,
+    'assigned_at', to_char(v_assigned_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"'),
+    'status',      v_new_status,
+    'old_status',  v_old_status
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.assign_document(uuid, text, uuid, text) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.assign_document(uuid, text, uuid, text) TO authenticated;
+
+-- PostgREST のスキーマキャッシュを更新（関数追加を即時反映）
+NOTIFY pgrst, 'reload schema';
+
+-- 確認クエリ（実行後に目視確認）
+SELECT proname, prosecdef
+FROM pg_proc
+WHERE proname = 'assign_document';
@@ -0,0 +1,160 @@
+-- =============================================================================
+-- Migration 005: assign_documents_bulk() RPC 追加
+-- 目的:
+--   受信BOXの一括振り分け（BusinessLanePanel）で N 件のアサインを1回の RPC で行う。
+--   assign_document()（migration 004）を N 回呼ぶ代わりに、
+--   対象ドキュメントを1クエリで検証し、担当切替・status 更新・ログをまとめて書き込む。
+--
+-- 入力 p_items（jsonb 配列）:
+--   [{"document_id": uuid, "assigned_department": text, "owner_user_id": uuid|null, "to_status": text|null}, ...]
+--   document_id の重複は不可（API 側で弾く。直接呼ばれた場合は UNIQUE 違反で全体がロールバックされる）
+--
+-- 戻り値（jsonb）:
+--   {"assigned_at": "...Z", "results": [{"document_id", "ok", "error", "status", "old_status"}, ...]}
+--   error: not_found（RLS で見えない場合を含む）/ forbidden（自院宛でない）/ invalid_status
+--          / update_denied（RLS で status 更新が 0 行になった。担当切替・ログも書かない）
+--   エラーの文書はスキップし、その他の文書は同一トランザクションで確定する。
+--
+-- 実行環境: Supabase SQL Editor（手動実行）
+-- 前提: migration 004 適用済み
+-- ロールバック:
+--   DROP FUNCTION IF EXISTS public.assign_documents_bulk(jsonb);
+-- =============================================================================
+
+CREATE OR REPLACE FUNCTION public.assign_documents_bulk(p_items jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+  v_uid          uuid := auth.uid();
+  v_hospital_id  uuid;
+  v_assigned_at  timestamp with time zone := now();
+  v_ids          uuid[];
+  v_plan         jsonb;
+  v_updated      uuid[];
+  v_count        integer;
+BEGIN
+  SELECT hospital_id INTO v_hospital_id FROM public.profiles WHERE id = v_uid;
+  IF v_uid IS NULL OR v_hospital_id IS NULL THEN
+    RAISE EXCEPTION 'profile not found' USING ERRCODE = '42501';
+  END IF;
+  IF jsonb_typeof(p_items) IS DISTINCT FROM 'array' THEN
+    RAISE EXCEPTION 'p_items must be an array' USING ERRCODE = '22023';
+  END IF;
+
+  SELECT array_agg((e->>'document_id')::uuid) INTO v_ids
+    FROM jsonb_array_elements(p_items) AS e;
+
+  -- 対象行をロック（id 順に取得してデッドロックを避ける）
+  PERFORM 1
+     FROM public.documents
+    WHERE id = ANY(v_ids)
+    ORDER BY id
+    FOR UPDATE;
+
+  -- 1クエリで全件検証し、文書ごとの処理計画を作る
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+           'document_id',         i.document_id,
+           'assigned_department', i.assigned_department,
+           'owner_user_id',       i.owner_user_id,
+           'old_status',          COALESCE(d.status, 'UPLOADED'),
+           'new_status',          COALESCE(NULLIF(i.to_status, ''), d.status, 'UPLOADED'),
+           'error',
+             CASE
+               WHEN d.id IS NULL THEN 'not_found'
+               WHEN d.to_hospital_id IS DISTINCT FROM v_hospital_id THEN 'forbidden'
+               WHEN COALESCE(NULLIF(i.to_status, ''), d.status, 'UPLOADED')
+                    NOT IN ('UPLOADED', 'IN_PROGRESS', 'DOWNLOADED', 'ARCHIVED', 'CANCELLED')
+                 THEN 'invalid_status'
+             END
+         )), '[]'::jsonb)
+    INTO v_plan
+    FROM jsonb_to_recordset(p_items)
+           AS i(document_id uuid, assigned_department text, owner_user_id uuid, to_status text)
+    LEFT JOIN public.documents d ON d.id = i.document_id;
+
+  -- documents は status のみ更新（担当切替より先に行う）
+  -- RLS の UPDATE ポリシーで除外された行は更新件数に含まれないため、
+  -- 実際に更新できた id を集め、更新されなかった文書は update_denied として以降の書き込みから外す
+  WITH upd AS (
+    UPDATE public.documents d
+       SET status = p.new_status
+      FROM jsonb_to_recordset(v_plan) AS p(document_id uuid, new_status text, error text)
+     WHERE d.id = p.document_id
+       AND p.error IS NULL
+       AND d.to_hospital_id = v_hospital_id
+    RETURNING d.id
+  )
+  SELECT COALESCE(array_agg(id), '{}') INTO v_updated FROM upd;
+  v_count := cardinality(v_updated);
+
+  IF v_count < (SELECT count(*) FROM jsonb_array_elements(v_plan) AS e WHERE e->>'error' IS NULL) THEN
+    SELECT jsonb_agg(
+             CASE
+               WHEN e->>'error' IS NULL AND NOT ((e->>'document_id')::uuid = ANY(v_updated))
+                 THEN jsonb_set(e, '{error}', '"update_denied"')
+               ELSE e
+             END ORDER BY ord)
+      INTO v_plan
+      FROM jsonb_array_elements(v_plan) WITH ORDINALITY AS t(e, ord);
+  END IF;
+
+  -- 既存アサインを非現在化（検証 OK の文書のみ）
+  UPDATE public.document_assignments da
+     SET is_current = false
+    FROM jsonb_to_recordset(v_plan) AS p(document_id uuid, error text)
+   WHERE da.document_id = p.document_id
+     AND p.error IS NULL
+     AND da.is_current = true;
+
+  INSERT INTO public.document_assignments (
+    document_id, hospital_id, assigned_department, owner_user_id,
+    assigned_by, assigned_at, is_current
+  )
+  SELECT p.document_id, v_hospital_id, p.assigned_department, p.owner_user_id,
+         v_uid, v_assigned_at, true
+    FROM jsonb_to_recordset(v_plan)
+           AS p(document_id uuid, assigned_department text, owner_user_id uuid, error text)
+   WHERE p.error IS NULL;
+
+  -- document_logs（best-effort）
+  BEGIN
+    INSERT INTO public.document_logs (
+      document_id, hospital_id, action, from_status, to_status, changed_by
+    )
+    SELECT p.document_id, v_hospital_id, 'ASSIGN', p.old_status, p.new_status, v_uid
+      FROM jsonb_to_recordset(v_plan)
+             AS p(document_id uuid, old_status text, new_status text, error text)
+     WHERE p.error IS NULL;
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  RETURN jsonb_build_object(
+    'assigned_at', to_char(v_assigned_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"'),
+    'results', (
+      SELECT COALESCE(jsonb_agg(jsonb_build_object(
+               'document_id', p.document_id,
+               'ok',          p.error IS NULL,
+               'error',       p.error,
+               'status',      CASE WHEN p.error IS NULL THEN p.new_status END,
+               'old_status',  p.old_status
+             )), '[]'::jsonb)
+        FROM jsonb_to_recordset(v_plan)
+               AS p(document_id uuid, old_status text, new_status text, error text)
+    )
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.assign_documents_bulk(jsonb) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.assign_documents_bulk(jsonb) TO authenticated;
+
+NOTIFY pgrst, 'reload schema';
+
+-- 確認クエリ（実行後に目視確認）
+SELECT proname, prosecdef
+FROM pg_proc
+WHERE proname = 'assign_documents_bulk';
@@ -0,0 +1,83 @@
+-- =============================================================================
+-- Migration 006: content_blobs テーブル追加（内容ハッシュによる重複排除）
+-- 目的:
+--   FAX の再送・同一紹介状の再アップロードで、同じバイト列が新しい documents/{uuid}.pdf として
+--   R2 に保存され、OCR も毎回やり直されている。
+--   sha256 → 正規の R2 キー + OCR 成果物 の索引を持ち、
+--     - FAX受信 Webhook: 既知の内容なら R2 PUT を省略して既存キーを参照する
+--     - OCR（/api/ocr・FAX受信OCR）: 既知の内容なら OpenAI 呼び出しを省略する
+--
+-- 設計:
+--   1. 主キーは (hospital_id, sha256)。病院をまたいで索引を共有しない
+--      （他院が同じ文書を持っているかを推測させない）
+--   2. sha256 は必ずサーバーが受信・取得したバイト列から計算する（クライアント申告値は使わない）
+--   3. file_key は最初に登録されたキーを正とする（上書きしない）
+--   4. ocr_text / structured_json は派生成果物（無くてもよい。後から PATCH で埋める）
+--      ocr_version は成果物を作った OCR 設定のバージョン（API の _OCR_CACHE_VERSION）。
+--      API は一致する行の成果物だけを再利用し、一致しない行は新しい結果で上書きする
+--   5. hit_count / last_hit_at は重複検出の記録（節約量の集計用）
+--
+-- 書き込み経路:
+--   - Webhook / FAX受信OCR: service_role（RLS バイパス）
+--   - /api/ocr: user JWT（下記 RLS: 自院の行のみ SELECT / INSERT / UPDATE 可）
+--
+-- 実行環境: Supabase SQL Editor（手動実行）
+-- 実行順序: API のデプロイ前後どちらでもよい（未適用の間 API は重複排除なしで従来どおり動く）
+-- ロールバック:
+--   DROP TABLE IF EXISTS public.content_blobs;
+-- =============================================================================
+
+CREATE TABLE public.content_blobs (
+  hospital_id      uuid        NOT NULL,
+  sha256           text        NOT NULL,
+  file_key         text        NOT NULL,
+  size_bytes       bigint      NOT NULL,
+  content_type     text,
+  page_count       integer,                        -- PDF の総ページ数（画像は NULL）
+  ocr_text         text,                           -- Vision OCR の生テキスト（コードフェンス除去後）
+  structured_json  jsonb,                          -- 構造化JSON（v2）
+  ocr_version      text,                           -- ocr_text / structured_json を作った OCR 設定のバージョン
+  hit_count        integer     NOT NULL DEFAULT 0,
+  created_at       timestamp with time zone NOT NULL DEFAULT now(),
+  last_hit_at      timestamp with time zone,
+
+  CONSTRAINT content_blobs_pkey
+    PRIMARY KEY (hospital_id, sha256),
+  CONSTRAINT content_blobs_hospital_id_fkey
+    FOREIGN KEY (hospital_id) REFERENCES public.hospitals(id),
+  CONSTRAINT content_blobs_sha256_format
+    CHECK (sha256 ~ '^[0-9a-f]{64}$')
+);
+
+COMMENT ON TABLE public.content_blobs IS
+  '内容ハッシュ（sha256）→ 正規の R2 キー + OCR 成果物 の索引（病院単位）。'
+  '同一内容の R2 保存と OCR を省略するために使う。';
+
+CREATE INDEX idx_content_blobs_file_key
+  ON public.content_blobs (file_key);
+
+ALTER TABLE public.content_blobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "content_blobs_select_own_hospital" ON public.content_blobs
+  FOR SELECT USING (
+    hospital_id = (SELECT hospital_id FROM public.profiles WHERE id = auth.uid())
+  );
+
+CREATE POLICY "content_blobs_insert_own_hospital" ON public.content_blobs
+  FOR INSERT WITH CHECK (
+    hospital_id = (SELECT hospital_id FROM public.profiles WHERE id = auth.uid())
+  );
+
+CREATE POLICY "content_blobs_update_own_hospital" ON public.content_blobs
+  FOR UPDATE USING (
+    hospital_id = (SELECT hospital_id FROM public.profiles WHERE id = auth.uid())
+  ) WITH CHECK (
+    hospital_id = (SELECT hospital_id FROM public.profiles WHERE id = auth.uid())
+  );
+
+NOTIFY pgrst, 'reload schema';
+
+-- 確認クエリ（実行後に目視確認）
+SELECT policyname, cmd
+FROM pg_policies
+WHERE tablename = 'content_blobs';
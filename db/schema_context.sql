@@ -6,6 +6,7 @@
 --   documents テーブルは共有状態 (status/from/to) のみを持つ
 --   is_current=true: 現在有効なアサイン（1ドキュメントにつき1件）
 --   アサイン変更: 既存 is_current=true を false → 新規 INSERT の順で実行
+--   （migration 004 以降は assign_document() RPC が1トランザクションで実行する）
 -- RLS: hospital_id=自院 かつ documents.to_hospital_id=自院 の二重チェック
 -- migration: db/migrations/001_document_assignments.sql
 CREATE TABLE public.document_assignments (
@@ -31,6 +32,30 @@ CREATE TABLE public.document_assignments (
 -- UNIQUE INDEX: 1ドキュメントにつき is_current=true は1件のみ許可
 -- CREATE UNIQUE INDEX idx_doc_assignments_current_unique ON document_assignments(document_id) WHERE is_current = true;
 
+-- content_blobs: 内容ハッシュ索引（v2.20 追加）
+-- 責務: (hospital_id, sha256) → 正規の R2 キー + OCR 成果物。同一内容の R2 保存・OCR を省略する
+--   sha256 はサーバーが取得したバイト列から計算する（クライアント申告値は使わない）
+--   file_key は最初に登録されたキーを正とする（同じ file_key を複数の documents が共有しうる）
+--   ocr_version は ocr_text / structured_json を作った OCR 設定のバージョン（API の _OCR_CACHE_VERSION。違えば再 OCR して上書き）
+-- RLS: hospital_id=自院 の行のみ SELECT / INSERT / UPDATE（Webhook は service_role）
+-- migration: db/migrations/006_content_blobs.sql
+CREATE TABLE public.content_blobs (
+  hospital_id      uuid NOT NULL,
+  sha256           text NOT NULL CHECK (sha256 ~ '^[0-9a-f]{64}$'),
+  file_key         text NOT NULL,
+  size_bytes       bigint NOT NULL,
+  content_type     text,
+  page_count       integer,
+  ocr_text         text,
+  structured_json  jsonb,
+  ocr_version      text,
+  hit_count        integer NOT NULL DEFAULT 0,
+  created_at       timestamp with time zone NOT NULL DEFAULT now(),
+  last_hit_at      timestamp with time zone,
+  CONSTRAINT content_blobs_pkey PRIMARY KEY (hospital_id, sha256),
+  CONSTRAINT content_blobs_hospital_id_fkey FOREIGN KEY (hospital_id) REFERENCES public.hospitals(id)
+);
+
 -- fax_inbounds: CloudFAX Inbound 受信本体ログ（v2.6 追加）
 -- 責務: FAX 受信（inbound）1件ごとのライフサイクル管理
 --   RECEIVED → DOC_CREATED（正常完了）
@@ -49,7 +74,7 @@ CREATE TABLE public.fax_inbounds (
   document_id          uuid,                                    -- 生成した documents.id
   file_key             text,                                    -- R2 保存キー
   error                text,                                    -- エラー内容（FAILED 時）
-  error_stage          text,                                    -- C: 失敗ステージ（PDF_FETCH / PDF_VALIDATE / R2_UPLOAD / DOCUMENT_INSERT / STATUS_UPDATE）
+  error_stage          text,                                    -- C: 失敗ステージ（PDF_FETCH / PDF_VALIDATE / PDF_RENDER_POOL / R2_UPLOAD / DOCUMENT_INSERT / STATUS_UPDATE）
   created_at           timestamp with time zone DEFAULT now(),
   updated_at           timestamp with time zone DEFAULT now(),
   CONSTRAINT fax_inbounds_pkey PRIMARY KEY (id),
@@ -121,7 +146,7 @@ CREATE TABLE public.documents (
   content_type text,
   file_ext text,
   file_size bigint,
-  preview_file_key text,
+  preview_file_key text,                 -- 一覧カード用サムネイル previews/<uuid>.webp（v2.24 以降 API が生成）
   structured_json jsonb,
   structured_updated_by text,
   structured_updated_at timestamp with time zone,
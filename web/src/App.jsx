@@ -49,8 +49,9 @@ import ConversationScreen from "./screens/ConversationScreen";
 // true  → tab="inbox" 時に ConversationScreen（やりとり単位の新UI）
 // false → 従来の ReceiveScreen（受信一覧）に即時ロールバック
 const ENABLE_CONVERSATION_VIEW = true;
-import { getPreviewKey, isPreviewable, getExtFromKey } from "./utils/preview";
+import { getPreviewKey, getThumbnailKey, isPreviewable, getExtFromKey } from "./utils/preview";
 import { logEvent, setAuditHospitalId } from "./utils/audit";
+import { readOcrStream, reduceOcrProgress } from "./utils/ocrStream";
 
 function fmt(dt) {
   if (!dt) return "";
@@ -125,6 +126,15 @@ const API_BASE = import.meta.env.VITE_API_BASE || "/api";
 const FAX_API_BASE = import.meta.env.VITE_FAX_API_BASE || API_BASE;
 console.log("API_BASE =", API_BASE, "FAX_API_BASE =", FAX_API_BASE);
 
+// マルチパートアップロード（大きいスキャン PDF / 不安定な回線向け）
+const MULTIPART_THRESHOLD = 16 * 1024 * 1024; // これを超えるファイルはパート分割して送る
+const MULTIPART_CONCURRENCY = 4;               // 並列 PUT 数
+const MULTIPART_MAX_RETRIES = 4;               // パートごとの試行回数
+const MULTIPART_STATE_PREFIX = "docport_multipart:"; // 再開用に upload_id を保存する localStorage キー
+
+// 一覧カード用サムネイル: presign-download-batch の1リクエストあたり上限（サーバー側 _PRESIGN_BATCH_MAX と同期）
+const PRESIGN_BATCH_MAX = 100;
+
 // アップロード許可 MIME → 拡張子マップ（サーバー側 ALLOWED_MIME_EXT と同期を保つこと）
 // フロントはUX用の早期バリデーション専用。最終判断は FastAPI が行う。
 const ALLOWED_MIME_EXT = {
@@ -325,6 +335,8 @@ export default function App() {
   const [uploadStatus, setUploadStatus] = useState("idle");
   const [ocrResult, setOcrResult] = useState(null);
   const [ocrError, setOcrError] = useState(null);
+  // OCR 途中経過（/api/ocr/stream のイベントを reduceOcrProgress でまとめたもの。ocr_running 中のみ表示）
+  const [ocrProgress, setOcrProgress] = useState(null);
   const [pendingFileKey, setPendingFileKey] = useState(null);
 
   // チェックモード設定（v3.7: localStorage で次回訪問時復元。checkIntensity は "full" 固定）
@@ -459,6 +471,8 @@ export default function App() {
     setProfile(prof);
     setMyAvatarUrl(prof.avatar_url || "");
     setAuditHospitalId(prof.hospital_id); // 監査ログ用キャッシュをセット
+    // API 側の hospital_id キャッシュも読み直させる（所属変更の即時反映。失敗しても TTL で反映されるので無視）
+    postApi("/me/hospital-id/refresh", {}).catch(() => {});
 
     const { data: hs, error: hsErr } = await supabase
       .from("hospitals").select("id, name, code, icon_url").order("name", { ascending: true });
@@ -518,6 +532,17 @@ export default function App() {
       setSentDocs(sent ?? []);
     }
 
+    // サムネイルの署名 URL は一覧表示後に非同期で付与する（一覧の表示を待たせない）
+    loadThumbUrls([...(inbox ?? []), ...(sent ?? [])]).then((urls) => {
+      if (Object.keys(urls).length === 0) return;
+      const withThumb = (doc) => {
+        const url = urls[getThumbnailKey(doc)];
+        return url ? { ...doc, thumb_url: url } : doc;
+      };
+      setInboxDocs((prev) => prev.map(withThumb));
+      setSentDocs((prev) => prev.map(withThumb));
+    });
+
     // 同院メンバー一覧（港モデル: 担当者選択用）
     // RLS に "profiles_select_same_hospital" ポリシーが必要（SQLマイグレーション参照）
     const { data: members, error: membersErr } = await supabase
@@ -599,7 +624,7 @@ export default function App() {
     const token = session?.access_token;
     // content_type と filename を POST body に含める（後方互換: body なし → PDF として扱われる）
     const body = file
-      ? JSON.stringify({ content_type: file.type || "application/pdf", filename: file.name || "" })
+      ? JSON.stringify({ content_type: file.type || "application/pdf", filename: file.name || "", size: file.size })
       : undefined;
     const res = await fetch(`${API_BASE}/presign-upload`, {
       method: "POST",
@@ -626,6 +651,130 @@ export default function App() {
     }
   };
 
+  // ---- R2 マルチパートアップロード（MULTIPART_THRESHOLD 超のファイル） ----
+  // パートを MULTIPART_CONCURRENCY 本並列で PUT し、失敗したパートだけ再送する。
+  // upload_id は localStorage に保存し、中断後に同じファイルを選ぶと list-parts で確認して続きから送る。
+  // ETag を読むため R2 バケットの CORS で ExposeHeaders に ETag が必要。
+  const postApi = async (path, payload) => {
+    const token = session?.access_token;
+    const res = await fetch(`${API_BASE}${path}`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify(payload),
+    });
+    if (!res.ok) {
+      const err = new Error(await res.text());
+      err.status = res.status;
+      throw err;
+    }
+    return res.json();
+  };
+
+  // 中断したアップロードの再開用。同じファイル（名前・サイズ・更新日時）なら保存済みの upload_id を使う
+  const multipartStateKey = (file) =>
+    `${MULTIPART_STATE_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+
+  // 保存済みの upload_id が生きていれば、送信済みパートの ETag と一緒に返す（無ければ null）
+  const resumeMultipart = async (file) => {
+    const stateKey = multipartStateKey(file);
+    let saved = null;
+    try {
+      saved = JSON.parse(localStorage.getItem(stateKey) || "null");
+    } catch {
+      saved = null;
+    }
+    if (!saved?.upload_id) return null;
+    try {
+      const { parts } = await postApi("/multipart-upload/list-parts", {
+        file_key: saved.file_key, upload_id: saved.upload_id,
+      });
+      const etags = {};
+      for (const p of parts) {
+        // サイズが想定と違うパート（途中で切れた等）は送り直す
+        const expected = Math.min(saved.part_size, file.size - (p.part_number - 1) * saved.part_size);
+        if (p.size === expected) etags[p.part_number] = p.etag;
+      }
+      return { ...saved, etags };
+    } catch (e) {
+      // 中止済み・期限切れ（404）だけ保存内容を消す。通信エラー・5xx では残し、次回の選び直しで再開する
+      if (e.status === 404) localStorage.removeItem(stateKey);
+      return null;
+    }
+  };
+
+  const uploadMultipart = async (file) => {
+    const stateKey = multipartStateKey(file);
+    let state = await resumeMultipart(file);
+    if (!state) {
+      const init = await postApi("/multipart-upload/initiate", {
+        content_type: file.type || "application/pdf",
+        filename: file.name || "",
+        size: file.size,
+      });
+      state = { ...init, etags: {} };
+      const { upload_id, file_key, part_size, part_count } = init;
+      // 一時的なエラーで再開できなかった保存内容は上書きしない（送信済みパートの多い元のアップロードを優先）
+      if (!localStorage.getItem(stateKey)) {
+        localStorage.setItem(stateKey, JSON.stringify({ upload_id, file_key, part_size, part_count }));
+      }
+    }
+    const { upload_id, file_key, part_size, part_count, etags } = state;
+    const partNumbers = Array.from({ length: part_count }, (_, i) => i + 1);
+
+    const putPart = async (n) => {
+      for (let attempt = 1; ; attempt++) {
+        try {
+          // 署名 URL は再送のたびに取り直す（期限切れ対策）
+          const { parts } = await postApi("/multipart-upload/presign-parts", {
+            file_key, upload_id, part_numbers: [n],
+          });
+          const blob = file.slice((n - 1) * part_size, n * part_size);
+          const res = await fetch(parts[0].url, { method: "PUT", body: blob });
+          if (!res.ok) throw new Error(`R2 part PUT failed: ${res.status}`);
+          const etag = res.headers.get("ETag");
+          if (!etag) throw new Error("ETag を取得できません（R2 の CORS 設定を確認してください）");
+          etags[n] = etag;
+          return;
+        } catch (e) {
+          if (attempt >= MULTIPART_MAX_RETRIES) throw e;
+          await new Promise((r) => setTimeout(r, 1000 * 2 ** (attempt - 1)));
+        }
+      }
+    };
+
+    // パート送信の失敗では abort しない（同じファイルを選び直せば届いていないパートから再開する）
+    const queue = partNumbers.filter((n) => !etags[n]);
+    const worker = async () => {
+      while (queue.length) await putPart(queue.shift());
+    };
+    await Promise.all(Array.from({ length: Math.min(MULTIPART_CONCURRENCY, queue.length) }, worker));
+
+    try {
+      const done = await postApi("/multipart-upload/complete", {
+        file_key,
+        upload_id,
+        parts: partNumbers.map((n) => ({ part_number: n, etag: etags[n] })),
+      });
+      localStorage.removeItem(stateKey);
+      return done;
+    } catch (e) {
+      localStorage.removeItem(stateKey);
+      await postApi("/multipart-upload/abort", { file_key, upload_id }).catch(() => {});
+      throw e;
+    }
+  };
+
+  // サイズで単一 PUT / マルチパートを切り替える。戻り値: { file_key }
+  const uploadToR2 = async (file) => {
+    if (file.size > MULTIPART_THRESHOLD) return uploadMultipart(file);
+    const { upload_url, file_key } = await getPresignedUpload(file);
+    await putFile(upload_url, file);
+    return { file_key };
+  };
+
   // ---- アバター画像アップロード (Supabase Storage "avatars" バケット) ----
   const uploadAvatar = async (file) => {
     const userId = session?.user?.id;
@@ -647,6 +796,44 @@ export default function App() {
     setMyAvatarUrl(publicUrl + "?t=" + Date.now()); // キャッシュバスター
   };
 
+  // 一覧カード用サムネイル（preview_file_key）の署名 URL をまとめて取得する。
+  // 戻り値: { preview_file_key: download_url }。失敗時は空（カードはアイコン表示のまま）
+  const loadThumbUrls = async (docs) => {
+    const keys = [...new Set(docs.map(getThumbnailKey).filter(Boolean))];
+    const urls = {};
+    try {
+      for (let i = 0; i < keys.length; i += PRESIGN_BATCH_MAX) {
+        const { items } = await postApi("/presign-download-batch", {
+          keys: keys.slice(i, i + PRESIGN_BATCH_MAX),
+          mode: "inline",
+        });
+        for (const item of items ?? []) {
+          if (item.ok) urls[item.key] = item.download_url;
+        }
+      }
+    } catch (e) {
+      console.warn("[thumbnails] presign failed", e);
+    }
+    return urls;
+  };
+
+  // 文書登録後のサムネイル生成（best-effort: 待たずに進め、失敗しても登録は成功扱い）
+  // 生成できたら一覧の該当カードにだけサムネイルを反映する
+  const requestThumbnail = (docId) => {
+    postApi(`/documents/${docId}/thumbnail`, {})
+      .then(async ({ preview_file_key }) => {
+        if (!preview_file_key) return;
+        const urls = await loadThumbUrls([{ preview_file_key }]);
+        const withThumb = (doc) =>
+          doc.id === docId
+            ? { ...doc, preview_file_key, thumb_url: urls[preview_file_key] || doc.thumb_url }
+            : doc;
+        setInboxDocs((prev) => prev.map(withThumb));
+        setSentDocs((prev) => prev.map(withThumb));
+      })
+      .catch((e) => console.warn("[thumbnail] generation failed", e));
+  };
+
   const getPresignedDownload = async (fileKey, mode = "inline") => {
     const token = session?.access_token;
     const url = `${API_BASE}/presign-download?key=${encodeURIComponent(fileKey)}&mode=${mode}`;
@@ -689,8 +876,7 @@ export default function App() {
 
     try {
       // R2 アップロード（content_type を渡して正しい拡張子・MIME で presign）
-      const { upload_url, file_key } = await getPresignedUpload(file);
-      await putFile(upload_url, file);
+      const { file_key } = await uploadToR2(file);
       setPendingFileKey(file_key);
 
       // OCR非対応形式（PPTX等）: テキスト抽出をスキップして即 ready（チェックモード問わず）
@@ -705,10 +891,11 @@ export default function App() {
         return;
       }
 
-      // チェックON + PDF / DOCX / XLSX: 抽出実行
+      // チェックON + PDF / DOCX / XLSX: 抽出実行（ストリーミング: ページごとのテキストを先に表示）
+      setOcrProgress(null);
       setUploadStatus("ocr_running");
       const token = session?.access_token;
-      const res = await fetch(`${API_BASE}/ocr`, {
+      const res = await fetch(`${API_BASE}/ocr/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -717,7 +904,9 @@ export default function App() {
         body: JSON.stringify({ file_key, mode: "full" }), // checkIntensity は "full" 固定
       });
       if (!res.ok) throw new Error(await res.text());
-      const result = await res.json();
+      const result = await readOcrStream(res, (event, data) =>
+        setOcrProgress((prev) => reduceOcrProgress(prev, event, data))
+      );
       setOcrResult(result);
       setUploadStatus("ready");
     } catch (e) {
@@ -836,6 +1025,7 @@ export default function App() {
       // 監査ログ（best-effort: logEvent 内で失敗を吸収する）
       const uid = session.user.id;
       await logEvent(data.id, uid, "DOC_CREATED");
+      requestThumbnail(data.id);
       if (ocrResult !== null) await logEvent(data.id, uid, "OCR_RUN");
       if (structuredPayload?.structured_updated_by === "human") {
         await logEvent(data.id, uid, "STRUCTURED_EDIT");
@@ -907,6 +1097,7 @@ export default function App() {
 
       const uid = session.user.id;
       await logEvent(data.id, uid, "DOC_CREATED");
+      requestThumbnail(data.id);
       if (ocrResult !== null) await logEvent(data.id, uid, "OCR_RUN");
       if (structuredPayload?.structured_updated_by === "human") {
         await logEvent(data.id, uid, "STRUCTURED_EDIT");
@@ -964,7 +1155,7 @@ export default function App() {
       if (doc.status === "CANCELLED") return alert("取り消し済みです");
       if (doc.status === "ARCHIVED") return alert("アーカイブ済みです");
 
-      // preview_file_key があればそちらを優先（変換済みPDF等）。なければ file_key。
+      // 全体プレビューは file_key（preview_file_key は一覧カード用サムネイル）
       const previewKey = getPreviewKey(doc);
       const canPreview = isPreviewable(previewKey);
       const extIsImage = ["png", "jpg", "jpeg", "webp"].includes(getExtFromKey(previewKey));
@@ -1345,6 +1536,7 @@ export default function App() {
           uploadStatus={uploadStatus}
           ocrResult={ocrResult}
           ocrError={ocrError}
+          ocrProgress={ocrProgress}
           checkMode={checkMode}
           setCheckMode={setCheckMode}
           finalizeDocument={finalizeDocument}
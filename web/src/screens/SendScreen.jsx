@@ -44,6 +44,7 @@ export default function SendScreen({
   uploadStatus,
   ocrResult,
   ocrError,
+  ocrProgress,
   checkMode,
   setCheckMode,
   finalizeDocument,
@@ -231,6 +232,7 @@ export default function SendScreen({
                 uploadStatus={uploadStatus}
                 ocrResult={ocrResult}
                 ocrError={ocrError}
+                ocrProgress={ocrProgress}
                 checkMode={checkMode}
                 setCheckMode={setCheckMode}
                 finalizeDocument={finalizeDocument}
@@ -105,6 +105,21 @@ function buildHighlightedSegments(text, alerts) {
   return segments;
 }
 
+// ---- OCR 途中経過の表示文言（utils/ocrStream.js の reduceOcrProgress の stage に対応） ----
+function ocrProgressLabel(progress) {
+  switch (progress?.stage) {
+    case "rendered":
+      return `OCRチェック中...（0 / ${progress.ocrPages} ページ）`;
+    case "page":
+      return `OCRチェック中...（${Object.keys(progress.pages).length} / ${progress.ocrPages} ページ）`;
+    case "text":
+    case "structuring":
+      return "読み取り完了 — 内容を解析中...";
+    default:
+      return "OCRチェック中...";
+  }
+}
+
 // ---- インラインスピナー ----
 function Spinner() {
   return (
@@ -203,6 +218,7 @@ export default function SendTab({
   uploadStatus,     // 'idle'|'uploading'|'ocr_running'|'ready'|'error'
   ocrResult,
   ocrError,
+  ocrProgress,      // OCR 途中経過 { stage, pageCount, ocrPages, pages, text } | null（ocr_running 中のみ）
   checkMode,        // boolean
   setCheckMode,
   // checkIntensity / setCheckIntensity は廃止（常に "full" 固定）
@@ -556,15 +572,31 @@ export default function SendTab({
 
               {uploadStatus === "ocr_running" && (
                 <div style={{
-                  display: "flex", alignItems: "center", gap: 8,
                   padding: "10px 14px", borderRadius: 10,
                   background: "rgba(14,165,233,0.07)",
                   border: "1px solid rgba(14,165,233,0.20)",
                 }}>
-                  <Spinner />
-                  <span style={{ fontSize: 13, fontWeight: 800, color: "#0369a1" }}>
-                    OCRチェック中...
-                  </span>
+                  <div style={{ display: "flex", alignItems: "center", gap: 8 }}>
+                    <Spinner />
+                    <span style={{ fontSize: 13, fontWeight: 800, color: "#0369a1" }}>
+                      {ocrProgressLabel(ocrProgress)}
+                    </span>
+                  </div>
+                  {/* 読み取り済みページのテキストを先に表示（整形・アラート・構造化は完了後） */}
+                  {ocrProgress?.text && (
+                    <div style={{
+                      marginTop: 8,
+                      background: "rgba(255,255,255,0.75)",
+                      border: "1px solid rgba(15,23,42,0.10)",
+                      borderRadius: 8, padding: "8px 10px",
+                      fontSize: 12, lineHeight: 1.6, fontFamily: "monospace",
+                      color: THEME.text, opacity: 0.8,
+                      overflowY: "auto", maxHeight: 160,
+                      whiteSpace: "pre-wrap", wordBreak: "break-all",
+                    }}>
+                      {ocrProgress.text}
+                    </div>
+                  )}
                 </div>
               )}
 
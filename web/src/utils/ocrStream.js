@@ -0,0 +1,78 @@
+// ocrStream.js
+// /api/ocr/stream（NDJSON）の読み取りユーティリティ
+//
+// 役割:
+// - 1行1イベント {"event": ..., "data": {...}} を到着順に onEvent に渡す
+// - 最後の result イベントの data（/api/ocr と同じ JSON）を返す
+// - error イベントは Error として throw する（message はサーバーの detail）
+
+/**
+ * OCR ストリームを最後まで読み、最終結果を返す。
+ *
+ * @param {Response} res - fetch のレスポンス（res.ok 確認済み）
+ * @param {(event: string, data: object) => void} [onEvent] - 途中経過の通知
+ * @returns {Promise<object>} /api/ocr と同じ結果 JSON
+ */
+export async function readOcrStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let result = null;
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const { event, data } = JSON.parse(line);
+    if (event === "error") throw new Error(data?.detail || "OCR処理でエラーが発生しました");
+    if (event === "result") result = data;
+    onEvent?.(event, data);
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buffer.indexOf("\n")) >= 0) {
+      handleLine(buffer.slice(0, nl));
+      buffer = buffer.slice(nl + 1);
+    }
+  }
+  handleLine(buffer + decoder.decode());
+
+  if (!result) throw new Error("OCR結果を受信できませんでした");
+  return result;
+}
+
+/**
+ * OCR ストリームのイベントを画面表示用の途中経過にまとめる（reducer 形式）。
+ *
+ * @param {object|null} prev - 直前の途中経過（初回は null）
+ * @param {string} event
+ * @param {object} data
+ * @returns {object} { stage, pageCount, ocrPages, pages: { [page]: text }, text }
+ */
+export function reduceOcrProgress(prev, event, data) {
+  const p = prev ?? { stage: "fetching", pageCount: null, ocrPages: null, pages: {}, text: "" };
+  switch (event) {
+    case "fetched":
+      return { ...p, stage: "fetched" };
+    case "rendered":
+      return { ...p, stage: "rendered", pageCount: data.page_count, ocrPages: data.ocr_pages };
+    case "page": {
+      const pages = { ...p.pages, [data.pages[0]]: data.text };
+      const text = Object.keys(pages)
+        .map(Number)
+        .sort((a, b) => a - b)
+        .map((n) => pages[n])
+        .join("\n\n");
+      return { ...p, stage: "page", pages, text };
+    }
+    case "text":
+      return { ...p, stage: "text", text: data.text };
+    case "normalized":
+    case "alerts":
+      return { ...p, stage: "structuring" };
+    default:
+      return p;
+  }
+}
@@ -2,7 +2,8 @@
 // プレビューキー解決とプレビュー可否判定のユーティリティ
 //
 // 役割:
-// - preview_file_key が存在する場合はそちらを優先（将来の自動PDF変換対応）
+// - プレビュー（全体表示）は常に file_key を使う
+// - preview_file_key は一覧カード用サムネイル（API がアップロード時 / FAX受信時に生成）
 // - ブラウザ内プレビュー可能な拡張子（pdf/画像系）のみ iframe 表示する
 // - それ以外はダウンロード促進 UI に切り替える
 
@@ -21,15 +22,24 @@ export function getExtFromKey(key) {
 }
 
 /**
- * プレビューに使うキーを決定する。
- * preview_file_key があればそれを優先（変換済み PDF など）。
- * なければ通常の file_key を使う。
+ * プレビュー（全体表示・ダウンロード）に使うキーを決定する。
+ * preview_file_key は一覧カード用サムネイルのため使わない。
  *
  * @param {object} doc - documents テーブルの行
  * @returns {string|null}
  */
 export function getPreviewKey(doc) {
-  return doc?.preview_file_key || doc?.file_key || null;
+  return doc?.file_key || null;
+}
+
+/**
+ * 一覧カード用サムネイルのキー（API が生成する previews/<uuid>.webp。未生成なら null）。
+ *
+ * @param {object} doc - documents テーブルの行
+ * @returns {string|null}
+ */
+export function getThumbnailKey(doc) {
+  return doc?.preview_file_key || null;
 }
 
 /**